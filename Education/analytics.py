@@ -0,0 +1,211 @@
+# analytics.py
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Max, Min, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from .models import (
+    Course, DailyCounters, DailyCourseStats, DailyStats, Enrollment, EnrollmentStatus,
+    HomeworkSubmission, LessonCompletion, Reviewer, Student
+)
+from .routers import replica_reads
+
+
+# Последние дни пересчитываются при каждом обновлении: события за них могли прийти позже
+ANALYTICS_LOOKBACK_DAYS = 2
+ANALYTICS_REFRESH_INTERVAL = 300
+ANALYTICS_CHUNK_DAYS = 31
+ANALYTICS_TREND_DAYS = 30
+_REFRESH_KEY = 'education:analytics_refreshed'
+
+COUNTER_FIELDS = tuple(field.name for field in DailyCounters._meta.fields)
+PLATFORM_FIELDS = COUNTER_FIELDS + ('new_students', 'new_courses')
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _days(start, end):
+    return [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+
+
+def _by_day(queryset, field, start, end, group=(), **aggregates):
+    """События дней [start, end], сгруппированные по дню (в часовом поясе проекта) и полям group"""
+    return queryset.filter(**{
+        f'{field}__gte': _day_start(start),
+        f'{field}__lt': _day_start(end + timedelta(days=1)),
+    }).annotate(day=TruncDate(field)).order_by().values('day', *group).annotate(**aggregates)
+
+
+def _collect(start, end):
+    """
+    Счетчики дней [start, end] из исходных таблиц: по одному сгруппированному
+    запросу на источник событий. Возвращает ({(день, курс): счетчики}, {день: счетчики платформы})
+    """
+    courses = defaultdict(lambda: defaultdict(int))
+    platform = {day: defaultdict(int) for day in _days(start, end)}
+    by_status = {day: defaultdict(int) for day in platform}
+
+    def add(rows, course_field, **fields):
+        for row in rows:
+            counters = courses[(row['day'], row[course_field])]
+            for field, source in fields.items():
+                counters[field] += row[source] or 0
+
+    for row in _by_day(Enrollment.objects.all(), 'enrollment_date', start, end,
+                       ('course_id', 'status'), count=Count('enrollment_id')):
+        courses[(row['day'], row['course_id'])]['new_enrollments'] += row['count']
+        by_status[row['day']][row['status']] += row['count']
+
+    add(_by_day(
+        Enrollment.objects.filter(status=EnrollmentStatus.COMPLETED), 'completion_date', start, end,
+        ('course_id',), count=Count('enrollment_id'), score_sum=Sum('overall_score'),
+        score_count=Count('overall_score'),
+    ), 'course_id', completed_courses='count', course_score_sum='score_sum', course_score_count='score_count')
+
+    add(_by_day(
+        LessonCompletion.objects.all(), 'completed_at', start, end,
+        ('lesson__module__course_id',), count=Count('completion_id'), score_sum=Sum('score'),
+        score_count=Count('score'),
+    ), 'lesson__module__course_id', lessons_completed='count', lesson_score_sum='score_sum',
+        lesson_score_count='score_count')
+
+    add(_by_day(
+        HomeworkSubmission.objects.all(), 'submitted_at', start, end,
+        ('enrollment__course_id',), count=Count('submission_id'),
+    ), 'enrollment__course_id', submissions='count')
+
+    add(_by_day(
+        HomeworkSubmission.objects.all(), 'reviewed_at', start, end,
+        ('enrollment__course_id',), count=Count('submission_id'), score_sum=Sum('score'),
+        score_count=Count('score'),
+    ), 'enrollment__course_id', reviewed_submissions='count', review_score_sum='score_sum',
+        review_score_count='score_count')
+
+    # Счетчики платформы - суммы по курсам плюс события вне курсов
+    for (day, _), counters in courses.items():
+        for field, value in counters.items():
+            platform[day][field] += value
+    for row in _by_day(Student.objects.all(), 'registration_date', start, end, count=Count('student_id')):
+        platform[row['day']]['new_students'] = row['count']
+    for row in _by_day(Course.objects.all(), 'created_at', start, end, count=Count('course_id')):
+        platform[row['day']]['new_courses'] = row['count']
+    for day, statuses in by_status.items():
+        platform[day]['enrollments_by_status'] = dict(statuses)
+    return courses, platform
+
+
+def rebuild_days(start, end):
+    """Пересчитывает rollup дней [start, end] в одной транзакции. Возвращает число дней"""
+    courses, platform = _collect(start, end)
+    with transaction.atomic():
+        DailyCourseStats.objects.filter(date__gte=start, date__lte=end).delete()
+        DailyCourseStats.objects.bulk_create([
+            DailyCourseStats(date=day, course_id=course_id, **counters)
+            for (day, course_id), counters in courses.items()
+        ])
+        DailyStats.objects.bulk_create(
+            [DailyStats(date=day, **counters) for day, counters in platform.items()],
+            update_conflicts=True,
+            unique_fields=['date'],
+            update_fields=PLATFORM_FIELDS + ('enrollments_by_status', 'refreshed_at'),
+        )
+    return len(platform)
+
+
+def get_high_water_mark():
+    """Последний день, до которого rollup уже доведен"""
+    return DailyStats.objects.aggregate(last=Max('date'))['last']
+
+
+def get_first_event_date():
+    first = [
+        value for value in (
+            Student.objects.aggregate(first=Min('registration_date'))['first'],
+            Course.objects.aggregate(first=Min('created_at'))['first'],
+            Enrollment.objects.aggregate(first=Min('enrollment_date'))['first'],
+        ) if value is not None
+    ]
+    return timezone.localdate(min(first)) if first else None
+
+
+def backfill_analytics(start, end, chunk_days=ANALYTICS_CHUNK_DAYS):
+    """Пересчитывает историю кусками по chunk_days дней. Возвращает число дней"""
+    days = 0
+    while start <= end:
+        chunk_end = min(start + timedelta(days=chunk_days - 1), end)
+        days += rebuild_days(start, chunk_end)
+        start = chunk_end + timedelta(days=1)
+    return days
+
+
+def refresh_analytics(force=False):
+    """
+    Доводит rollup от high-water mark до сегодняшнего дня.
+    Без force выполняется не чаще раза в ANALYTICS_REFRESH_INTERVAL секунд.
+    """
+    if not force and not cache.add(_REFRESH_KEY, True, ANALYTICS_REFRESH_INTERVAL):
+        return 0
+    last = get_high_water_mark()
+    start = get_first_event_date() if last is None else last - timedelta(days=ANALYTICS_LOOKBACK_DAYS)
+    if start is None:
+        return 0
+    return backfill_analytics(start, timezone.localdate())
+
+
+# Отчеты для администратора (только из rollup-таблиц; читаются с реплики, если она есть)
+
+def _average(total, count):
+    return round(total / count, 1) if count else None
+
+
+def _with_averages(counters):
+    counters['average_course_score'] = _average(counters['course_score_sum'], counters['course_score_count'])
+    counters['average_lesson_score'] = _average(counters['lesson_score_sum'], counters['lesson_score_count'])
+    counters['average_review_score'] = _average(counters['review_score_sum'], counters['review_score_count'])
+    return counters
+
+
+@replica_reads()
+def get_totals(start=None, end=None):
+    """Итоги за период (по умолчанию за все время) одним агрегирующим запросом"""
+    days = DailyStats.objects.all()
+    if start is not None:
+        days = days.filter(date__gte=start)
+    if end is not None:
+        days = days.filter(date__lte=end)
+    totals = days.aggregate(**{field: Sum(field) for field in PLATFORM_FIELDS})
+    return _with_averages({field: value or 0 for field, value in totals.items()})
+
+
+@replica_reads()
+def get_platform_summary():
+    """Итоги за все время и размеры каталога (замена представления admin_stats)"""
+    summary = get_totals()
+    summary['total_courses'] = Course.objects.count()
+    summary['total_teachers'] = Reviewer.objects.count()
+    return summary
+
+
+@replica_reads()
+def get_trend(days=ANALYTICS_TREND_DAYS, end=None):
+    """Строки DailyStats за последние days дней по возрастанию даты; пропущенные дни - нулевые"""
+    end = end or timezone.localdate()
+    start = end - timedelta(days=days - 1)
+    stored = {row.date: row for row in DailyStats.objects.filter(date__gte=start, date__lte=end)}
+    return [stored.get(day) or DailyStats(date=day) for day in _days(start, end)]
+
+
+@replica_reads()
+def get_course_breakdown(start, end, limit=50):
+    """Счетчики курсов за период одним сгруппированным запросом, по убыванию зачислений"""
+    rows = DailyCourseStats.objects.filter(date__gte=start, date__lte=end).order_by().values(
+        'course_id', 'course__title'
+    ).annotate(**{field: Sum(field) for field in COUNTER_FIELDS}).order_by(
+        '-new_enrollments', '-lessons_completed', 'course__title'
+    )[:limit]
+    return [_with_averages(row) for row in rows]
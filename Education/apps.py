@@ -1,6 +1,12 @@
 from django.apps import AppConfig
+from django.core import checks
 
 
 class EducationConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'Education'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .session_backend import check_session_cache
+        checks.register(check_session_cache, checks.Tags.caches)
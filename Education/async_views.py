@@ -0,0 +1,143 @@
+# async_views.py
+# Асинхронные версии кабинетов и страниц курса для ASGI (маршруты - ProjectDB/urls_async.py).
+# Контекст страниц общий с обычными представлениями (page_context.py); независимые блоки
+# запросов выполняются одновременно, каждый в своем потоке со своим соединением из пула.
+# Шаблон рендерится синхронно, как в обычных представлениях (views.py).
+import asyncio
+import logging
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.db import connections
+from django.http import Http404
+from django.shortcuts import redirect, render
+from .models import Course, Enrollment
+from .page_context import (
+    student_dashboard_blocks, student_dashboard_context,
+    reviewer_dashboard_blocks, reviewer_dashboard_context, reviewer_dashboard_fallback,
+    course_detail_blocks, course_detail_context, course_modules_blocks, course_modules_context
+)
+
+logger = logging.getLogger(__name__)
+
+# Значение по умолчанию; переопределяется одноименной настройкой
+ASYNC_QUERY_CONCURRENCY = 2
+
+
+def _release_connections():
+    """
+    Соединения потока вне транзакции возвращаются в пул; без пула - закрываются
+    по правилам CONN_MAX_AGE, как в конце обычного запроса.
+    """
+    for connection in connections.all(initialized_only=True):
+        if connection.in_atomic_block:
+            continue
+        if getattr(connection, 'pool', None) is not None:
+            connection.close()
+        else:
+            connection.close_if_unusable_or_obsolete()
+
+
+def _released(call):
+    """Блок запросов, освобождающий соединения своего потока по завершении"""
+    def run():
+        try:
+            return call()
+        finally:
+            _release_connections()
+    return run
+
+
+async def gather(*calls):
+    """
+    Выполняет независимые синхронные блоки запросов одновременно и возвращает их результаты.
+    Асинхронные методы ORM (acount, aget...) выполняются по очереди в одном потоке запроса,
+    поэтому каждый блок уходит в отдельный поток: у потока свое соединение (роль и реплики
+    берутся из контекста запроса). Одновременно выполняется не больше ASYNC_QUERY_CONCURRENCY
+    блоков запроса, то есть запрос держит не больше стольких соединений пула.
+    """
+    # Поток запроса держит свои соединения до конца запроса; на время ожидания они
+    # возвращаются в пул, иначе при многих одновременных запросах блоки ждали бы
+    # соединений, занятых самими ожидающими запросами
+    await sync_to_async(_release_connections)()
+    semaphore = asyncio.Semaphore(getattr(settings, 'ASYNC_QUERY_CONCURRENCY', ASYNC_QUERY_CONCURRENCY))
+
+    async def run(call):
+        async with semaphore:
+            return await sync_to_async(_released(call), thread_sensitive=False)()
+
+    return await asyncio.gather(*(run(call) for call in calls))
+
+
+async def _aget_or_404(queryset, **kwargs):
+    try:
+        return await queryset.aget(**kwargs)
+    except queryset.model.DoesNotExist:
+        raise Http404(f'No {queryset.model._meta.object_name} matches the given query.')
+
+
+async def _render(request, template_name, context):
+    # Контекстные процессоры и ленивые значения шаблона могут обращаться к базе
+    return await sync_to_async(render)(request, template_name, context)
+
+
+@login_required
+async def dashboard(request):
+    """Универсальный личный кабинет с приоритетом преподавателя"""
+    profile = request.profile
+    # Профиль берется из сессии (при ее устаревании - двумя запросами)
+    has_reviewer, is_approved, has_student = await sync_to_async(
+        lambda: (profile.has_reviewer, profile.is_approved, profile.has_student)
+    )()
+
+    if has_reviewer:
+        if is_approved:
+            return await reviewer_dashboard(request, await sync_to_async(lambda: profile.reviewer)())
+        if has_student:
+            messages.info(request, 'Ваш аккаунт преподавателя ожидает одобрения. Пока доступен студенческий аккаунт.')
+            return await student_dashboard(request, await sync_to_async(lambda: profile.student)())
+        messages.warning(request, 'Ваш аккаунт преподавателя ожидает одобрения администратора.')
+        return await reviewer_dashboard(request, await sync_to_async(lambda: profile.reviewer)())
+
+    if has_student:
+        return await student_dashboard(request, await sync_to_async(lambda: profile.student)())
+
+    messages.warning(request, 'Пожалуйста, завершите регистрацию.')
+    return redirect('choose_registration_type')
+
+
+async def student_dashboard(request, student):
+    """Дашборд для студента"""
+    enrollments = [e async for e in student.enrollments.select_related('course')]
+    # Продолжение курсов, открывшиеся курсы и рекомендации друг от друга не зависят
+    results = await gather(*student_dashboard_blocks(student, enrollments))
+    context = student_dashboard_context(student, enrollments, *results)
+    return await _render(request, 'dashboard/student_dashboard.html', context)
+
+
+async def reviewer_dashboard(request, reviewer):
+    try:
+        context = reviewer_dashboard_context(reviewer, *await gather(*reviewer_dashboard_blocks(reviewer)))
+    except Exception as e:
+        logger.error(f"Error in reviewer_dashboard: {str(e)}")
+        context = await sync_to_async(reviewer_dashboard_fallback)(reviewer)
+    return await _render(request, 'dashboard/reviewer_dashboard.html', context)
+
+
+async def course_detail(request, course_id):
+    """Детальная страница курса (доступна без регистрации)"""
+    course = await _aget_or_404(Course.objects.filter(is_active=True), pk=course_id)
+    context = course_detail_context(course, *await gather(*course_detail_blocks(request, course)))
+    return await _render(request, 'courses/course_detail.html', context)
+
+
+@login_required
+async def course_modules(request, course_id):
+    student = await sync_to_async(lambda: request.profile.student)()
+    enrollment = await _aget_or_404(
+        Enrollment.objects.select_related('course'), course_id=course_id, student=student
+    )
+    context = course_modules_context(enrollment, *await gather(*course_modules_blocks(enrollment)))
+    return await _render(request, 'courses/course_modules.html', context)
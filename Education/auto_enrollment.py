@@ -0,0 +1,131 @@
+# auto_enrollment.py
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+from .models import Course, Enrollment, EnrollmentStatus
+from .prerequisites import get_prerequisite_graph
+from .progress import count_required_lessons_by_course
+from .catalog import invalidate_catalog
+from .student_stats import rebuild_student_stats
+from . import typeahead
+
+
+AUTO_ENROLL_BATCH_SIZE = 1000
+
+
+def became_completed(enrollment, created=False):
+    """Перешло ли зачисление в статус "завершено" при последнем сохранении"""
+    previous = None if created else getattr(enrollment, '_loaded_status', None)
+    return enrollment.status == EnrollmentStatus.COMPLETED and previous != EnrollmentStatus.COMPLETED
+
+
+def plan_enrollments(student_ids):
+    """
+    Курсы, которые открылись студентам: {id студента: [id курса]}.
+    Зачисления студентов читаются одним запросом, требования проверяются по графу в памяти.
+    """
+    completed = defaultdict(dict)
+    enrolled = defaultdict(set)
+    for student_id, course_id, status, score in Enrollment.objects.filter(
+        student_id__in=student_ids
+    ).order_by().values_list('student_id', 'course_id', 'status', 'overall_score'):
+        enrolled[student_id].add(course_id)
+        if status == EnrollmentStatus.COMPLETED:
+            completed[student_id][course_id] = score
+
+    graph = get_prerequisite_graph()
+    plan = {}
+    for student_id, scores in completed.items():
+        course_ids = graph.unlocked_by(scores, exclude=enrolled[student_id])
+        if course_ids:
+            plan[student_id] = course_ids
+    return plan
+
+
+def _enroll(student_ids):
+    """Создает зачисления по плану; возвращает (количество, множество затронутых курсов)"""
+    plan = plan_enrollments(student_ids)
+    course_ids = {course_id for planned in plan.values() for course_id in planned}
+    if not course_ids:
+        return 0, set()
+
+    active = set(Course.objects.filter(
+        course_id__in=course_ids, is_active=True
+    ).values_list('course_id', flat=True))
+    lesson_counts = count_required_lessons_by_course(active)
+    now = timezone.now()
+    enrollments = [
+        Enrollment(
+            student_id=student_id,
+            course_id=course_id,
+            enrollment_date=now,
+            status=EnrollmentStatus.ACTIVE,
+            total_required_lessons=lesson_counts[course_id],
+            last_activity_at=now,
+        )
+        for student_id, planned in plan.items()
+        for course_id in planned if course_id in active
+    ]
+    # Зачисления, созданные параллельно (или триггером в базе), пропускаются
+    Enrollment.objects.bulk_create(enrollments, ignore_conflicts=True)
+    rebuild_student_stats({enrollment.student_id for enrollment in enrollments})
+    return len(enrollments), {enrollment.course_id for enrollment in enrollments}
+
+
+def _courses_changed(course_ids):
+    # bulk_create не отправляет сигналы: сбрасываем то, что обновили бы они
+    if course_ids:
+        invalidate_catalog()
+    for course_id in course_ids:
+        typeahead.update_course_popularity(course_id)
+
+
+def enroll_unlocked(student_ids):
+    """
+    Зачисляет студентов на все активные курсы, обязательные требования которых
+    (включая минимальный балл) теперь выполнены. Все зачисления создаются одним
+    bulk_create; повторный запуск безопасен.
+    Возвращает количество запланированных зачислений (конфликтующие база пропускает).
+    """
+    with transaction.atomic():
+        created, course_ids = _enroll(student_ids)
+    _courses_changed(course_ids)
+    return created
+
+
+def backfill_auto_enrollment(course_ids=None, batch_size=AUTO_ENROLL_BATCH_SIZE):
+    """
+    Догоняющее зачисление всех выпускников (например, после завершения потока).
+    Студенты обрабатываются пачками по возрастанию id, каждая пачка - в своей транзакции.
+    course_ids - учитывать только выпускников этих курсов.
+    Возвращает (количество студентов, количество зачислений).
+    """
+    graph = get_prerequisite_graph()
+    # Только завершенные курсы, которые являются чьим-то требованием
+    unlocking = [course_id for course_id, unlocked in graph.unlocks.items() if unlocked]
+    if course_ids is not None:
+        course_ids = set(course_ids)
+        unlocking = [course_id for course_id in unlocking if course_id in course_ids]
+    graduates = Enrollment.objects.filter(
+        status=EnrollmentStatus.COMPLETED,
+        course_id__in=unlocking
+    ).order_by('student_id').values_list('student_id', flat=True).distinct()
+
+    students_count = 0
+    created_count = 0
+    changed = set()
+    last_student_id = None
+    while True:
+        batch = graduates if last_student_id is None else graduates.filter(student_id__gt=last_student_id)
+        student_ids = list(batch[:batch_size])
+        if not student_ids:
+            break
+        with transaction.atomic():
+            created, course_ids = _enroll(student_ids)
+        students_count += len(student_ids)
+        created_count += created
+        changed |= course_ids
+        last_student_id = student_ids[-1]
+    _courses_changed(changed)
+    return students_count, created_count
@@ -0,0 +1,45 @@
+# cache_versions.py
+import time
+
+from django.core.cache import cache
+
+
+# Ключ версии живет не дольше VERSION_TIMEOUT секунд с момента создания: даже если
+# инвалидация где-то потерялась, все процессы перестроят свои данные не позже этого срока.
+# Закэшированные по версии данные хранятся с тем же сроком
+VERSION_TIMEOUT = 24 * 60 * 60
+
+
+def _new_version():
+    # Отсчет начинается с текущего времени в наносекундах: после истечения ключа
+    # новая версия больше всех прежних и не совпадет с данными, закэшированными раньше
+    return time.time_ns()
+
+
+def get_version(key):
+    """Текущая версия по ключу (создается при первом обращении)"""
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _new_version(), VERSION_TIMEOUT)
+        version = cache.get(key)
+    # Кэш недоступен (или DummyCache) - каждый раз новая версия, то есть без кэширования
+    return version if version is not None else _new_version()
+
+
+def get_versions(keys):
+    """
+    Версии набора ключей одним обращением к кэшу: keys - {имя: ключ версии},
+    результат - {имя: версия}. Недостающие версии создаются как в get_version
+    """
+    found = cache.get_many(keys.values())
+    return {name: found[key] if key in found else get_version(key) for name, key in keys.items()}
+
+
+def bump_version(key):
+    """Увеличивает версию (атомарно в общем кэше) и возвращает новую"""
+    try:
+        return cache.incr(key)
+    except ValueError:
+        version = _new_version()
+        cache.set(key, version, VERSION_TIMEOUT)
+        return version
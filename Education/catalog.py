@@ -0,0 +1,144 @@
+# catalog.py
+import base64
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from .cache_versions import bump_version, get_version
+from .models import Course, CourseTag, Enrollment, EnrollmentStatus, Lesson, Module
+from .forms import CourseSearchForm
+from .routers import reads_rls_tables, replica_reads
+from .search import highlight
+
+
+CATALOG_PAGE_SIZE = 24
+CATALOG_CACHE_TIMEOUT = 300
+CATALOG_VERSION_KEY = 'education:catalog_version'
+
+
+def get_catalog_version():
+    return get_version(CATALOG_VERSION_KEY)
+
+
+def invalidate_catalog():
+    """Сбрасывает все закэшированные страницы каталога"""
+    bump_version(CATALOG_VERSION_KEY)
+
+
+def count_subquery(queryset, field, outer_field='course_id'):
+    """Коррелированный COUNT по курсу (без размножения строк join'ами)"""
+    counts = queryset.filter(**{field: OuterRef(outer_field)}).order_by().values(field).annotate(
+        c=Count('*')
+    ).values('c')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def annotate_catalog_counts(courses):
+    """Добавляет количество модулей, уроков и активных студентов одним запросом"""
+    return reads_rls_tables(courses).annotate(
+        modules_count=count_subquery(Module.objects.all(), 'course_id'),
+        lessons_count=count_subquery(Lesson.objects.all(), 'module__course_id'),
+        active_students_count=count_subquery(
+            Enrollment.objects.filter(status=EnrollmentStatus.ACTIVE), 'course_id'
+        ),
+    )
+
+
+DEFAULT_ORDERING = ('complexity_level', 'title', 'course_id')
+
+
+def filter_catalog(courses, query='', tags=None, difficulty=''):
+    """Фильтрует каталог, возвращает (queryset, ordering)"""
+    ordering = None
+    if query:
+        courses, ordering = CourseSearchForm({'query': query}).search(courses)
+
+    if tags:
+        courses = courses.filter(
+            course_id__in=CourseTag.objects.filter(tag_id__in=tags).values('course_id')
+        )
+
+    if difficulty:
+        courses = courses.filter(difficulty_level=difficulty)
+
+    return courses, ordering or DEFAULT_ORDERING
+
+
+def encode_cursor(course, ordering):
+    data = [getattr(course, field.lstrip('-')) for field in ordering]
+    return base64.urlsafe_b64encode(json.dumps(data).encode()).decode()
+
+
+def decode_cursor(cursor, ordering):
+    """Разбирает курсор страницы, при ошибке возвращает None (первая страница)"""
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        return None
+    if not isinstance(values, list) or len(values) != len(ordering):
+        return None
+    return values
+
+
+def _after(courses, ordering, values):
+    """Keyset-пагинация: строки строго после курсора в порядке ordering"""
+    condition = Q()
+    equal = {}
+    for field, value in zip(ordering, values):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        condition |= Q(**equal, **{f'{name}__{lookup}': value})
+        equal[name] = value
+    return courses.filter(condition)
+
+
+def _cache_key(query, tags, difficulty, cursor):
+    raw = json.dumps([query, sorted(str(tag) for tag in tags), difficulty, cursor or ''])
+    digest = hashlib.md5(raw.encode()).hexdigest()
+    return f'education:catalog:{get_catalog_version()}:{digest}'
+
+
+@replica_reads()
+def get_catalog_page(query='', tags=None, difficulty='', cursor=None):
+    """
+    Страница каталога: курсы с количеством модулей/уроков/студентов,
+    общее число найденных курсов и курсор следующей страницы.
+    Результат кэшируется до изменения курсов, модулей, уроков, тегов или зачислений.
+    """
+    tags = tags or []
+    key = _cache_key(query, tags, difficulty, cursor)
+    page = cache.get(key)
+    if page is not None:
+        return page
+
+    courses, ordering = filter_catalog(Course.objects.filter(is_active=True), query, tags, difficulty)
+    total = courses.count()
+
+    position = decode_cursor(cursor, ordering)
+    if position:
+        try:
+            courses = _after(courses, ordering, position)
+        except (ValueError, TypeError):
+            pass
+    courses = list(
+        annotate_catalog_counts(courses).order_by(*ordering)[:CATALOG_PAGE_SIZE + 1]
+    )
+    for course in courses:
+        course.snippet = highlight(getattr(course, 'headline', ''))
+
+    next_cursor = None
+    if len(courses) > CATALOG_PAGE_SIZE:
+        courses = courses[:CATALOG_PAGE_SIZE]
+        next_cursor = encode_cursor(courses[-1], ordering)
+
+    page = {
+        'courses': courses,
+        'total_courses': total,
+        'next_cursor': next_cursor,
+    }
+    cache.set(key, page, CATALOG_CACHE_TIMEOUT)
+    return page
@@ -1,39 +1,32 @@
 # context_processors.py
-from .models import Student, Reviewer, Tag
-from django.db.models import Count, Q
+from .tags import get_popular_tags
+from .profile import UserProfile
+from django.utils.functional import SimpleLazyObject
 
 def user_context(request):
     """Добавляет информацию о типе пользователя в контекст"""
     context = {}
     if request.user.is_authenticated:
-        try:
-            student = Student.objects.get(email=request.user.email)
-            context['student'] = student
-            context['user_type'] = 'student'
-            context['has_student_profile'] = True
-        except Student.DoesNotExist:
-            context['has_student_profile'] = False
+        profile = getattr(request, 'profile', None) or UserProfile(request)
+        context['has_student_profile'] = profile.has_student
+        context['has_reviewer_profile'] = profile.has_reviewer
+        if profile.has_student:
+            context['student'] = SimpleLazyObject(lambda: profile.student)
+        if profile.has_reviewer:
+            context['reviewer'] = SimpleLazyObject(lambda: profile.reviewer)
         
-        try:
-            reviewer = Reviewer.objects.get(email=request.user.email)
-            context['reviewer'] = reviewer
+        # Преподаватель имеет приоритет, как и раньше
+        if profile.has_reviewer:
             context['user_type'] = 'reviewer'
-            context['has_reviewer_profile'] = True
-        except Reviewer.DoesNotExist:
-            context['has_reviewer_profile'] = False
-        
-        # Если нет ни студента, ни преподавателя
-        if not context.get('user_type'):
+        elif profile.has_student:
+            context['user_type'] = 'student'
+        else:
             context['user_type'] = 'unregistered'
     
     return context
 
 def popular_tags(request):
-    """Добавляет популярные теги в контекст"""
-    tags = Tag.objects.filter(is_featured=True).annotate(
-        active_courses_count=Count('courses', filter=Q(courses__is_active=True))
-    ).order_by('-active_courses_count')[:8]
-    
+    """Добавляет популярные теги в контекст (из кэша и только если шаблон к ним обращается)"""
     return {
-        'popular_tags': tags
-    }
\ No newline at end of file
+        'popular_tags': SimpleLazyObject(get_popular_tags)
+    }
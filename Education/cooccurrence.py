@@ -0,0 +1,199 @@
+# cooccurrence.py
+import heapq
+import math
+import threading
+from collections import Counter, defaultdict
+
+from .cache_versions import bump_version, get_version
+from .models import CourseTag
+
+
+COOCCURRENCE_VERSION_KEY = 'education:tag_cooccurrence_version'
+SIMILAR_TAGS_LIMIT = 5
+RELATED_COURSES_LIMIT = 4
+
+
+class TagCooccurrence:
+    """
+    Разреженная матрица совместной встречаемости тегов на активных курсах:
+    pairs[тег][другой тег] = число курсов с обоими тегами (нулевые ячейки не хранятся).
+    Строится одним запросом, дальше обновляется по одной связи курса с тегом.
+    """
+
+    def __init__(self, links):
+        self.course_tags = defaultdict(set)
+        self.tag_courses = defaultdict(set)
+        self.pairs = defaultdict(Counter)
+        for course_id, tag_id in links:
+            self.add(course_id, tag_id)
+
+    @classmethod
+    def from_db(cls):
+        return cls(CourseTag.objects.filter(course__is_active=True).values_list('course_id', 'tag_id'))
+
+    def add(self, course_id, tag_id):
+        """Добавляет связь курса с тегом; False, если она уже учтена"""
+        tags = self.course_tags[course_id]
+        if tag_id in tags:
+            return False
+        for other_id in tags:
+            self.pairs[tag_id][other_id] += 1
+            self.pairs[other_id][tag_id] += 1
+        tags.add(tag_id)
+        self.tag_courses[tag_id].add(course_id)
+        return True
+
+    def remove(self, course_id, tag_id):
+        """Удаляет связь курса с тегом; False, если ее не было"""
+        tags = self.course_tags.get(course_id)
+        if not tags or tag_id not in tags:
+            return False
+        tags.discard(tag_id)
+        for other_id in tags:
+            self._decrement(tag_id, other_id)
+            self._decrement(other_id, tag_id)
+        if not tags:
+            del self.course_tags[course_id]
+        courses = self.tag_courses[tag_id]
+        courses.discard(course_id)
+        if not courses:
+            del self.tag_courses[tag_id]
+        return True
+
+    def _decrement(self, tag_id, other_id):
+        row = self.pairs[tag_id]
+        row[other_id] -= 1
+        if row[other_id] <= 0:
+            del row[other_id]
+        if not row:
+            del self.pairs[tag_id]
+
+    def set_course_tags(self, course_id, tag_ids):
+        """Приводит теги курса к tag_ids (пустой набор убирает курс). True, если что-то изменилось"""
+        tag_ids = set(tag_ids)
+        current = set(self.course_tags.get(course_id, ()))
+        changed = False
+        for tag_id in current - tag_ids:
+            changed |= self.remove(course_id, tag_id)
+        for tag_id in tag_ids - current:
+            changed |= self.add(course_id, tag_id)
+        return changed
+
+    def score(self, tag_id, other_id, measure='jaccard'):
+        """Сходство двух тегов: коэффициент Жаккара или поточечная взаимная информация (pmi)"""
+        both = self.pairs.get(tag_id, {}).get(other_id, 0)
+        if not both:
+            return 0.0
+        tag_count = len(self.tag_courses[tag_id])
+        other_count = len(self.tag_courses[other_id])
+        if measure == 'pmi':
+            return math.log(both * len(self.course_tags) / (tag_count * other_count))
+        return both / (tag_count + other_count - both)
+
+    def similar_tags(self, tag_id, limit=SIMILAR_TAGS_LIMIT, measure='jaccard'):
+        """Id тегов, встречающихся вместе с данным, по убыванию сходства"""
+        scored = [
+            (self.score(tag_id, other_id, measure), count, -other_id)
+            for other_id, count in self.pairs.get(tag_id, {}).items()
+        ]
+        return [-other_id for _, _, other_id in heapq.nlargest(limit, scored)]
+
+    def related_courses(self, course_id, limit=RELATED_COURSES_LIMIT):
+        """
+        Id курсов с наибольшим взвешенным пересечением тегов: каждый общий тег
+        весит log(1 + курсов / курсов с тегом), редкие теги значат больше.
+        """
+        scores = defaultdict(float)
+        total = len(self.course_tags)
+        for tag_id in self.course_tags.get(course_id, ()):
+            courses = self.tag_courses[tag_id]
+            weight = math.log(1 + total / len(courses))
+            for other_id in courses:
+                scores[other_id] += weight
+        scores.pop(course_id, None)
+        return [
+            -other_id for _, other_id in heapq.nlargest(
+                limit, ((score, -other_id) for other_id, score in scores.items())
+            )
+        ]
+
+
+def get_cooccurrence_version():
+    return get_version(COOCCURRENCE_VERSION_KEY)
+
+
+def _bump_version():
+    return bump_version(COOCCURRENCE_VERSION_KEY)
+
+
+_local = {'version': None, 'matrix': None}
+_lock = threading.Lock()
+
+
+def get_tag_cooccurrence():
+    """Матрица из памяти процесса; после изменений в других процессах перестраивается одним запросом"""
+    version = get_cooccurrence_version()
+    with _lock:
+        if _local['version'] != version:
+            _local['matrix'] = TagCooccurrence.from_db()
+            _local['version'] = version
+        return _local['matrix']
+
+
+def _apply(change):
+    """
+    Применяет изменение к матрице процесса. Если она изменилась, версия увеличивается,
+    и остальные процессы перестроят свою копию при следующем обращении.
+    """
+    with _lock:
+        version = get_cooccurrence_version()
+        if _local['version'] != version:
+            # Копия процесса устарела: изменения не сравнить, сбрасываем копии всех процессов
+            _local['version'] = None
+            _bump_version()
+            return
+        if change(_local['matrix']):
+            new_version = _bump_version()
+            # Если версию параллельно увеличил другой процесс, копия перестроится из базы
+            _local['version'] = new_version if new_version == version + 1 else None
+
+
+def refresh_courses(course_ids):
+    """Перечитывает теги курсов (одним запросом), например после смены активности или m2m-изменений"""
+    course_ids = set(course_ids)
+    if not course_ids:
+        return
+    tags = defaultdict(set)
+    for course_id, tag_id in CourseTag.objects.filter(
+        course_id__in=course_ids, course__is_active=True
+    ).values_list('course_id', 'tag_id'):
+        tags[course_id].add(tag_id)
+
+    def change(matrix):
+        changed = False
+        for course_id in course_ids:
+            changed |= matrix.set_course_tags(course_id, tags[course_id])
+        return changed
+    _apply(change)
+
+
+def link_removed(course_id, tag_id):
+    _apply(lambda matrix: matrix.remove(course_id, tag_id))
+
+
+def tag_cleared(tag_id):
+    """Тег снят со всех курсов (tag.courses.clear())"""
+    def change(matrix):
+        changed = False
+        for course_id in list(matrix.tag_courses.get(tag_id, ())):
+            changed |= matrix.remove(course_id, tag_id)
+        return changed
+    _apply(change)
+
+
+def get_similar_tags(tag_id, limit=SIMILAR_TAGS_LIMIT, measure='jaccard'):
+    return get_tag_cooccurrence().similar_tags(tag_id, limit, measure)
+
+
+def get_related_courses(course_id, limit=RELATED_COURSES_LIMIT):
+    return get_tag_cooccurrence().related_courses(course_id, limit)
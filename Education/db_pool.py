@@ -0,0 +1,45 @@
+# db_pool.py
+from django.db import connections
+
+
+def get_pool(alias):
+    """Пул соединений алиаса (None, если пул не настроен или бэкенд его не поддерживает)"""
+    return getattr(connections[alias], 'pool', None)
+
+
+def pool_stats():
+    """
+    Метрики пулов текущего процесса по алиасам: размер, занятые и свободные соединения,
+    ожидающие запросы и средняя задержка получения соединения. Счетчики копятся с запуска процесса;
+    пулы, которые процесс еще не открывал, пропускаются.
+    """
+    stats = {}
+    for alias in connections:
+        pool = get_pool(alias)
+        if pool is None or pool.closed:
+            continue
+        raw = pool.get_stats()
+        size = raw.get('pool_size', 0)
+        available = raw.get('pool_available', 0)
+        requests = raw.get('requests_num', 0)
+        queued = raw.get('requests_queued', 0)
+        wait_ms = raw.get('requests_wait_ms', 0)
+        stats[alias] = {
+            'min_size': raw.get('pool_min', pool.min_size),
+            'max_size': raw.get('pool_max', pool.max_size),
+            'size': size,
+            'in_use': size - available,
+            'available': available,
+            'waiting': raw.get('requests_waiting', 0),
+            'requests': requests,
+            'queued': queued,
+            'timeouts': raw.get('requests_errors', 0),
+            # Среднее по всем выдачам и только по тем, которым пришлось ждать в очереди
+            'acquire_ms_avg': round(wait_ms / requests, 3) if requests else 0.0,
+            'queued_wait_ms_avg': round(wait_ms / queued, 3) if queued else 0.0,
+            'connections_opened': raw.get('connections_num', 0),
+            'connect_ms_total': raw.get('connections_ms', 0),
+            'connection_errors': raw.get('connections_errors', 0),
+            'connections_lost': raw.get('connections_lost', 0),
+        }
+    return stats
@@ -3,6 +3,7 @@ from .models import *
 from django.contrib.auth.forms import AuthenticationForm
 from django.contrib.auth import authenticate
 from django.contrib.auth.models import User
+from .search import search_courses
 
 class StudentRegistrationForm(forms.ModelForm):
     """Форма регистрации студента на основе модели"""
@@ -307,7 +308,7 @@ class CourseSearchForm(forms.Form):
         required=False,
         widget=forms.TextInput(attrs={
             'class': 'form-control',
-            'placeholder': 'Поиск по названию курса...',
+            'placeholder': 'Поиск по названию, тегам и описанию...',
             'aria-label': 'Search'
         }),
         label=''
@@ -329,6 +330,21 @@ class CourseSearchForm(forms.Form):
         widget=forms.Select(attrs={'class': 'form-select'}),
         label='Уровень сложности'
     )
+    
+    def get_query(self):
+        """Нормализованная строка поиска (без полной валидации формы)"""
+        return ' '.join((self.data.get('query') or '').split())
+    
+    def search(self, courses):
+        """
+        Применяет поисковый запрос к курсам: полнотекстовый поиск с ранжированием
+        на PostgreSQL, подстрочный поиск на других СУБД.
+        Возвращает (queryset, ordering)
+        """
+        query = self.get_query()
+        if not query:
+            return courses, None
+        return search_courses(courses, query)
 
 class TagFilterForm(forms.Form):
     tags = forms.ModelMultipleChoiceField(
@@ -341,3 +357,61 @@ class TagFilterForm(forms.Form):
     )
 
 
+
+
+class StudentCoursesFilterForm(forms.Form):
+    status = forms.ChoiceField(
+        choices=[('', 'Все курсы')] + list(EnrollmentStatus.choices),
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select form-select-sm'}),
+        label='Статус'
+    )
+
+    sort = forms.ChoiceField(
+        choices=[
+            ('activity', 'Последняя активность'),
+            ('progress', 'Прогресс'),
+            ('title', 'Название'),
+        ],
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select form-select-sm'}),
+        label='Сортировка'
+    )
+
+    def get_filters(self):
+        """(статус, сортировка); неверные значения заменяются значениями по умолчанию"""
+        if not self.is_valid():
+            return '', 'activity'
+        return self.cleaned_data['status'], self.cleaned_data['sort'] or 'activity'
+
+
+class ReviewResultForm(forms.Form):
+    """Результат проверки задания из очереди"""
+    status = forms.ChoiceField(
+        choices=[
+            (HomeworkStatus.APPROVED, HomeworkStatus.APPROVED.label),
+            (HomeworkStatus.NEEDS_REVISION, HomeworkStatus.NEEDS_REVISION.label),
+            (HomeworkStatus.REJECTED, HomeworkStatus.REJECTED.label),
+        ],
+        widget=forms.Select(attrs={'class': 'form-select form-select-sm'}),
+        label='Решение'
+    )
+
+    score = forms.IntegerField(
+        required=False,
+        min_value=0,
+        widget=forms.NumberInput(attrs={'class': 'form-control form-control-sm', 'placeholder': 'Балл'}),
+        label='Балл'
+    )
+
+    feedback = forms.CharField(
+        required=False,
+        widget=forms.Textarea(attrs={'class': 'form-control form-control-sm', 'rows': 2, 'placeholder': 'Комментарий'}),
+        label='Обратная связь'
+    )
+
+    def __init__(self, *args, max_score=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if max_score is not None:
+            self.fields['score'].max_value = max_score
+            self.fields['score'].validators.append(MaxValueValidator(max_score))
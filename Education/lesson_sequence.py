@@ -0,0 +1,174 @@
+# lesson_sequence.py
+from collections import OrderedDict, defaultdict, namedtuple
+
+from django.core.cache import cache
+from .cache_versions import VERSION_TIMEOUT, bump_version, get_versions
+from .models import Lesson, LessonCompletion, Module
+
+
+# Урок в последовательности курса (без контента: только то, что нужно для навигации)
+LessonRef = namedtuple('LessonRef', 'lesson_id title lesson_order module_id position')
+
+
+class LessonSequence:
+    """
+    Активные уроки курса одной цепочкой в порядке (module_order, lesson_order).
+    Соседние уроки, позиции и уроки модуля берутся по индексу, без запросов;
+    переход между модулями - обычный шаг по цепочке.
+    """
+
+    def __init__(self, course_id, rows):
+        self.course_id = course_id
+        self.lessons = tuple(
+            LessonRef(lesson_id, title, lesson_order, module_id, position)
+            for position, (lesson_id, title, lesson_order, module_id) in enumerate(rows)
+        )
+        self.positions = {lesson.lesson_id: lesson.position for lesson in self.lessons}
+        self.modules = defaultdict(list)
+        for lesson in self.lessons:
+            self.modules[lesson.module_id].append(lesson)
+
+    @classmethod
+    def from_db(cls, course_id):
+        return cls(course_id, Lesson.objects.filter(
+            module__course_id=course_id,
+            is_active=True
+        ).order_by('module__module_order', 'lesson_order', 'lesson_id').values_list(
+            'lesson_id', 'title', 'lesson_order', 'module_id'
+        ))
+
+    def __len__(self):
+        return len(self.lessons)
+
+    def position(self, lesson_id):
+        """Номер урока в курсе с нуля (None для неактивного или чужого урока)"""
+        return self.positions.get(lesson_id)
+
+    def _at(self, position):
+        return self.lessons[position] if 0 <= position < len(self.lessons) else None
+
+    def next(self, lesson_id):
+        position = self.position(lesson_id)
+        return None if position is None else self._at(position + 1)
+
+    def previous(self, lesson_id):
+        position = self.position(lesson_id)
+        return None if position is None else self._at(position - 1)
+
+    def module_lessons(self, module_id):
+        return self.modules.get(module_id, [])
+
+    def resume(self, completed_ids):
+        """Первый незавершенный урок курса (None, если пройдены все)"""
+        for lesson in self.lessons:
+            if lesson.lesson_id not in completed_ids:
+                return lesson
+        return None
+
+
+def _version_key(course_id):
+    return f'education:lesson_sequence_version:{course_id}'
+
+
+def invalidate_lesson_sequence(course_id):
+    bump_version(_version_key(course_id))
+
+
+def module_changed(module):
+    """Сброс последовательности курса модуля и курса, из которого модуль перенесен"""
+    for course_id in {module.course_id, getattr(module, '_loaded_course_id', module.course_id)}:
+        invalidate_lesson_sequence(course_id)
+    module._loaded_course_id = module.course_id
+
+
+def lesson_changed(lesson):
+    """
+    Сброс последовательности курса урока и курса, из модуля которого урок перенесен.
+    Курс берется из загруженного модуля или одним запросом
+    """
+    module_ids = {lesson.module_id, getattr(lesson, '_loaded_module_id', lesson.module_id)}
+    if len(module_ids) == 1 and Lesson.module.is_cached(lesson):
+        course_ids = {lesson.module.course_id}
+    else:
+        course_ids = set(Module.objects.filter(pk__in=module_ids).values_list('course_id', flat=True))
+    for course_id in course_ids:
+        invalidate_lesson_sequence(course_id)
+    lesson._loaded_module_id = lesson.module_id
+
+
+# Последовательности в памяти процесса: {id курса: (версия, последовательность)},
+# не больше _LOCAL_SIZE курсов, вытесняются давно не использованные
+_LOCAL_SIZE = 256
+_local = OrderedDict()
+
+
+def _sequence_key(course_id, version):
+    return f'education:lesson_sequence:{course_id}:{version}'
+
+
+def _remember(course_id, version, sequence):
+    _local[course_id] = (version, sequence)
+    _local.move_to_end(course_id)
+    while len(_local) > _LOCAL_SIZE:
+        _local.popitem(last=False)
+
+
+def get_lesson_sequences(course_ids):
+    """
+    Последовательности набора курсов: {id курса: LessonSequence}. Версии всех курсов
+    читаются одним обращением к кэшу, недостающие в памяти последовательности - вторым;
+    из базы строятся только последовательности, которых нет и в общем кэше.
+    """
+    course_ids = set(course_ids)
+    if not course_ids:
+        return {}
+    versions = get_versions({course_id: _version_key(course_id) for course_id in course_ids})
+    sequences = {}
+    for course_id, version in versions.items():
+        local = _local.get(course_id)
+        if local is not None and local[0] == version:
+            _local.move_to_end(course_id)
+            sequences[course_id] = local[1]
+    missing = {
+        _sequence_key(course_id, version): course_id
+        for course_id, version in versions.items() if course_id not in sequences
+    }
+    if missing:
+        cached = cache.get_many(missing)
+        built = {}
+        for key, course_id in missing.items():
+            sequence = cached.get(key)
+            if sequence is None:
+                sequence = built[key] = LessonSequence.from_db(course_id)
+            sequences[course_id] = sequence
+            _remember(course_id, versions[course_id], sequence)
+        if built:
+            cache.set_many(built, VERSION_TIMEOUT)
+    return sequences
+
+
+def get_lesson_sequence(course_id):
+    """Последовательность из памяти процесса или общего кэша; перестраивается после правок модулей и уроков"""
+    return get_lesson_sequences([course_id])[course_id]
+
+
+def get_resume_lessons(enrollments):
+    """
+    Урок, с которого продолжить, для набора зачислений: {id зачисления: LessonRef или None}.
+    Завершения всех зачислений читаются одним запросом, последовательности курсов - вместе.
+    """
+    enrollments = list(enrollments)
+    completed = defaultdict(set)
+    for enrollment_id, lesson_id in LessonCompletion.objects.filter(
+        enrollment__in=enrollments
+    ).values_list('enrollment_id', 'lesson_id'):
+        completed[enrollment_id].add(lesson_id)
+    sequences = get_lesson_sequences(enrollment.course_id for enrollment in enrollments)
+    return {
+        enrollment.enrollment_id: sequences[enrollment.course_id].resume(completed[enrollment.enrollment_id])
+        for enrollment in enrollments
+    }
+
+
+def get_resume_lesson(enrollment):
+    return get_resume_lessons([enrollment])[enrollment.enrollment_id]
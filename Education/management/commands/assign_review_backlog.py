@@ -0,0 +1,16 @@
+# management/commands/assign_review_backlog.py
+from django.core.management.base import BaseCommand
+from Education.workload import assign_backlog
+
+class Command(BaseCommand):
+    help = 'Распределяет неназначенные задания очереди между проверяющими курсов по нагрузке'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--course', type=int, action='append',
+                            help='Распределить задания только этих курсов (можно указать несколько раз)')
+
+    def handle(self, *args, **options):
+        assigned = assign_backlog(options['course'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Назначено {assigned} заданий')
+        )
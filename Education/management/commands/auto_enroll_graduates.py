@@ -0,0 +1,21 @@
+# management/commands/auto_enroll_graduates.py
+from django.core.management.base import BaseCommand
+from Education.auto_enrollment import AUTO_ENROLL_BATCH_SIZE, backfill_auto_enrollment
+
+class Command(BaseCommand):
+    help = 'Зачисляет выпускников на курсы, требования которых они выполнили'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--course', type=int, action='append',
+                            help='Учитывать только выпускников этого курса (можно указать несколько раз)')
+        parser.add_argument('--batch-size', type=int, default=AUTO_ENROLL_BATCH_SIZE,
+                            help='Количество студентов в одной транзакции')
+
+    def handle(self, *args, **options):
+        students_count, created_count = backfill_auto_enrollment(
+            course_ids=options['course'],
+            batch_size=options['batch_size']
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f'Проверено {students_count} студентов, создано {created_count} зачислений')
+        )
@@ -0,0 +1,43 @@
+# management/commands/backfill_analytics.py
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from Education.analytics import (
+    ANALYTICS_CHUNK_DAYS, backfill_analytics, get_first_event_date, get_high_water_mark, refresh_analytics
+)
+
+class Command(BaseCommand):
+    help = 'Пересчитывает ежедневную аналитику платформы за период'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', type=date.fromisoformat,
+                            help='Первый день (ГГГГ-ММ-ДД), по умолчанию - день первого события')
+        parser.add_argument('--until', type=date.fromisoformat,
+                            help='Последний день (ГГГГ-ММ-ДД), по умолчанию - сегодня')
+        parser.add_argument('--chunk-days', type=int, default=ANALYTICS_CHUNK_DAYS,
+                            help='Количество дней в одной транзакции')
+        parser.add_argument('--incremental', action='store_true',
+                            help='Догнать rollup от последнего пересчитанного дня до сегодня '
+                                 '(для запуска по расписанию, например раз в 5 минут)')
+
+    def handle(self, *args, **options):
+        if options['incremental']:
+            days_count = refresh_analytics(force=True)
+            self.stdout.write(
+                self.style.SUCCESS(f'Пересчитана аналитика за {days_count} дн. (до {get_high_water_mark()})')
+            )
+            return
+
+        since = options['since'] or get_first_event_date()
+        until = options['until'] or timezone.localdate()
+        if since is None:
+            self.stdout.write('Нет событий для пересчета')
+            return
+        if since > until:
+            raise CommandError('Начало периода позже его конца')
+
+        days_count = backfill_analytics(since, until, chunk_days=max(1, options['chunk_days']))
+        self.stdout.write(
+            self.style.SUCCESS(f'Пересчитана аналитика за {days_count} дн. ({since} — {until})')
+        )
@@ -0,0 +1,108 @@
+# management/commands/benchmark_asgi.py
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+from Education.models import Enrollment
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает задержки кабинета и страниц курса под нагрузкой в WSGI- и ASGI-развертывании. '
+        'Серверы запускаются заранее с одинаковым числом процессов (WEB_CONCURRENCY задает и размер пулов), '
+        'например: WEB_CONCURRENCY=2 gunicorn ProjectDB.wsgi --threads 8 -b :8000 '
+        'и WEB_CONCURRENCY=2 uvicorn ProjectDB.asgi:application --port 8001'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--wsgi-url', default='http://127.0.0.1:8000', help='Адрес WSGI-сервера')
+        parser.add_argument('--asgi-url', default='http://127.0.0.1:8001', help='Адрес ASGI-сервера')
+        parser.add_argument('--requests', type=int, default=600, help='Запросов к каждому серверу')
+        parser.add_argument('--concurrency', type=int, default=32, help='Количество параллельных клиентов')
+        parser.add_argument('--username', help='Студент, под которым открываются страницы')
+
+    def handle(self, *args, **options):
+        enrollment = self._enrollment(options['username'])
+        client = Client()
+        client.force_login(User.objects.get(email=enrollment.student.email))
+        cookie = f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}'
+        paths = [
+            reverse('dashboard'),
+            reverse('course_detail', args=[enrollment.course_id]),
+            reverse('course_modules', args=[enrollment.course_id]),
+        ]
+
+        results = {}
+        for label, base_url in (('WSGI', options['wsgi_url']), ('ASGI', options['asgi_url'])):
+            urls = [base_url.rstrip('/') + path for path in paths]
+            # Прогрев: соединения пулов, шаблоны, кэши процессов сервера
+            self._run(urls, cookie, options['concurrency'] * 2, options['concurrency'])
+            results[label] = self._run(urls, cookie, options['requests'], options['concurrency'])
+
+        for label, (elapsed, timings, errors) in results.items():
+            if not timings:
+                raise CommandError(f'{label}: ни один запрос не выполнен ({errors} ошибок)')
+            timings.sort()
+            self.stdout.write(
+                f'{label}: {len(timings) / elapsed:.1f} запросов/с, '
+                f'медиана {statistics.median(timings):.1f} мс, '
+                f'p95 {timings[int(len(timings) * 0.95)]:.1f} мс, '
+                f'p99 {timings[int(len(timings) * 0.99)]:.1f} мс, ошибок {errors}'
+            )
+        wsgi_p99, asgi_p99 = (timings[int(len(timings) * 0.99)] for _, timings, _ in results.values())
+        self.stdout.write(self.style.SUCCESS(f'p99 ASGI / WSGI: {asgi_p99 / wsgi_p99:.2f}'))
+
+    def _enrollment(self, username):
+        enrollments = Enrollment.objects.filter(
+            student__email__in=User.objects.filter(is_staff=False, is_superuser=False).values('email')
+        ).select_related('student')
+        if username:
+            enrollments = enrollments.filter(
+                student__email__in=User.objects.filter(username=username).values('email')
+            )
+        enrollment = enrollments.order_by('enrollment_id').first()
+        if enrollment is None:
+            raise CommandError('Не найден студент с зачислениями')
+        return enrollment
+
+    def _run(self, urls, cookie, total, concurrency):
+        """Клиенты по кругу запрашивают страницы; ошибкой считается любой ответ, кроме 200"""
+        counter = iter(range(total))
+        lock = threading.Lock()
+        timings = []
+        errors = [0]
+
+        def worker():
+            while True:
+                with lock:
+                    number = next(counter, None)
+                if number is None:
+                    return
+                request = urllib.request.Request(urls[number % len(urls)], headers={'Cookie': cookie})
+                started = time.perf_counter()
+                try:
+                    with urllib.request.urlopen(request, timeout=30) as response:
+                        response.read()
+                        ok = response.status == 200
+                except (urllib.error.URLError, OSError):
+                    ok = False
+                elapsed = (time.perf_counter() - started) * 1000
+                with lock:
+                    if ok:
+                        timings.append(elapsed)
+                    else:
+                        errors[0] += 1
+
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - started, timings, errors[0]
@@ -0,0 +1,132 @@
+# management/commands/benchmark_db_pool.py
+import io
+import statistics
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client
+from django.urls import reverse
+from Education.db_pool import pool_stats
+from Education.models import Enrollment
+
+class Command(BaseCommand):
+    help = 'Сравнивает число запросов в секунду к кабинету студента с пулом соединений и без него'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help='Запросов в каждом режиме')
+        parser.add_argument('--concurrency', type=int, default=8, help='Количество параллельных клиентов')
+        parser.add_argument('--username', help='Студент, под которым открывается кабинет')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Пул соединений есть только у PostgreSQL')
+        pools = {alias: connections.settings[alias]['OPTIONS'].get('pool') for alias in connections}
+        if not any(pools.values()):
+            raise CommandError('Пул не настроен (OPTIONS["pool"] в DATABASES)')
+
+        cookie = self._session_cookie(options['username'])
+        results = {}
+        try:
+            for label, pooled in (('без пула', False), ('с пулом', True)):
+                self._configure(pools, pooled)
+                # Прогрев: загрузка шаблонов, кэшей и (с пулом) открытие min_size соединений
+                self._run(cookie, options['concurrency'], options['concurrency'])
+                results[label] = self._run(cookie, options['requests'], options['concurrency'])
+            stats = pool_stats()
+        finally:
+            self._configure(pools, True)
+
+        for label, (elapsed, timings, errors) in results.items():
+            timings.sort()
+            self.stdout.write(
+                f'{label}: {len(timings) / elapsed:.1f} запросов/с, '
+                f'медиана {statistics.median(timings):.1f} мс, '
+                f'p95 {timings[int(len(timings) * 0.95)]:.1f} мс, ошибок {errors}'
+            )
+        for alias, pool in stats.items():
+            if pool['requests']:
+                self.stdout.write(
+                    f'  пул {alias}: соединений {pool["size"]} (открыто {pool["connections_opened"]}), '
+                    f'выдач {pool["requests"]}, в очереди {pool["queued"]}, '
+                    f'среднее ожидание {pool["acquire_ms_avg"]} мс'
+                )
+        base, pooled = (len(timings) / elapsed for elapsed, timings, _ in results.values())
+        self.stdout.write(self.style.SUCCESS(f'Ускорение с пулом: x{pooled / base:.2f}'))
+
+    def _session_cookie(self, username):
+        users = User.objects.filter(
+            email__in=Enrollment.objects.values('student__email'), is_staff=False, is_superuser=False
+        )
+        user = users.filter(username=username).first() if username else users.order_by('pk').first()
+        if user is None:
+            raise CommandError('Не найден студент с зачислениями')
+        client = Client()
+        client.force_login(user)
+        return f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}'
+
+    def _configure(self, pools, pooled):
+        """Переключает пулы: соединения и пулы закрываются, новые создаются по измененным настройкам"""
+        connections.close_all()
+        for alias, pool in pools.items():
+            if pool:
+                connections[alias].close_pool()
+                options = connections.settings[alias]['OPTIONS']
+                if pooled:
+                    options['pool'] = pool
+                else:
+                    options.pop('pool', None)
+
+    def _run(self, cookie, total, concurrency):
+        """
+        Запросы идут через WSGIHandler, как от сервера приложений: в конце каждого запроса
+        соединения закрываются (без пула) или возвращаются в пул.
+        """
+        handler = WSGIHandler()
+        path = reverse('dashboard')
+        counter = iter(range(total))
+        lock = threading.Lock()
+        timings = []
+        errors = [0]
+
+        def request():
+            environ = {
+                'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'SCRIPT_NAME': '', 'QUERY_STRING': '',
+                'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'HTTP_HOST': 'localhost',
+                'HTTP_COOKIE': cookie, 'wsgi.url_scheme': 'http', 'wsgi.input': io.BytesIO(),
+                'wsgi.errors': io.StringIO(),
+            }
+            status = []
+            response = handler(environ, lambda code, headers: status.append(code))
+            try:
+                b''.join(response)
+            finally:
+                response.close()
+            return status[0].startswith('200')
+
+        def worker():
+            try:
+                while True:
+                    with lock:
+                        if next(counter, None) is None:
+                            return
+                    started = time.perf_counter()
+                    ok = request()
+                    elapsed = (time.perf_counter() - started) * 1000
+                    with lock:
+                        timings.append(elapsed)
+                        errors[0] += not ok
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - started, timings, errors[0]
@@ -0,0 +1,116 @@
+# management/commands/benchmark_progress.py
+import time
+import uuid
+from contextlib import ExitStack
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+from django.test.utils import CaptureQueriesContext
+from Education.models import (
+    Course, Enrollment, Lesson, LessonCompletion, LessonType, Module, Student
+)
+from Education.progress import get_enrollment_progress
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает прогресс по модулям курса: прежний подсчет запросами на каждый модуль '
+        'и общее дерево прогресса (Module.get_module_progress и progress.get_enrollment_progress)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modules', type=int, default=50, help='Модулей в курсе')
+        parser.add_argument('--lessons', type=int, default=20, help='Уроков в модуле')
+        parser.add_argument('--repeat', type=int, default=5, help='Повторов каждого замера')
+
+    def handle(self, *args, **options):
+        marker = uuid.uuid4().hex[:8]
+        course, student, user = self._create_fixture(marker, options['modules'], options['lessons'])
+        try:
+            modules = list(course.modules.order_by('module_order'))
+            enrollment = Enrollment.objects.get(student=student, course=course)
+
+            def legacy():
+                return [self._legacy_module_progress(module, user) for module in modules]
+
+            def module_methods():
+                # Новый объект пользователя: дерево не запомнено с прошлого повтора
+                fresh_user = User.objects.get(pk=user.pk)
+                return [module.get_module_progress(fresh_user) for module in modules]
+
+            def tree():
+                progress = get_enrollment_progress(enrollment)
+                return [progress.module(module.module_id).percentage for module in modules]
+
+            expected = legacy()
+            for label, measure in (
+                ('запрос на каждый модуль', legacy),
+                ('Module.get_module_progress', module_methods),
+                ('get_enrollment_progress', tree),
+            ):
+                queries, elapsed, result = self._measure(measure, options['repeat'])
+                if result != expected:
+                    self.stdout.write(self.style.ERROR(f'{label}: прогресс расходится с прежним подсчетом'))
+                self.stdout.write(f'{label}: {queries} запросов, {elapsed:.1f} мс')
+        finally:
+            course.delete()
+            student.delete()
+            user.delete()
+
+    def _measure(self, measure, repeat):
+        """Число запросов к базе (по всем подключениям) и лучшее время из repeat повторов"""
+        timings = []
+        for _ in range(repeat):
+            with ExitStack() as stack:
+                contexts = [
+                    stack.enter_context(CaptureQueriesContext(connections[alias])) for alias in connections
+                ]
+                started = time.perf_counter()
+                result = measure()
+                timings.append((time.perf_counter() - started) * 1000)
+        return sum(len(context) for context in contexts), min(timings), result
+
+    def _legacy_module_progress(self, module, user):
+        """Прежняя реализация Module.get_module_progress: студент, зачисление и два COUNT на модуль"""
+        total = module.lessons.count()
+        if total == 0:
+            return 0
+        enrollment = Enrollment.objects.get(student=Student.objects.get(email=user.email), course_id=module.course_id)
+        completed = LessonCompletion.objects.filter(
+            enrollment=enrollment,
+            lesson__module=module,
+            lesson__is_active=True
+        ).count()
+        return int((completed / total) * 100)
+
+    @transaction.atomic
+    def _create_fixture(self, marker, modules, lessons):
+        course = Course.objects.create(
+            title=f'Замер прогресса {marker}',
+            description='Временный курс замера прогресса',
+            duration_weeks=1,
+            price=0,
+            is_active=False,
+        )
+        Module.objects.bulk_create(
+            Module(course=course, title=f'Модуль {number}', module_order=number)
+            for number in range(1, modules + 1)
+        )
+        Lesson.objects.bulk_create(
+            Lesson(
+                module=module, title=f'Урок {number}', lesson_order=number, duration_minutes=1,
+                content='-', lesson_type=LessonType.PRACTICE, has_homework=True, max_score=100,
+            )
+            for module in course.modules.all()
+            for number in range(1, lessons + 1)
+        )
+        email = f'progress-{marker}@example.com'
+        user = User.objects.create_user(f'progress-{marker}', email)
+        student = Student.objects.create(first_name='Замер', last_name='Прогресса', email=email)
+        enrollment = Enrollment.objects.create(student=student, course=course)
+        # Пройдена первая половина уроков каждого модуля
+        LessonCompletion.objects.bulk_create(
+            LessonCompletion(enrollment=enrollment, lesson=lesson, score=80)
+            for lesson in Lesson.objects.filter(module__course=course, lesson_order__lte=lessons // 2)
+        )
+        return course, student, user
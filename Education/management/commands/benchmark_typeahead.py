@@ -0,0 +1,79 @@
+# management/commands/benchmark_typeahead.py
+import itertools
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from Education.typeahead import PrefixIndex, TYPEAHEAD_LIMIT
+
+SYLLABLES = (
+    'ба', 'ве', 'ги', 'до', 'ку', 'ло', 'ми', 'на', 'ро', 'си', 'та', 'фу', 'ха', 'це', 'ша',
+    'py', 'th', 'on', 'ja', 'va', 'da', 'ta', 'we', 'bi', 'ko', 'ru', 'st', 'go', 'sq', 'li',
+)
+
+
+def make_vocabulary(rnd, size):
+    words = set()
+    while len(words) < size:
+        words.add(''.join(rnd.choice(SYLLABLES) for _ in range(rnd.randint(2, 5))))
+    return sorted(words)
+
+
+class Command(BaseCommand):
+    help = 'Замеряет построение и поиск префиксного индекса подсказок на синтетических названиях'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=100000, help='Количество названий')
+        parser.add_argument('--queries', type=int, default=20000, help='Количество запросов')
+        parser.add_argument('--vocabulary', type=int, default=20000, help='Размер словаря')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rnd = random.Random(options['seed'])
+        vocabulary = make_vocabulary(rnd, options['vocabulary'])
+        # Частоты слов по закону Ципфа, как в реальных названиях
+        weights = list(itertools.accumulate(1 / rank for rank in range(1, len(vocabulary) + 1)))
+
+        def title():
+            return ' '.join(rnd.choices(vocabulary, cum_weights=weights, k=rnd.randint(2, 5)))
+
+        entries = [
+            (ident, title(), rnd.randint(0, 5000), ())
+            for ident in range(1, options['size'] + 1)
+        ]
+
+        started = time.perf_counter()
+        index = PrefixIndex.build(entries)
+        build_time = time.perf_counter() - started
+
+        queries = []
+        for _ in range(options['queries']):
+            words = rnd.choices(vocabulary, cum_weights=weights, k=rnd.randint(1, 2))
+            words[-1] = words[-1][:rnd.randint(1, len(words[-1]))]
+            queries.append(' '.join(words))
+
+        # В первом проходе строятся головы широких префиксов, второй - рабочий режим
+        for label in ('холодный', 'повторный'):
+            timings = {1: [], 2: []}
+            for query in queries:
+                started = time.perf_counter()
+                index.search(query, TYPEAHEAD_LIMIT)
+                timings[len(query.split())].append((time.perf_counter() - started) * 1000)
+            for words, values in timings.items():
+                values.sort()
+                self.stdout.write(
+                    f'{label}, слов в запросе {words}: медиана {statistics.median(values):.3f} мс, '
+                    f'p90 {values[int(len(values) * 0.9)]:.3f} мс, '
+                    f'p99 {values[int(len(values) * 0.99)]:.3f} мс'
+                )
+
+        started = time.perf_counter()
+        for ident in range(1, 1001):
+            index.add(ident, title(), rnd.randint(0, 5000))
+        update_time = (time.perf_counter() - started) * 1000 / 1000
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(index)} названий: построение {build_time:.2f} с, '
+            f'обновление элемента {update_time:.3f} мс'
+        ))
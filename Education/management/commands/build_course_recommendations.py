@@ -0,0 +1,24 @@
+# management/commands/build_course_recommendations.py
+from django.core.management.base import BaseCommand
+from Education.recommendations import (
+    RECOMMENDATION_BATCH_SIZE, RECOMMENDATION_MIN_COMMON, RECOMMENDATION_NEIGHBORS, build_course_neighbors
+)
+
+class Command(BaseCommand):
+    help = 'Пересчитывает похожие курсы по истории зачислений (для рекомендаций)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--neighbors', type=int, default=RECOMMENDATION_NEIGHBORS,
+                            help='Сколько похожих курсов хранить для каждого курса')
+        parser.add_argument('--batch-size', type=int, default=RECOMMENDATION_BATCH_SIZE,
+                            help='Количество студентов, читаемых за один запрос')
+        parser.add_argument('--min-common', type=int, default=RECOMMENDATION_MIN_COMMON,
+                            help='Минимальное число общих студентов у пары курсов')
+
+    def handle(self, *args, **options):
+        count = build_course_neighbors(
+            neighbors=options['neighbors'],
+            batch_size=options['batch_size'],
+            min_common=options['min_common']
+        )
+        self.stdout.write(self.style.SUCCESS(f'Сохранено {count} пар похожих курсов'))
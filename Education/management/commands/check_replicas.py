@@ -0,0 +1,23 @@
+# management/commands/check_replicas.py
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from Education.replicas import REPLICA_MAX_LAG, probe_replicas
+
+class Command(BaseCommand):
+    help = 'Проверяет доступность и отставание реплик чтения'
+
+    def handle(self, *args, **options):
+        lags = probe_replicas()
+        if not lags:
+            self.stdout.write('Реплики не настроены (DATABASE_REPLICAS)')
+            return
+        max_lag = getattr(settings, 'REPLICA_MAX_LAG', REPLICA_MAX_LAG)
+        for alias, lag in lags.items():
+            if lag is None:
+                self.stdout.write(self.style.ERROR(f'{alias}: недоступна, выведена из ротации'))
+            elif lag > max_lag:
+                self.stdout.write(self.style.WARNING(
+                    f'{alias}: отставание {lag:.1f} с (больше {max_lag} с), выведена из ротации'
+                ))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'{alias}: отставание {lag:.1f} с'))
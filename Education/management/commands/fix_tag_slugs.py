@@ -1,36 +1,26 @@
 # management/commands/fix_tag_slugs.py
 from django.core.management.base import BaseCommand
-from django.utils.text import slugify
+from django.db.models import Q
 from Education.models import Tag
+from Education.tags import SlugAllocator
 
 class Command(BaseCommand):
     help = 'Исправляет пустые и дублирующиеся slug для тегов'
 
     def handle(self, *args, **options):
-        tags = Tag.objects.all()
-        fixed_count = 0
+        empty = Q(slug='') | Q(slug__isnull=True)
+        tags = list(Tag.objects.filter(empty).order_by('tag_id'))
         
+        # Занятые slug читаются одним запросом, суффиксы подбираются в памяти
+        allocator = SlugAllocator(Tag.objects.exclude(empty).values_list('slug', flat=True))
         for tag in tags:
             original_slug = tag.slug
-            
-            # Если slug пустой или None, генерируем новый
-            if not tag.slug:
-                base_slug = slugify(tag.name)
-                new_slug = base_slug
-                counter = 1
-                
-                # Проверяем уникальность
-                while Tag.objects.filter(slug=new_slug).exclude(pk=tag.pk).exists():
-                    new_slug = f"{base_slug}-{counter}"
-                    counter += 1
-                
-                tag.slug = new_slug
-                tag.save()
-                fixed_count += 1
-                self.stdout.write(
-                    f'Исправлен тег "{tag.name}": {original_slug} -> {new_slug}'
-                )
+            tag.slug = allocator.allocate(tag.name)
+            self.stdout.write(
+                f'Исправлен тег "{tag.name}": {original_slug} -> {tag.slug}'
+            )
+        Tag.objects.bulk_update(tags, ['slug'])
         
         self.stdout.write(
-            self.style.SUCCESS(f'Исправлено {fixed_count} тегов из {tags.count()}')
-        )
\ No newline at end of file
+            self.style.SUCCESS(f'Исправлено {len(tags)} тегов из {Tag.objects.count()}')
+        )
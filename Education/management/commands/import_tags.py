@@ -0,0 +1,34 @@
+# management/commands/import_tags.py
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+from Education.models import Tag
+from Education.tags import TAG_IMPORT_BATCH_SIZE, import_tags
+
+class Command(BaseCommand):
+    help = 'Массово создает теги из CSV (колонки: name, description, color, is_featured)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV-файл с заголовком')
+        parser.add_argument('--batch-size', type=int, default=TAG_IMPORT_BATCH_SIZE,
+                            help='Количество тегов в одном INSERT')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['path'], newline='', encoding='utf-8-sig') as file:
+                rows = list(csv.DictReader(file))
+        except OSError as error:
+            raise CommandError(f'Не удалось прочитать файл: {error}')
+        if rows and 'name' not in rows[0]:
+            raise CommandError('В файле нет колонки name')
+
+        too_long = [row['name'] for row in rows if len(row.get('name') or '') > Tag._meta.get_field('name').max_length]
+        if too_long:
+            raise CommandError(f'Слишком длинные названия: {", ".join(too_long[:5])}')
+
+        for row in rows:
+            row['is_featured'] = (row.get('is_featured') or '').strip().lower() in ('1', 'true', 'yes', 'да')
+        created = import_tags(rows, batch_size=options['batch_size'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Создано {len(created)} тегов из {len(rows)} строк')
+        )
@@ -0,0 +1,113 @@
+# management/commands/loadtest_review_queue.py
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+from Education.models import (
+    Course, Enrollment, Homework, HomeworkSubmission, Lesson, Module, Reviewer, Student,
+    TeacherCourse, UrgencyLevel
+)
+from Education.review_queue import claim_submissions
+
+class Command(BaseCommand):
+    help = 'Нагрузочный тест очереди проверки: параллельные проверяющие разбирают очередь'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=16, help='Количество параллельных проверяющих')
+        parser.add_argument('--submissions', type=int, default=2000, help='Размер очереди')
+        parser.add_argument('--batch-size', type=int, default=5, help='Заданий за одно взятие')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('SKIP LOCKED проверяется только на PostgreSQL')
+
+        marker = uuid.uuid4().hex[:8]
+        course, reviewers, student = self._create_fixture(marker, options['workers'], options['submissions'])
+        claims = []
+        claims_lock = threading.Lock()
+
+        def worker(reviewer):
+            try:
+                while True:
+                    claimed = claim_submissions(
+                        reviewer, options['batch_size'], course_ids=[course.course_id]
+                    )
+                    if not claimed:
+                        return
+                    with claims_lock:
+                        claims.extend(submission.pk for submission in claimed)
+            finally:
+                connections.close_all()
+
+        try:
+            threads = [threading.Thread(target=worker, args=(reviewer,)) for reviewer in reviewers]
+            started = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - started
+
+            duplicates = [pk for pk, count in Counter(claims).items() if count > 1]
+            left = HomeworkSubmission.objects.filter(
+                enrollment__course=course, reviewer__isnull=True
+            ).count()
+            self.stdout.write(
+                f'Взято {len(claims)} заданий за {elapsed:.2f} с '
+                f'({len(claims) / elapsed:.0f} в секунду), '
+                f'повторно выданных: {len(duplicates)}, осталось в очереди: {left}'
+            )
+            if duplicates or left or len(claims) != options['submissions']:
+                raise CommandError('Очередь выдала задания с ошибками')
+            self.stdout.write(self.style.SUCCESS('Каждое задание выдано ровно один раз'))
+        finally:
+            course.delete()
+            Reviewer.objects.filter(pk__in=[reviewer.pk for reviewer in reviewers]).delete()
+            student.delete()
+
+    @transaction.atomic
+    def _create_fixture(self, marker, workers, size):
+        course = Course.objects.create(
+            title=f'Нагрузочный тест очереди {marker}',
+            description='Временный курс нагрузочного теста',
+            duration_weeks=1,
+            price=0,
+            is_active=False,
+        )
+        module = Module.objects.create(course=course, title='Модуль', module_order=1)
+        lesson = Lesson.objects.create(
+            module=module, title='Урок', lesson_order=1, duration_minutes=1, content='-'
+        )
+        homework = Homework.objects.create(
+            lesson=lesson, title='Задание', description='-', deadline_days=1
+        )
+        student = Student.objects.create(
+            first_name='Нагрузочный', last_name='Тест', email=f'loadtest-{marker}@example.com'
+        )
+        enrollment = Enrollment.objects.create(student=student, course=course)
+        urgencies = list(UrgencyLevel.values)
+        HomeworkSubmission.objects.bulk_create(
+            HomeworkSubmission(
+                homework=homework,
+                enrollment=enrollment,
+                submission_text='-',
+                urgency=urgencies[i % len(urgencies)],
+            )
+            for i in range(size)
+        )
+        reviewers = [
+            Reviewer.objects.create(
+                first_name='Проверяющий', last_name=str(i),
+                email=f'loadtest-{marker}-{i}@example.com',
+                hire_date=date.today(), specialization='-', is_approved=True,
+            )
+            for i in range(workers)
+        ]
+        TeacherCourse.objects.bulk_create(
+            TeacherCourse(reviewer=reviewer, course=course) for reviewer in reviewers
+        )
+        return course, reviewers, student
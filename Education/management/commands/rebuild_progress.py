@@ -0,0 +1,37 @@
+# management/commands/rebuild_progress.py
+from django.core.management.base import BaseCommand
+from django.db.models import Max, Min
+from Education.models import Enrollment
+from Education.progress import rebuild_enrollment_counters
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованные счетчики прогресса в зачислениях'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--course', type=int, help='Пересчитать только зачисления этого курса')
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Количество зачислений в одной транзакции')
+
+    def handle(self, *args, **options):
+        enrollments = Enrollment.objects.all()
+        if options['course']:
+            enrollments = enrollments.filter(course_id=options['course'])
+        
+        bounds = enrollments.aggregate(first=Min('enrollment_id'), last=Max('enrollment_id'))
+        if bounds['first'] is None:
+            self.stdout.write('Нет зачислений для пересчета')
+            return
+        
+        # Пересчитываем диапазонами первичного ключа, чтобы не держать длинные блокировки
+        batch_size = options['batch_size']
+        updated_count = 0
+        for start in range(bounds['first'], bounds['last'] + 1, batch_size):
+            batch = enrollments.filter(
+                enrollment_id__gte=start,
+                enrollment_id__lt=start + batch_size
+            )
+            updated_count += rebuild_enrollment_counters(batch)
+        
+        self.stdout.write(
+            self.style.SUCCESS(f'Пересчитано {updated_count} зачислений')
+        )
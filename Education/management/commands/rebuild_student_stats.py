@@ -0,0 +1,37 @@
+# management/commands/rebuild_student_stats.py
+from django.core.management.base import BaseCommand
+from django.db.models import Max, Min
+from Education.models import Student
+from Education.student_stats import STATS_BATCH_SIZE, rebuild_student_stats
+
+class Command(BaseCommand):
+    help = 'Пересчитывает сводную статистику студентов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--student', type=int, help='Пересчитать только этого студента')
+        parser.add_argument('--batch-size', type=int, default=STATS_BATCH_SIZE,
+                            help='Количество студентов в одной пачке')
+
+    def handle(self, *args, **options):
+        students = Student.objects.all()
+        if options['student']:
+            students = students.filter(student_id=options['student'])
+
+        bounds = students.aggregate(first=Min('student_id'), last=Max('student_id'))
+        if bounds['first'] is None:
+            self.stdout.write('Нет студентов для пересчета')
+            return
+
+        # Диапазонами первичного ключа: каждая пачка - несколько сгруппированных запросов
+        batch_size = options['batch_size']
+        updated_count = 0
+        for start in range(bounds['first'], bounds['last'] + 1, batch_size):
+            student_ids = students.filter(
+                student_id__gte=start,
+                student_id__lt=start + batch_size
+            ).values_list('student_id', flat=True)
+            updated_count += rebuild_student_stats(student_ids)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Пересчитана статистика {updated_count} студентов')
+        )
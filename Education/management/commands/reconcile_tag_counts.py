@@ -0,0 +1,12 @@
+# management/commands/reconcile_tag_counts.py
+from django.core.management.base import BaseCommand
+from Education.tags import reconcile_tag_counts
+
+class Command(BaseCommand):
+    help = 'Сверяет счетчики курсов у тегов со связями курсов и исправляет расхождения'
+
+    def handle(self, *args, **options):
+        fixed_count = reconcile_tag_counts()
+        self.stdout.write(
+            self.style.SUCCESS(f'Исправлены счетчики {fixed_count} тегов')
+        )
@@ -0,0 +1,12 @@
+# management/commands/requeue_expired_claims.py
+from django.core.management.base import BaseCommand
+from Education.review_queue import requeue_expired
+
+class Command(BaseCommand):
+    help = 'Возвращает в очередь задания, аренда проверки которых истекла, и заново назначает их проверяющим'
+
+    def handle(self, *args, **options):
+        requeued = requeue_expired()
+        self.stdout.write(
+            self.style.SUCCESS(f'Возвращено в очередь {requeued} заданий')
+        )
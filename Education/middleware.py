@@ -1,19 +1,84 @@
 # middleware.py
-from django.utils.deprecation import MiddlewareMixin
-from .models import Student, Reviewer
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.utils.functional import SimpleLazyObject
+from .profile import UserProfile
+from .replicas import configured_replicas
+from .routers import (
+    PRIMARY_COOKIE, READ_YOUR_WRITES_WINDOW, role_for_request, use_db_role, wrote_to_primary,
+)
 
-class UserTypeMiddleware(MiddlewareMixin):
+class HybridMiddleware:
+    """
+    Основа middleware, работающего и под WSGI, и под ASGI без переключения потоков:
+    синхронная цепочка вызывает handle, асинхронная - ahandle.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.ahandle(request)
+        return self.handle(request)
+
+
+class UserTypeMiddleware(HybridMiddleware):
     """Определяет тип пользователя и добавляет в request"""
-    
+
     def process_request(self, request):
-        if request.user.is_authenticated and not request.user.is_anonymous:
-            try:
-                Student.objects.get(email=request.user.email)
-                request.user_type = 'student'
-            except Student.DoesNotExist:
-                try:
-                    Reviewer.objects.get(email=request.user.email)
-                    request.user_type = 'reviewer'
-                except Reviewer.DoesNotExist:
-                    request.user_type = 'unregistered'
-        return None
\ No newline at end of file
+        profile = UserProfile(request)
+        request.profile = profile
+        request.user_type = SimpleLazyObject(lambda: profile.user_type)
+        if request.user.is_authenticated:
+            request.user._education_profile = profile
+        return None
+
+    def handle(self, request):
+        self.process_request(request)
+        return self.get_response(request)
+
+    async def ahandle(self, request):
+        # В асинхронном контексте ленивый request.user не вычислить: пользователь загружается заранее
+        request.user = await request.auser()
+        self.process_request(request)
+        return await self.get_response(request)
+
+
+class DatabaseRoleMiddleware(HybridMiddleware):
+    """
+    Выполняет запрос под ролью базы данных пользователя (см. routers.RoleRouter).
+    После записи ставит cookie: READ_YOUR_WRITES_WINDOW секунд пользователь читает только
+    с мастера и видит свои изменения, даже если реплики еще не догнали.
+    Роль хранится в контекстной переменной, поэтому видна и в потоках sync_to_async.
+    """
+
+    def handle(self, request):
+        # Роль определяется до входа в контекст: запросы профиля идут через default
+        role = role_for_request(request)
+        request.db_role = role
+        with use_db_role(role, pinned=PRIMARY_COOKIE in request.COOKIES):
+            response = self.get_response(request)
+            wrote = wrote_to_primary()
+        return self._pin_to_primary(response, wrote)
+
+    async def ahandle(self, request):
+        role = await sync_to_async(role_for_request)(request)
+        request.db_role = role
+        with use_db_role(role, pinned=PRIMARY_COOKIE in request.COOKIES):
+            response = await self.get_response(request)
+            wrote = wrote_to_primary()
+        return self._pin_to_primary(response, wrote)
+
+    def _pin_to_primary(self, response, wrote):
+        if wrote and configured_replicas():
+            response.set_cookie(
+                PRIMARY_COOKIE, '1',
+                max_age=getattr(settings, 'READ_YOUR_WRITES_WINDOW', READ_YOUR_WRITES_WINDOW),
+                httponly=True, samesite='Lax',
+            )
+        return response
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:00
+
+from django.db import migrations, models
+from django.db.models import Count, F, IntegerField, Max, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def fill_progress_counters(apps, schema_editor):
+    # Счетчики заполняются так же, как их пересчитывает команда rebuild_progress:
+    # completed/total_required_lessons - по активным обязательным урокам, score_sum - по активным
+    Enrollment = apps.get_model('Education', 'Enrollment')
+    Lesson = apps.get_model('Education', 'Lesson')
+    LessonCompletion = apps.get_model('Education', 'LessonCompletion')
+
+    total_required = Lesson.objects.filter(
+        module__course_id=OuterRef('course_id'), is_active=True, is_required=True
+    ).order_by().values('module__course_id').annotate(c=Count('lesson_id')).values('c')
+    completions = LessonCompletion.objects.filter(
+        enrollment_id=OuterRef('pk'),
+        lesson__module__course_id=OuterRef('course_id'),
+    ).order_by().values('enrollment_id')
+    completed_required = completions.filter(
+        lesson__is_active=True, lesson__is_required=True
+    ).annotate(c=Count('completion_id')).values('c')
+    score_sum = completions.filter(lesson__is_active=True).annotate(s=Sum('score')).values('s')
+    last_activity = completions.annotate(m=Max('completed_at')).values('m')
+
+    Enrollment.objects.update(
+        total_required_lessons=Coalesce(Subquery(total_required, output_field=IntegerField()), 0),
+        completed_required_lessons=Coalesce(Subquery(completed_required, output_field=IntegerField()), 0),
+        score_sum=Coalesce(Subquery(score_sum, output_field=IntegerField()), 0),
+        last_activity_at=Coalesce(Subquery(last_activity), F('last_activity_at')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Education', '0008_remove_certificate_certificate_url'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='enrollment',
+            name='completed_required_lessons',
+            field=models.PositiveIntegerField(default=0, verbose_name='Завершено обязательных уроков'),
+        ),
+        migrations.AddField(
+            model_name='enrollment',
+            name='total_required_lessons',
+            field=models.PositiveIntegerField(default=0, verbose_name='Всего обязательных уроков'),
+        ),
+        migrations.AddField(
+            model_name='enrollment',
+            name='score_sum',
+            field=models.PositiveIntegerField(default=0, verbose_name='Сумма баллов'),
+        ),
+        migrations.AddField(
+            model_name='enrollment',
+            name='last_activity_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Последняя активность'),
+        ),
+        migrations.RunPython(fill_progress_counters, migrations.RunPython.noop),
+    ]
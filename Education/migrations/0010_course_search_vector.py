@@ -0,0 +1,76 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:30
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+COURSE_INDEXES = [
+    django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='courses_search_vector_gin'),
+    django.contrib.postgres.indexes.GinIndex(fields=['title'], name='courses_title_trgm', opclasses=['gin_trgm_ops']),
+]
+
+
+def create_indexes(apps, schema_editor):
+    # GIN-индексы существуют только в PostgreSQL (на SQLite поиск идет через icontains)
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    Course = apps.get_model('Education', 'Course')
+    for index in COURSE_INDEXES:
+        schema_editor.add_index(Course, index)
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    Course = apps.get_model('Education', 'Course')
+    for index in COURSE_INDEXES:
+        schema_editor.remove_index(Course, index)
+
+
+def fill_search_vectors(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("""
+        UPDATE courses c SET search_vector =
+            setweight(to_tsvector('russian', coalesce(c.title, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(c.title, '')), 'A') ||
+            setweight(to_tsvector('russian', coalesce(t.names, '')), 'B') ||
+            setweight(to_tsvector('english', coalesce(t.names, '')), 'B') ||
+            setweight(to_tsvector('russian', coalesce(c.description, '')), 'C') ||
+            setweight(to_tsvector('english', coalesce(c.description, '')), 'C')
+        FROM courses c2
+        LEFT JOIN (
+            SELECT ct.course_id, string_agg(tg.name, ' ') AS names
+            FROM course_tags ct
+            JOIN tags tg ON tg.tag_id = ct.tag_id
+            GROUP BY ct.course_id
+        ) t ON t.course_id = c2.course_id
+        WHERE c2.course_id = c.course_id
+    """)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Education', '0009_enrollment_progress_counters'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='course',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(model_name='course', index=index) for index in COURSE_INDEXES
+            ],
+            database_operations=[
+                migrations.RunPython(create_indexes, drop_indexes),
+            ],
+        ),
+        migrations.RunPython(fill_search_vectors, migrations.RunPython.noop),
+    ]
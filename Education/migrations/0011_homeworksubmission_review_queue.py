@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Education', '0010_course_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='homeworksubmission',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Взято на проверку'),
+        ),
+        migrations.AddField(
+            model_name='homeworksubmission',
+            name='lease_expires_at',
+            field=models.DateTimeField(blank=True, help_text='После этого времени задание возвращается в очередь', null=True, verbose_name='Проверка закреплена до'),
+        ),
+        migrations.AddIndex(
+            model_name='homeworksubmission',
+            index=models.Index(fields=['status', 'urgency', 'submitted_at'], name='submissions_queue_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='homeworksubmission',
+            index=models.Index(fields=['status', 'lease_expires_at'], name='submissions_lease_idx'),
+        ),
+    ]
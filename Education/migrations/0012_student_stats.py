@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2026-10-18 13:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Education', '0011_homeworksubmission_review_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentStats',
+            fields=[
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='Education.student', verbose_name='Студент')),
+                ('courses_count', models.PositiveIntegerField(default=0, verbose_name='Курсов')),
+                ('completed_courses_count', models.PositiveIntegerField(default=0, verbose_name='Завершено курсов')),
+                ('lessons_completed', models.PositiveIntegerField(default=0, verbose_name='Завершено уроков')),
+                ('total_score', models.PositiveIntegerField(default=0, verbose_name='Сумма баллов')),
+                ('max_score', models.PositiveIntegerField(default=0, verbose_name='Максимально возможный балл')),
+                ('current_streak', models.PositiveIntegerField(default=0, verbose_name='Текущая серия (дней)')),
+                ('longest_streak', models.PositiveIntegerField(default=0, verbose_name='Лучшая серия (дней)')),
+                ('last_activity_date', models.DateField(blank=True, null=True, verbose_name='День последней активности')),
+                ('last_activity_at', models.DateTimeField(blank=True, null=True, verbose_name='Последняя активность')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+            ],
+            options={
+                'verbose_name': 'Статистика студента',
+                'verbose_name_plural': 'Статистика студентов',
+                'db_table': 'student_stats',
+            },
+        ),
+    ]
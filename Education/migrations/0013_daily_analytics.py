@@ -0,0 +1,74 @@
+# Generated by Django 5.2.7 on 2026-10-18 14:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Education', '0012_student_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyStats',
+            fields=[
+                ('new_enrollments', models.PositiveIntegerField(default=0, verbose_name='Новых зачислений')),
+                ('completed_courses', models.PositiveIntegerField(default=0, verbose_name='Завершено курсов')),
+                ('course_score_sum', models.PositiveIntegerField(default=0, verbose_name='Сумма итоговых баллов')),
+                ('course_score_count', models.PositiveIntegerField(default=0, verbose_name='Итоговых баллов')),
+                ('lessons_completed', models.PositiveIntegerField(default=0, verbose_name='Завершено уроков')),
+                ('lesson_score_sum', models.PositiveIntegerField(default=0, verbose_name='Сумма баллов за уроки')),
+                ('lesson_score_count', models.PositiveIntegerField(default=0, verbose_name='Оценок за уроки')),
+                ('submissions', models.PositiveIntegerField(default=0, verbose_name='Отправлено заданий')),
+                ('reviewed_submissions', models.PositiveIntegerField(default=0, verbose_name='Проверено заданий')),
+                ('review_score_sum', models.PositiveIntegerField(default=0, verbose_name='Сумма баллов за задания')),
+                ('review_score_count', models.PositiveIntegerField(default=0, verbose_name='Оценок за задания')),
+                ('date', models.DateField(primary_key=True, serialize=False, verbose_name='День')),
+                ('new_students', models.PositiveIntegerField(default=0, verbose_name='Новых студентов')),
+                ('new_courses', models.PositiveIntegerField(default=0, verbose_name='Новых курсов')),
+                ('enrollments_by_status', models.JSONField(default=dict, verbose_name='Зачисления по статусам')),
+                ('refreshed_at', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+            ],
+            options={
+                'verbose_name': 'Статистика за день',
+                'verbose_name_plural': 'Статистика по дням',
+                'db_table': 'daily_stats',
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyCourseStats',
+            fields=[
+                ('new_enrollments', models.PositiveIntegerField(default=0, verbose_name='Новых зачислений')),
+                ('completed_courses', models.PositiveIntegerField(default=0, verbose_name='Завершено курсов')),
+                ('course_score_sum', models.PositiveIntegerField(default=0, verbose_name='Сумма итоговых баллов')),
+                ('course_score_count', models.PositiveIntegerField(default=0, verbose_name='Итоговых баллов')),
+                ('lessons_completed', models.PositiveIntegerField(default=0, verbose_name='Завершено уроков')),
+                ('lesson_score_sum', models.PositiveIntegerField(default=0, verbose_name='Сумма баллов за уроки')),
+                ('lesson_score_count', models.PositiveIntegerField(default=0, verbose_name='Оценок за уроки')),
+                ('submissions', models.PositiveIntegerField(default=0, verbose_name='Отправлено заданий')),
+                ('reviewed_submissions', models.PositiveIntegerField(default=0, verbose_name='Проверено заданий')),
+                ('review_score_sum', models.PositiveIntegerField(default=0, verbose_name='Сумма баллов за задания')),
+                ('review_score_count', models.PositiveIntegerField(default=0, verbose_name='Оценок за задания')),
+                ('stat_id', models.AutoField(primary_key=True, serialize=False)),
+                ('date', models.DateField(verbose_name='День')),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='Education.course', verbose_name='Курс')),
+            ],
+            options={
+                'verbose_name': 'Статистика курса за день',
+                'verbose_name_plural': 'Статистика курсов по дням',
+                'db_table': 'daily_course_stats',
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='dailycoursestats',
+            index=models.Index(fields=['course', 'date'], name='daily_course_stats_course_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='dailycoursestats',
+            unique_together={('date', 'course')},
+        ),
+    ]
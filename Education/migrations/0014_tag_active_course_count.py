@@ -0,0 +1,39 @@
+# Generated by Django 5.2.7 on 2026-10-18 15:00
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_tag_counts(apps, schema_editor):
+    # course_count раньше не обновлялся: заполняем оба счетчика по связям курсов
+    Tag = apps.get_model('Education', 'Tag')
+    CourseTag = apps.get_model('Education', 'CourseTag')
+
+    def count(links):
+        counts = links.filter(tag_id=OuterRef('tag_id')).order_by().values('tag_id').annotate(
+            c=Count('*')
+        ).values('c')
+        return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+    links = CourseTag.objects.all()
+    Tag.objects.update(
+        course_count=count(links),
+        active_course_count=count(links.filter(course__is_active=True)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Education', '0013_daily_analytics'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tag',
+            name='active_course_count',
+            field=models.IntegerField(default=0, verbose_name='Количество активных курсов'),
+        ),
+        migrations.RunPython(fill_tag_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Education', '0014_tag_active_course_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseNeighbor',
+            fields=[
+                ('course_neighbor_id', models.AutoField(primary_key=True, serialize=False)),
+                ('score', models.FloatField(verbose_name='Косинусное сходство')),
+                ('common_students', models.PositiveIntegerField(verbose_name='Общих студентов')),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='neighbors', to='Education.course', verbose_name='Курс')),
+                ('neighbor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='Education.course', verbose_name='Похожий курс')),
+            ],
+            options={
+                'verbose_name': 'Похожий курс',
+                'verbose_name_plural': 'Похожие курсы',
+                'db_table': 'course_neighbors',
+                'ordering': ['course', '-score'],
+                'unique_together': {('course', 'neighbor')},
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:20
+# Индекс очереди проверки по тому же выражению срочности, что и ORDER BY выдачи
+# (review_queue.QUEUE_ORDERING)
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Education', '0015_course_neighbors'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='homeworksubmission',
+            name='submissions_queue_idx',
+        ),
+        migrations.AddIndex(
+            model_name='homeworksubmission',
+            index=models.Index(
+                models.Case(
+                    models.When(then=models.Value(0), urgency='critical'),
+                    models.When(then=models.Value(1), urgency='high'),
+                    models.When(then=models.Value(2), urgency='normal'),
+                    models.When(then=models.Value(3), urgency='low'),
+                    default=models.Value(4),
+                    output_field=models.IntegerField(),
+                ),
+                models.F('submitted_at'),
+                name='submissions_queue_rank_idx',
+            ),
+        ),
+    ]
@@ -1,4 +1,6 @@
-from django.db import models
+from django.db import models, router, transaction
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone, text
 from django.core.exceptions import ValidationError
@@ -59,6 +61,24 @@ class UrgencyLevel(models.TextChoices):
     CRITICAL = 'critical', 'Критический'
 
 
+# Порядок срочности в очереди проверки: от самой срочной
+URGENCY_PRIORITY = (
+    UrgencyLevel.CRITICAL,
+    UrgencyLevel.HIGH,
+    UrgencyLevel.NORMAL,
+    UrgencyLevel.LOW,
+)
+
+
+def urgency_rank():
+    """Место срочности в URGENCY_PRIORITY (выражение; по нему же построен индекс очереди)"""
+    return models.Case(
+        *[models.When(urgency=urgency, then=models.Value(rank)) for rank, urgency in enumerate(URGENCY_PRIORITY)],
+        default=models.Value(len(URGENCY_PRIORITY)),
+        output_field=models.IntegerField(),
+    )
+
+
 class RequirementType(models.TextChoices):
     MANDATORY = 'mandatory', 'Обязательно'
     RECOMMENDED = 'recommended', 'Рекомендуется'
@@ -72,6 +92,33 @@ class UserStatus(models.TextChoices):
     GRADUATED = 'graduated', 'Выпускник'
 
 
+def _student_for(user):
+    """Студент пользователя (через профиль запроса, если он уже определен)"""
+    from .profile import get_student
+    return get_student(user)
+
+
+def _user_progress(user, course_id):
+    """
+    Дерево прогресса пользователя по курсу (None, если он не записан).
+    Запоминается на объекте пользователя: методы курса и всех его модулей
+    на одной странице используют одно дерево, а не строят его заново для каждого модуля
+    """
+    if not user.is_authenticated:
+        return None
+    progress_by_course = getattr(user, '_course_progress', None)
+    if progress_by_course is None:
+        progress_by_course = user._course_progress = {}
+    if course_id not in progress_by_course:
+        from .progress import get_enrollment_progress
+        student = _student_for(user)
+        enrollment = None if student is None else Enrollment.objects.filter(
+            student=student, course_id=course_id
+        ).first()
+        progress_by_course[course_id] = get_enrollment_progress(enrollment)
+    return progress_by_course[course_id]
+
+
 class Tag(models.Model):
     tag_id = models.AutoField(primary_key=True, auto_created=True)
     name = models.CharField(max_length=50, unique=True, verbose_name='Название тега')
@@ -87,7 +134,9 @@ class Tag(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
     is_featured = models.BooleanField(default=False, verbose_name='Популярный тег')
+    # Счетчики поддерживаются сигналами CourseTag и Course (см. tags.py, reconcile_tag_counts)
     course_count = models.IntegerField(default=0, verbose_name='Количество курсов')
+    active_course_count = models.IntegerField(default=0, verbose_name='Количество активных курсов')
     
     class Meta:
         db_table = 'tags'
@@ -100,18 +149,10 @@ class Tag(models.Model):
     
     def save(self, *args, **kwargs):
         if not self.slug:
-            from django.utils.text import slugify
-            base_slug = slugify(self.name)
-            slug = base_slug
-            counter = 1
-            
-            while Tag.objects.filter(slug=slug).exists():
-                slug = f"{base_slug}-{counter}"
-                counter += 1
-            
-            self.slug = slug
+            # Свободный суффикс находится одним запросом по префиксу
+            from .tags import unique_slug
+            self.slug = unique_slug(self.name, exclude_pk=self.pk)
         
-        # Обновляем счетчик курсов
         super().save(*args, **kwargs)
     
     def get_absolute_url(self):
@@ -119,7 +160,7 @@ class Tag(models.Model):
         return reverse('courses_by_tag', kwargs={'tag_slug': self.slug})
     
     def get_active_courses_count(self):
-        return self.courses.filter(is_active=True).count()
+        return self.active_course_count
 
 # Модели учебных элементов
 class Course(models.Model):
@@ -150,12 +191,18 @@ class Course(models.Model):
         verbose_name='Теги',
         blank=True
     )
+    # Поисковый вектор: название (A), теги (B), описание (C), см. search.py
+    search_vector = SearchVectorField(null=True, editable=False)
 
     class Meta:
         db_table = 'courses'
         verbose_name = 'Курс'
         verbose_name_plural = 'Курсы'
         ordering = ['complexity_level', 'title']
+        indexes = [
+            GinIndex(fields=['search_vector'], name='courses_search_vector_gin'),
+            GinIndex(fields=['title'], opclasses=['gin_trgm_ops'], name='courses_title_trgm'),
+        ]
 
     def __str__(self):
         return self.title
@@ -178,72 +225,34 @@ class Course(models.Model):
         """Общее количество активных уроков в курсе"""
         return Lesson.objects.filter(module__course=self, is_active=True).count()
     
+    def get_user_progress(self, user):
+        """Дерево прогресса пользователя по курсу (None, если он не записан)"""
+        return _user_progress(user, self.course_id)
+    
     def get_course_progress(self, user):
         """Прогресс по курсу для пользователя в процентах"""
-        if not user.is_authenticated:
-            return 0
-            
-        total_lessons = self.total_active_lessons
-        if total_lessons == 0:
-            return 0
-        
-        try:
-            enrollment = Enrollment.objects.get(student=Student.objects.get(email=user.email), course=self)
-            completed_lessons = LessonCompletion.objects.filter(
-                enrollment=enrollment,
-                lesson__module__course=self,
-                lesson__is_active=True
-            ).count()
-        except Enrollment.DoesNotExist:
-            return 0
-        
-        return int((completed_lessons / total_lessons) * 100)
+        progress = self.get_user_progress(user)
+        return progress.percentage if progress else 0
     
     def get_completed_lessons_count(self, user):
         """Количество завершенных уроков в курсе для пользователя"""
-        if not user.is_authenticated:
-            return 0
-            
-        try:
-            enrollment = Enrollment.objects.get(student=Student.objects.get(email=user.email), course=self)
-            return LessonCompletion.objects.filter(
-                enrollment=enrollment,
-                lesson__module__course=self,
-                lesson__is_active=True
-            ).count()
-        except Enrollment.DoesNotExist:
-            return 0
+        progress = self.get_user_progress(user)
+        return progress.completed_lessons if progress else 0
         
     def is_course_completed(self, student):
         """Проверка, завершен ли курс студентом"""
-        total_lessons = self.total_active_lessons
-        if total_lessons == 0:
-            return False
-        
-        completed_lessons = self.get_completed_lessons_count(student)
-        return completed_lessons == total_lessons
+        progress = self.get_user_progress(student)
+        return progress.is_completed if progress else False
     
     def get_user_score(self, user):
         """Общий балл пользователя по курсу"""
-        if not user.is_authenticated:
-            return 0
-            
-        try:
-            enrollment = Enrollment.objects.get(student=Student.objects.get(email=user.email), course=self)
-            completions = LessonCompletion.objects.filter(
-                enrollment=enrollment,
-                lesson__module__course=self,
-                lesson__is_active=True
-            )
-            total_score = sum(comp.score for comp in completions if comp.score)
-            return total_score
-        except Enrollment.DoesNotExist:
-            return 0
+        progress = self.get_user_progress(user)
+        return progress.score if progress else 0
     
     def get_max_possible_score(self):
         """Максимально возможный балл по курсу"""
-        lessons = Lesson.objects.filter(module__course=self, is_active=True)
-        return sum(lesson.max_score for lesson in lessons if lesson.max_score > 0)
+        from .progress import get_courses_structure
+        return get_courses_structure([self.course_id])[self.course_id].max_score
 
 
 class CourseTag(models.Model):
@@ -300,31 +309,30 @@ class Module(models.Model):
     def __str__(self):
         return f"{self.course.title} - {self.title}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Курс на момент загрузки: при переносе модуля сбрасываются оба курса
+        instance._loaded_course_id = instance.__dict__.get('course_id')
+        return instance
+
     def lesson_count(self):
         return self.lessons.count()
     
     def get_completed_lessons_count(self, user):
         """Количество завершенных уроков для конкретного пользователя"""
-        if not user.is_authenticated:
-            return 0
-        
-        try:
-            enrollment = Enrollment.objects.get(student=Student.objects.get(email=user.email), course=self.course)
-            return LessonCompletion.objects.filter(
-                enrollment=enrollment,
-                lesson__module=self,
-                lesson__is_active=True
-            ).count()
-        except Enrollment.DoesNotExist:
+        # Курс по course_id, без загрузки self.course: дерево общее для всех модулей курса
+        progress = _user_progress(user, self.course_id)
+        if progress is None or self.module_id not in progress.modules:
             return 0
+        return progress.modules[self.module_id].completed_lessons
     
     def get_module_progress(self, user):
         """Прогресс по модулю для пользователя в процентах"""
-        total = self.lesson_count()
-        if total == 0:
+        progress = _user_progress(user, self.course_id)
+        if progress is None or self.module_id not in progress.modules:
             return 0
-        completed = self.get_completed_lessons_count(user)
-        return int((completed / total) * 100)
+        return progress.modules[self.module_id].percentage
     
 
 class Lesson(models.Model):
@@ -372,6 +380,13 @@ class Lesson(models.Model):
     def __str__(self):
         return f"{self.module.title} - {self.title}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Модуль на момент загрузки: при переносе урока сбрасываются оба курса
+        instance._loaded_module_id = instance.__dict__.get('module_id')
+        return instance
+
     def save(self, *args, **kwargs):
         # Автоматическая настройка параметров в зависимости от типа урока
         if self.lesson_type == LessonType.LECTURE:
@@ -408,7 +423,7 @@ class Lesson(models.Model):
             return False
         
         try:
-            enrollment = Enrollment.objects.get(student=user, course=self.module.course)
+            enrollment = Enrollment.objects.get(student=_student_for(user), course=self.module.course)
             return LessonCompletion.objects.filter(enrollment=enrollment, lesson=self).exists()
         except Enrollment.DoesNotExist:
             return False
@@ -419,7 +434,7 @@ class Lesson(models.Model):
             return None
         
         try:
-            enrollment = Enrollment.objects.get(student=user, course=self.module.course)
+            enrollment = Enrollment.objects.get(student=_student_for(user), course=self.module.course)
             return LessonCompletion.objects.filter(enrollment=enrollment, lesson=self).first()
         except Enrollment.DoesNotExist:
             return None
@@ -493,7 +508,13 @@ class Reviewer(models.Model):
         return f"{self.first_name} {self.last_name}"
 
     def current_workload(self):
-        return self.homework_submissions.filter(status=HomeworkStatus.UNDER_REVIEW).count()
+        """Незавершенные задания проверяющего (из счетчиков балансировщика, если он в них есть)"""
+        from .review_queue import OPEN_STATUSES
+        from .workload import get_workload
+        workload = get_workload(self.reviewer_id)
+        if workload is None:
+            workload = self.homework_submissions.filter(status__in=OPEN_STATUSES).count()
+        return workload
     
     def pending_submissions_count(self):
         return self.homework_submissions.filter(status=HomeworkStatus.UNDER_REVIEW).count()
@@ -505,22 +526,14 @@ class Reviewer(models.Model):
     
     def get_course_stats(self, course):
         """Статистика преподавателя по конкретному курсу"""
-        # ВЫЧИСЛЯЕМ все значения заранее
-        pending_submissions = self.homework_submissions.filter(
-            enrollment__course=course,
-            status=HomeworkStatus.UNDER_REVIEW
-        ).count()
-        
-        total_submissions = self.homework_submissions.filter(
-            enrollment__course=course
-        ).count()
-        
-        active_students = course.enrollments.filter(status='active').count()
-        
+        from .reviewer_stats import get_reviewer_course_stats
+        stats = get_reviewer_course_stats(self, course) or {}
         return {
-            'pending_submissions': pending_submissions,
-            'total_submissions': total_submissions,
-            'active_students': active_students
+            'pending_submissions': stats.get('pending_in_course', 0),
+            'total_submissions': stats.get('total_in_course', 0),
+            'active_students': stats.get('active_students_count', 0),
+            'average_score': stats.get('average_score'),
+            'oldest_pending_age': stats.get('oldest_pending_age'),
         }
 
 
@@ -553,6 +566,11 @@ class Enrollment(models.Model):
         null=True,
         verbose_name='Общий балл'
     )
+    # Денормализованные счетчики прогресса (см. progress.py, rebuild_progress)
+    completed_required_lessons = models.PositiveIntegerField(default=0, verbose_name='Завершено обязательных уроков')
+    total_required_lessons = models.PositiveIntegerField(default=0, verbose_name='Всего обязательных уроков')
+    score_sum = models.PositiveIntegerField(default=0, verbose_name='Сумма баллов')
+    last_activity_at = models.DateTimeField(blank=True, null=True, verbose_name='Последняя активность')
 
     class Meta:
         db_table = 'enrollments'
@@ -564,20 +582,22 @@ class Enrollment(models.Model):
     def __str__(self):
         return f"{self.student} - {self.course}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Статус на момент загрузки: по нему сигналы замечают завершение курса
+        instance._loaded_status = instance.__dict__.get('status')
+        return instance
+
+    def get_progress(self):
+        """Дерево прогресса по курсу для этого зачисления"""
+        from .progress import get_enrollment_progress
+        return get_enrollment_progress(self)
+
     def progress_percentage(self):
-        total_lessons = Lesson.objects.filter(
-            module__course=self.course,
-            is_required=True
-        ).count()
-        
-        completed_lessons = LessonCompletion.objects.filter(
-            enrollment=self,
-            lesson__is_required=True
-        ).count()
-        
-        if total_lessons == 0:
+        if self.total_required_lessons == 0:
             return 0
-        return round((completed_lessons / total_lessons) * 100, 2)
+        return round((self.completed_required_lessons / self.total_required_lessons) * 100, 2)
 
 
 class LessonCompletion(models.Model):
@@ -619,6 +639,143 @@ class LessonCompletion(models.Model):
                 f'Балл ({self.score}) превышает максимальный ({self.lesson.max_score}) для этого урока'
             )
         
+
+class StudentStats(models.Model):
+    """Сводная статистика студента (см. student_stats.py, rebuild_student_stats)"""
+    student = models.OneToOneField(
+        Student,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Студент'
+    )
+    courses_count = models.PositiveIntegerField(default=0, verbose_name='Курсов')
+    completed_courses_count = models.PositiveIntegerField(default=0, verbose_name='Завершено курсов')
+    lessons_completed = models.PositiveIntegerField(default=0, verbose_name='Завершено уроков')
+    total_score = models.PositiveIntegerField(default=0, verbose_name='Сумма баллов')
+    max_score = models.PositiveIntegerField(default=0, verbose_name='Максимально возможный балл')
+    current_streak = models.PositiveIntegerField(default=0, verbose_name='Текущая серия (дней)')
+    longest_streak = models.PositiveIntegerField(default=0, verbose_name='Лучшая серия (дней)')
+    last_activity_date = models.DateField(blank=True, null=True, verbose_name='День последней активности')
+    last_activity_at = models.DateTimeField(blank=True, null=True, verbose_name='Последняя активность')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Обновлено')
+
+    class Meta:
+        db_table = 'student_stats'
+        verbose_name = 'Статистика студента'
+        verbose_name_plural = 'Статистика студентов'
+
+    def __str__(self):
+        return f"Статистика: {self.student_id}"
+
+    @property
+    def active_streak(self):
+        """Серия обрывается, если вчера и сегодня не было завершенных уроков"""
+        if self.last_activity_date is None:
+            return 0
+        if (timezone.localdate() - self.last_activity_date).days > 1:
+            return 0
+        return self.current_streak
+
+    def score_percentage(self):
+        if self.max_score == 0:
+            return 0
+        return round(self.total_score * 100 / self.max_score, 1)
+
+
+
+# Ежедневная аналитика платформы (см. analytics.py, refresh_analytics)
+
+class DailyCounters(models.Model):
+    """Счетчики событий за день; средние хранятся суммой и количеством, чтобы складываться по периодам"""
+    new_enrollments = models.PositiveIntegerField(default=0, verbose_name='Новых зачислений')
+    completed_courses = models.PositiveIntegerField(default=0, verbose_name='Завершено курсов')
+    course_score_sum = models.PositiveIntegerField(default=0, verbose_name='Сумма итоговых баллов')
+    course_score_count = models.PositiveIntegerField(default=0, verbose_name='Итоговых баллов')
+    lessons_completed = models.PositiveIntegerField(default=0, verbose_name='Завершено уроков')
+    lesson_score_sum = models.PositiveIntegerField(default=0, verbose_name='Сумма баллов за уроки')
+    lesson_score_count = models.PositiveIntegerField(default=0, verbose_name='Оценок за уроки')
+    submissions = models.PositiveIntegerField(default=0, verbose_name='Отправлено заданий')
+    reviewed_submissions = models.PositiveIntegerField(default=0, verbose_name='Проверено заданий')
+    review_score_sum = models.PositiveIntegerField(default=0, verbose_name='Сумма баллов за задания')
+    review_score_count = models.PositiveIntegerField(default=0, verbose_name='Оценок за задания')
+
+    class Meta:
+        abstract = True
+
+
+class DailyStats(DailyCounters):
+    date = models.DateField(primary_key=True, verbose_name='День')
+    new_students = models.PositiveIntegerField(default=0, verbose_name='Новых студентов')
+    new_courses = models.PositiveIntegerField(default=0, verbose_name='Новых курсов')
+    # {статус: количество} для зачислений этого дня по их текущему статусу
+    enrollments_by_status = models.JSONField(default=dict, verbose_name='Зачисления по статусам')
+    refreshed_at = models.DateTimeField(auto_now=True, verbose_name='Обновлено')
+
+    class Meta:
+        db_table = 'daily_stats'
+        verbose_name = 'Статистика за день'
+        verbose_name_plural = 'Статистика по дням'
+        ordering = ['-date']
+
+    def __str__(self):
+        return f"Статистика за {self.date}"
+
+
+class DailyCourseStats(DailyCounters):
+    stat_id = models.AutoField(primary_key=True)
+    date = models.DateField(verbose_name='День')
+    course = models.ForeignKey(
+        Course,
+        on_delete=models.CASCADE,
+        related_name='daily_stats',
+        verbose_name='Курс'
+    )
+
+    class Meta:
+        db_table = 'daily_course_stats'
+        verbose_name = 'Статистика курса за день'
+        verbose_name_plural = 'Статистика курсов по дням'
+        unique_together = ['date', 'course']
+        indexes = [
+            models.Index(fields=['course', 'date'], name='daily_course_stats_course_idx'),
+        ]
+        ordering = ['-date']
+
+    def __str__(self):
+        return f"{self.course} за {self.date}"
+
+
+# Рекомендации "с этим курсом также проходят" (см. recommendations.py, build_course_neighbors)
+
+class CourseNeighbor(models.Model):
+    """Один из top-N курсов, на которые чаще всего записываются студенты данного курса"""
+    course_neighbor_id = models.AutoField(primary_key=True)
+    course = models.ForeignKey(
+        Course,
+        on_delete=models.CASCADE,
+        related_name='neighbors',
+        verbose_name='Курс'
+    )
+    neighbor = models.ForeignKey(
+        Course,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Похожий курс'
+    )
+    score = models.FloatField(verbose_name='Косинусное сходство')
+    common_students = models.PositiveIntegerField(verbose_name='Общих студентов')
+
+    class Meta:
+        db_table = 'course_neighbors'
+        verbose_name = 'Похожий курс'
+        verbose_name_plural = 'Похожие курсы'
+        unique_together = ['course', 'neighbor']
+        ordering = ['course', '-score']
+
+    def __str__(self):
+        return f"{self.course} -> {self.neighbor} ({self.score:.2f})"
+
 # Модели домашних заданий
 class Homework(models.Model):
     homework_id = models.AutoField(primary_key=True)
@@ -697,16 +854,38 @@ class HomeworkSubmission(models.Model):
         default=UrgencyLevel.NORMAL,
         verbose_name='Срочность'
     )
+    claimed_at = models.DateTimeField(blank=True, null=True, verbose_name='Взято на проверку')
+    lease_expires_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name='Проверка закреплена до',
+        help_text='После этого времени задание возвращается в очередь'
+    )
 
     class Meta:
         db_table = 'homework_submissions'
         verbose_name = 'Отправленное задание'
         verbose_name_plural = 'Отправленные задания'
         ordering = ['-submitted_at']
+        indexes = [
+            # Очередь выдается в порядке срочности и давности (review_queue.QUEUE_ORDERING):
+            # индекс построен по тому же выражению, чтобы ORDER BY ... LIMIT читал его по порядку.
+            # Без условия по статусу: очередь выбирается вместе с заданиями с истекшей арендой
+            models.Index(urgency_rank(), 'submitted_at', name='submissions_queue_rank_idx'),
+            models.Index(fields=['status', 'lease_expires_at'], name='submissions_lease_idx'),
+        ]
 
     def __str__(self):
         return f"{self.enrollment} - {self.homework}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Статус и проверяющий на момент загрузки: по ним сигналы меняют нагрузку проверяющих
+        instance._loaded_status = instance.__dict__.get('status')
+        instance._loaded_reviewer_id = instance.__dict__.get('reviewer_id')
+        return instance
+
     def is_on_time(self):
         if not self.personal_deadline:
             return True
@@ -806,8 +985,24 @@ class CoursePrerequisite(models.Model):
         return f"{self.course} требует {self.required_course}"
 
     def clean(self):
-        if self.course == self.required_course:
+        if self.course_id == self.required_course_id:
             raise ValidationError('Курс не может требовать сам себя')
+        self.validate_graph()
+
+    def validate_graph(self, using='default'):
+        """Требование не должно замыкать цикл в графе предварительных требований"""
+        from .prerequisites import validate_prerequisite
+        validate_prerequisite(self.course_id, self.required_course_id, exclude_pk=self.pk, using=using)
+
+    def save(self, *args, **kwargs):
+        # Циклы отклоняются и при сохранении в обход форм: проверка и запись
+        # в одной транзакции под блокировкой графа
+        from .prerequisites import lock_prerequisite_graph
+        using = kwargs.get('using') or router.db_for_write(CoursePrerequisite, instance=self)
+        with transaction.atomic(using=using):
+            lock_prerequisite_graph(using)
+            self.validate_graph(using=using)
+            super().save(*args, **kwargs)
         
 
 # class Deadline(models.Model):
@@ -0,0 +1,204 @@
+# page_context.py
+# Контекст кабинетов и страниц курса, общий для обычных (views.py) и асинхронных
+# (async_views.py) представлений. Страница описывается независимыми блоками запросов
+# (*_blocks) и сборкой контекста из их результатов (*_context): обычное представление
+# выполняет блоки по очереди (run_blocks), асинхронное - одновременно (async_views.gather).
+from django.db.models import Count, Q
+from .forms import ReviewResultForm
+from .models import Course, Enrollment, EnrollmentStatus, HomeworkStatus, Lesson, TeacherCourse
+from .cooccurrence import get_related_courses
+from .lesson_sequence import get_resume_lesson, get_resume_lessons
+from .prerequisites import check_eligibility, get_student_courses, get_unlocked_courses
+from .progress import get_enrollment_progress
+from .recommendations import get_course_recommendations, get_student_recommendations
+from .review_queue import claimable, get_claimed_submissions, reviewer_course_ids
+from .reviewer_stats import get_reviewer_courses_stats
+
+
+def run_blocks(blocks):
+    """Результаты блоков, выполненных по очереди"""
+    return [block() for block in blocks]
+
+
+# Кабинет студента
+
+def _active(enrollments):
+    return [e for e in enrollments if e.status == EnrollmentStatus.ACTIVE]
+
+
+def student_dashboard_blocks(student, enrollments):
+    """Продолжение курсов, открывшиеся курсы и рекомендации (enrollments - с select_related('course'))"""
+    # Курсы студента берутся из уже загруженных зачислений, без отдельного запроса
+    student_courses = (
+        {e.course_id: e.overall_score for e in enrollments if e.status == EnrollmentStatus.COMPLETED},
+        {e.course_id for e in enrollments},
+    )
+    active_enrollments = _active(enrollments)
+    return (
+        lambda: get_resume_lessons(active_enrollments),
+        lambda: list(get_unlocked_courses(student, student_courses)),
+        lambda: get_student_recommendations(student, student_courses),
+    )
+
+
+def student_dashboard_context(student, enrollments, resume_lessons, unlocked_courses, recommended_courses):
+    active_enrollments = _active(enrollments)
+    for enrollment in active_enrollments:
+        enrollment.resume_lesson = resume_lessons[enrollment.enrollment_id]
+    return {
+        'student': student,
+        'reviewer': None,
+        'unlocked_courses': unlocked_courses,
+        'recommended_courses': recommended_courses,
+        'active_enrollments': active_enrollments,
+        'completed_enrollments': [e for e in enrollments if e.status == EnrollmentStatus.COMPLETED],
+        'user_type': 'student'
+    }
+
+
+# Кабинет преподавателя
+
+def _submission_totals(reviewer):
+    return reviewer.homework_submissions.aggregate(
+        pending=Count('submission_id', filter=Q(status=HomeworkStatus.UNDER_REVIEW)),
+        total=Count('submission_id'),
+    )
+
+
+def reviewer_dashboard_blocks(reviewer):
+    """Счетчики заданий, закрепленные задания, размер очереди и статистика курсов"""
+    return (
+        lambda: _submission_totals(reviewer),
+        lambda: list(get_claimed_submissions(reviewer)),
+        lambda: claimable(course_ids=reviewer_course_ids(reviewer), reviewer=reviewer).count(),
+        lambda: get_reviewer_courses_stats(reviewer),
+    )
+
+
+def reviewer_dashboard_context(reviewer, totals, claimed_submissions, queue_length, courses_with_stats):
+    return {
+        'student': None,
+        'reviewer': reviewer,
+        'pending_submissions': totals['pending'],
+        'total_submissions': totals['total'],
+        'claimed_submissions': claimed_submissions,
+        # Одна форма на все задания: поля без id, чтобы они не повторялись на странице
+        'review_form': ReviewResultForm(auto_id=False),
+        'queue_length': queue_length,
+        'courses_with_stats': courses_with_stats,
+        'user_type': 'reviewer'
+    }
+
+
+def reviewer_dashboard_fallback(reviewer):
+    """Резервный контекст, если блоки кабинета не выполнились: только общие счетчики"""
+    return reviewer_dashboard_context(reviewer, _submission_totals(reviewer), [], 0, [])
+
+
+# Страница курса
+
+def course_student_info(request, course):
+    """Статус студента на странице курса и рекомендации с учетом его курсов"""
+    course_info = {
+        'is_enrolled': False,
+        'can_enroll': False,
+        'is_authenticated': request.user.is_authenticated,
+        'needs_student_profile': False,
+        'missing_requirements': {'mandatory': [], 'recommended': []}
+    }
+    student = None
+    student_courses = None
+    if request.user.is_authenticated:
+        student = request.profile.student
+        if student is not None:
+            # Завершенные курсы и зачисления студента - для требований и рекомендаций
+            student_courses = get_student_courses(student)
+            enrollment = Enrollment.objects.filter(student=student, course=course).first()
+            if enrollment is not None:
+                course_info['is_enrolled'] = True
+                course_info['enrollment_status'] = enrollment.status
+            else:
+                can_enroll, missing_requirements = check_eligibility(student, course, student_courses)
+                course_info['can_enroll'] = can_enroll
+                course_info['missing_requirements'] = missing_requirements
+        else:
+            # У пользователя нет профиля студента
+            course_info['needs_student_profile'] = True
+    # С этим курсом также проходят (без курсов студента и курсов с невыполненными требованиями)
+    course_info['recommended_courses'] = get_course_recommendations(course, student, student_courses)
+    return course_info
+
+
+def related_courses(course):
+    """Похожие курсы по взвешенному пересечению тегов"""
+    related_ids = get_related_courses(course.course_id)
+    related = Course.objects.filter(is_active=True).in_bulk(related_ids) if related_ids else {}
+    return [related[course_id] for course_id in related_ids if course_id in related]
+
+
+def course_detail_blocks(request, course):
+    """Статус студента, модули с уроками, число уроков, студенты курса и похожие курсы"""
+    return (
+        lambda: course_student_info(request, course),
+        lambda: list(course.modules.all().prefetch_related('lessons').order_by('module_order')),
+        lambda: Lesson.objects.filter(module__course=course).count(),
+        lambda: course.enrollments.aggregate(
+            active=Count('enrollment_id', filter=Q(status=EnrollmentStatus.ACTIVE)),
+            completed=Count('enrollment_id', filter=Q(status=EnrollmentStatus.COMPLETED)),
+        ),
+        lambda: related_courses(course),
+    )
+
+
+def course_detail_context(course, course_info, modules, total_lessons, students, related):
+    return {
+        'course': course,
+        'modules': modules,
+        'course_stats': {
+            'total_modules': len(modules),
+            'total_lessons': total_lessons,
+            'active_students': students['active'],
+            'completed_students': students['completed'],
+        },
+        'related_courses': related,
+        **course_info
+    }
+
+
+# Модули курса студента
+
+def course_modules_blocks(enrollment):
+    """Прогресс, модули с уроками, автор курса и урок, с которого продолжить (enrollment - с курсом)"""
+    course = enrollment.course
+    return (
+        lambda: get_enrollment_progress(enrollment),
+        lambda: list(course.modules.order_by('module_order').prefetch_related('lessons')),
+        # Автором показывается основной преподаватель, если их несколько
+        lambda: TeacherCourse.objects.filter(course=course).select_related('reviewer').order_by(
+            '-is_main_teacher', 'assigned_at'
+        ).first(),
+        lambda: get_resume_lesson(enrollment),
+    )
+
+
+def course_modules_context(enrollment, progress, modules, teacher_course, resume_lesson):
+    course = enrollment.course
+    for module in modules:
+        module_progress = progress.module(module.module_id)
+        module.completed_lessons = module_progress.completed_lessons
+        module.total_lessons = module_progress.total_lessons
+        module.progress = module_progress.percentage
+    return {
+        'course': course,
+        'enrollment': enrollment,
+        'modules': modules,
+        'course_progress': progress.percentage,
+        'completed_course_lessons': progress.completed_lessons,
+        'total_course_lessons': progress.total_lessons,
+        'total_score': progress.score,
+        'max_score': progress.max_score,
+        'is_course_completed': progress.is_completed,
+        'resume_lesson': resume_lesson,
+        'title': f'Модули курса: {course.title}',
+        'author': teacher_course.reviewer if teacher_course is not None else None
+    }
@@ -0,0 +1,218 @@
+# prerequisites.py
+from collections import defaultdict, deque
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import connections
+from .cache_versions import VERSION_TIMEOUT, bump_version, get_version
+from .models import Course, CoursePrerequisite, Enrollment, EnrollmentStatus, RequirementType
+
+
+GRAPH_VERSION_KEY = 'education:prerequisite_graph_version'
+# Ключ advisory-блокировки PostgreSQL, под которой проверяются и сохраняются требования
+GRAPH_LOCK_KEY = 0x5052455245515321
+
+
+class PrerequisiteGraph:
+    """
+    Граф предварительных требований: ребро курс -> требуемый курс.
+    Загружается одним запросом; транзитивное замыкание считается один раз
+    при построении, в топологическом порядке.
+    """
+
+    def __init__(self, edges):
+        # requires[курс] = {требуемый курс: (минимальный балл, тип требования)}
+        self.requires = defaultdict(dict)
+        # unlocks[требуемый курс] = {курсы, для которых он нужен}
+        self.unlocks = defaultdict(set)
+        for course_id, required_id, min_score, requirement_type in edges:
+            self.requires[course_id][required_id] = (min_score, requirement_type)
+            self.unlocks[required_id].add(course_id)
+
+        order = self._topological_order()
+        # closure[курс] = все курсы, которые нужны для него прямо или через другие требования
+        self.closure = {}
+        for course_id in order:
+            required = set()
+            for required_id in self.requires.get(course_id, ()):
+                required.add(required_id)
+                required |= self.closure[required_id]
+            self.closure[course_id] = frozenset(required)
+
+        # Циклы, сохраненные в обход проверки (например, до ее появления), не ломают граф:
+        # для курсов цикла замыкание считается обходом в ширину
+        self.cyclic = self._nodes() - set(order)
+        for course_id in self.cyclic:
+            self.closure[course_id] = frozenset(self._reachable(course_id))
+
+    @classmethod
+    def from_db(cls):
+        return cls(CoursePrerequisite.objects.values_list(
+            'course_id', 'required_course_id', 'min_score', 'requirement_type'
+        ))
+
+    def _nodes(self):
+        return set(self.requires) | set(self.unlocks)
+
+    def _topological_order(self):
+        """Курсы в порядке прохождения (требования раньше курсов), без курсов из циклов"""
+        pending = {course_id: len(self.requires.get(course_id, ())) for course_id in self._nodes()}
+        ready = deque(sorted(course_id for course_id, count in pending.items() if count == 0))
+        order = []
+        while ready:
+            required_id = ready.popleft()
+            order.append(required_id)
+            for course_id in sorted(self.unlocks.get(required_id, ())):
+                pending[course_id] -= 1
+                if pending[course_id] == 0:
+                    ready.append(course_id)
+        return order
+
+    def _reachable(self, course_id):
+        seen = set()
+        queue = deque(self.requires.get(course_id, ()))
+        while queue:
+            required_id = queue.popleft()
+            if required_id not in seen:
+                seen.add(required_id)
+                queue.extend(self.requires.get(required_id, ()))
+        return seen
+
+    def required_for(self, course_id):
+        """Все курсы, которые нужно пройти до данного (транзитивно)"""
+        return self.closure.get(course_id, frozenset())
+
+    def creates_cycle(self, course_id, required_id):
+        """Замкнет ли цикл новое ребро course_id -> required_id"""
+        return course_id == required_id or course_id in self.required_for(required_id)
+
+    def missing(self, course_id, completed_scores):
+        """
+        Невыполненные прямые требования курса.
+        completed_scores - {id завершенного курса: итоговый балл или None}.
+        Возвращает (обязательные [(id, причина)], рекомендованные [id])
+        """
+        mandatory = []
+        recommended = []
+        for required_id, (min_score, requirement_type) in sorted(self.requires.get(course_id, {}).items()):
+            completed = required_id in completed_scores
+            if requirement_type == RequirementType.MANDATORY:
+                if not completed:
+                    mandatory.append((required_id, 'Курс не завершен'))
+                    continue
+                score = completed_scores[required_id]
+                if min_score > 0 and (score is None or score < min_score):
+                    mandatory.append((
+                        required_id,
+                        f'Необходимый балл: {min_score}, ваш балл: {score or "не оценен"}'
+                    ))
+            elif requirement_type == RequirementType.RECOMMENDED and not completed:
+                recommended.append(required_id)
+        return mandatory, recommended
+
+    def unlocked_by(self, completed_scores, exclude=()):
+        """Курсы, все обязательные требования которых выполнены завершенными курсами"""
+        candidates = set()
+        for required_id in completed_scores:
+            candidates |= self.unlocks.get(required_id, set())
+        return sorted(
+            course_id for course_id in candidates - set(exclude)
+            if not self.missing(course_id, completed_scores)[0]
+        )
+
+
+def get_graph_version():
+    return get_version(GRAPH_VERSION_KEY)
+
+
+def invalidate_prerequisite_graph():
+    bump_version(GRAPH_VERSION_KEY)
+
+
+_local = {'version': None, 'graph': None}
+
+
+def get_prerequisite_graph():
+    """Граф из памяти процесса или общего кэша; перестраивается после изменения требований"""
+    version = get_graph_version()
+    if _local['version'] == version:
+        return _local['graph']
+    key = f'education:prerequisite_graph:{version}'
+    graph = cache.get(key)
+    if graph is None:
+        graph = PrerequisiteGraph.from_db()
+        cache.set(key, graph, VERSION_TIMEOUT)
+    _local['version'] = version
+    _local['graph'] = graph
+    return graph
+
+
+def lock_prerequisite_graph(using):
+    """
+    Сериализует изменения графа до конца текущей транзакции. Без блокировки два требования,
+    сохраняемые одновременно, проверяются каждое по графу без другого и вместе замыкают цикл.
+    Блокировка общая на граф, а не на строки курсов: новые ребра цикла могут не иметь общих курсов.
+    SQLite и так допускает только одну пишущую транзакцию
+    """
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)', [GRAPH_LOCK_KEY])
+
+
+def validate_prerequisite(course_id, required_id, exclude_pk=None, using='default'):
+    """
+    ValidationError, если требование замкнет цикл (проверка по свежему графу из базы).
+    Вызывается внутри транзакции после lock_prerequisite_graph
+    """
+    edges = CoursePrerequisite.objects.using(using).values_list(
+        'course_id', 'required_course_id', 'min_score', 'requirement_type'
+    )
+    if exclude_pk is not None:
+        edges = edges.exclude(pk=exclude_pk)
+    if PrerequisiteGraph(edges).creates_cycle(course_id, required_id):
+        raise ValidationError('Требование образует цикл: курс прямо или косвенно требует сам себя')
+
+
+def get_student_courses(student):
+    """
+    Состояние студента одним запросом:
+    ({id завершенного курса: итоговый балл}, множество всех курсов, на которые он записан)
+    """
+    completed = {}
+    enrolled = set()
+    for course_id, status, score in Enrollment.objects.filter(student=student).values_list(
+        'course_id', 'status', 'overall_score'
+    ):
+        enrolled.add(course_id)
+        if status == EnrollmentStatus.COMPLETED:
+            completed[course_id] = score
+    return completed, enrolled
+
+
+def check_eligibility(student, course, student_courses=None):
+    """
+    Проверяет, выполнены ли требования курса.
+    Возвращает (can_enroll, {'mandatory': [{'course', 'reason'}], 'recommended': [курсы]})
+    """
+    completed, _ = student_courses or get_student_courses(student)
+    mandatory, recommended = get_prerequisite_graph().missing(course.course_id, completed)
+    courses = Course.objects.in_bulk(
+        [course_id for course_id, _ in mandatory] + recommended
+    ) if mandatory or recommended else {}
+    return not mandatory, {
+        'mandatory': [
+            {'course': courses[course_id], 'reason': reason}
+            for course_id, reason in mandatory if course_id in courses
+        ],
+        'recommended': [courses[course_id] for course_id in recommended if course_id in courses],
+    }
+
+
+def get_unlocked_courses(student, student_courses=None):
+    """Активные курсы, которые открылись студенту после завершенных курсов и на которые он еще не записан"""
+    completed, enrolled = student_courses or get_student_courses(student)
+    course_ids = get_prerequisite_graph().unlocked_by(completed, exclude=enrolled)
+    if not course_ids:
+        return Course.objects.none()
+    return Course.objects.filter(course_id__in=course_ids, is_active=True).order_by('title')
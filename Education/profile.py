@@ -0,0 +1,110 @@
+# profile.py
+from django.utils.functional import cached_property
+from .cache_versions import bump_version, get_version
+from .models import Student, Reviewer
+
+
+SESSION_KEY = '_education_profile'
+
+
+def _version_key(email):
+    return f'education:profile_version:{email}'
+
+
+def get_profile_version(email):
+    """Текущая версия профиля для email (меняется при сохранении Student/Reviewer)"""
+    return get_version(_version_key(email))
+
+
+def invalidate_profile(email):
+    """Сбрасывает закэшированные в сессиях данные о профиле пользователя"""
+    bump_version(_version_key(email))
+
+
+class UserProfile:
+    """
+    Ленивое определение профиля пользователя в рамках запроса.
+    Идентификаторы студента/преподавателя и статус одобрения хранятся в сессии,
+    сами объекты загружаются по первичному ключу только при обращении.
+    """
+
+    def __init__(self, request):
+        self.user = request.user
+        self.session = getattr(request, 'session', None)
+
+    @cached_property
+    def _data(self):
+        if not self.user.is_authenticated:
+            return {'student_id': None, 'reviewer_id': None, 'is_approved': False}
+
+        email = self.user.email
+        version = get_profile_version(email)
+        data = self.session.get(SESSION_KEY) if self.session is not None else None
+        if data and data.get('email') == email and data.get('version') == version:
+            return data
+
+        student_id = Student.objects.filter(email=email).values_list('student_id', flat=True).first()
+        reviewer = Reviewer.objects.filter(email=email).values('reviewer_id', 'is_approved').first()
+        data = {
+            'email': email,
+            'version': version,
+            'student_id': student_id,
+            'reviewer_id': reviewer['reviewer_id'] if reviewer else None,
+            'is_approved': reviewer['is_approved'] if reviewer else False,
+        }
+        if self.session is not None:
+            self.session[SESSION_KEY] = data
+        return data
+
+    @property
+    def student_id(self):
+        return self._data['student_id']
+
+    @property
+    def reviewer_id(self):
+        return self._data['reviewer_id']
+
+    @property
+    def has_student(self):
+        return self.student_id is not None
+
+    @property
+    def has_reviewer(self):
+        return self.reviewer_id is not None
+
+    @property
+    def is_approved(self):
+        """Одобрен ли преподаватель администратором"""
+        return self._data['is_approved']
+
+    @property
+    def user_type(self):
+        if not self.user.is_authenticated:
+            return None
+        if self.has_student:
+            return 'student'
+        if self.has_reviewer:
+            return 'reviewer'
+        return 'unregistered'
+
+    @cached_property
+    def student(self):
+        if not self.has_student:
+            return None
+        return Student.objects.filter(pk=self.student_id).first()
+
+    @cached_property
+    def reviewer(self):
+        if not self.has_reviewer:
+            return None
+        return Reviewer.objects.filter(pk=self.reviewer_id).first()
+
+
+def get_student(user):
+    """Студент пользователя: из профиля запроса, если он уже определен, иначе запросом"""
+    if not user.is_authenticated:
+        return None
+    profile = getattr(user, '_education_profile', None)
+    if profile is not None:
+        return profile.student
+    return Student.objects.filter(email=user.email).first()
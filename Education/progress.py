@@ -0,0 +1,316 @@
+# progress.py
+from django.db import transaction
+from django.db.models import Case, Count, FloatField, Sum, Max, Q, F, OuterRef, Subquery, Value, When
+from django.db.models.functions import Cast, Coalesce
+from django.utils import timezone
+from .models import Enrollment, EnrollmentStatus, Lesson, LessonCompletion
+from .catalog import count_subquery
+from . import student_stats
+
+
+def _percent(completed, total):
+    if total == 0:
+        return 0
+    return int((completed / total) * 100)
+
+
+class ModuleProgress:
+    """Прогресс студента по одному модулю"""
+
+    def __init__(self, module_id):
+        self.module_id = module_id
+        self.total_lessons = 0
+        self.required_lessons = 0
+        self.completed_lessons = 0
+        self.completed_required_lessons = 0
+        self.score = 0
+        self.max_score = 0
+
+    @property
+    def percentage(self):
+        return _percent(self.completed_lessons, self.total_lessons)
+
+    @property
+    def is_completed(self):
+        return self.total_lessons > 0 and self.completed_lessons == self.total_lessons
+
+
+class CourseProgress:
+    """Дерево прогресса по курсу: курс -> модули -> уроки (завершено/всего), баллы"""
+
+    def __init__(self, course_id):
+        self.course_id = course_id
+        self.modules = {}
+
+    def module(self, module_id):
+        if module_id not in self.modules:
+            self.modules[module_id] = ModuleProgress(module_id)
+        return self.modules[module_id]
+
+    def _sum(self, attr):
+        return sum(getattr(module, attr) for module in self.modules.values())
+
+    @property
+    def total_lessons(self):
+        return self._sum('total_lessons')
+
+    @property
+    def required_lessons(self):
+        return self._sum('required_lessons')
+
+    @property
+    def completed_lessons(self):
+        return self._sum('completed_lessons')
+
+    @property
+    def completed_required_lessons(self):
+        return self._sum('completed_required_lessons')
+
+    @property
+    def score(self):
+        return self._sum('score')
+
+    @property
+    def max_score(self):
+        return self._sum('max_score')
+
+    @property
+    def percentage(self):
+        """Процент завершенных активных уроков"""
+        return _percent(self.completed_lessons, self.total_lessons)
+
+    @property
+    def required_percentage(self):
+        """Процент завершенных обязательных уроков (с точностью до сотых)"""
+        if self.required_lessons == 0:
+            return 0
+        return round((self.completed_required_lessons / self.required_lessons) * 100, 2)
+
+    @property
+    def is_completed(self):
+        return self.total_lessons > 0 and self.completed_lessons == self.total_lessons
+
+
+def _lesson_totals(course_ids):
+    """Количество активных уроков и максимальный балл по модулям курсов (один запрос)"""
+    return Lesson.objects.filter(
+        module__course_id__in=course_ids,
+        is_active=True
+    ).order_by().values('module_id', 'module__course_id').annotate(
+        total=Count('lesson_id'),
+        required=Count('lesson_id', filter=Q(is_required=True)),
+        max_score=Sum('max_score'),
+    )
+
+
+def _completion_totals(enrollment_ids):
+    """Завершенные уроки и баллы по (зачисление, модуль) (один запрос)"""
+    return LessonCompletion.objects.filter(
+        enrollment_id__in=enrollment_ids,
+        lesson__is_active=True,
+        lesson__module__course_id=F('enrollment__course_id'),
+    ).order_by().values('enrollment_id', 'lesson__module_id').annotate(
+        completed=Count('completion_id'),
+        completed_required=Count('completion_id', filter=Q(lesson__is_required=True)),
+        score=Sum('score'),
+    )
+
+
+def get_courses_structure(course_ids):
+    """Пустые деревья прогресса (только итоги по урокам) для набора курсов"""
+    structure = {course_id: CourseProgress(course_id) for course_id in course_ids}
+    for row in _lesson_totals(list(structure)):
+        module = structure[row['module__course_id']].module(row['module_id'])
+        module.total_lessons = row['total']
+        module.required_lessons = row['required']
+        module.max_score = row['max_score'] or 0
+    return structure
+
+
+def get_enrollments_progress(enrollments):
+    """
+    Прогресс для набора зачислений за два агрегирующих запроса.
+    Возвращает словарь {enrollment_id: CourseProgress}
+    """
+    enrollments = list(enrollments)
+    if not enrollments:
+        return {}
+
+    structure = get_courses_structure({e.course_id for e in enrollments})
+    lesson_rows = {
+        course_id: [
+            (module_id, module.total_lessons, module.required_lessons, module.max_score)
+            for module_id, module in progress.modules.items()
+        ]
+        for course_id, progress in structure.items()
+    }
+
+    result = {}
+    for enrollment in enrollments:
+        progress = CourseProgress(enrollment.course_id)
+        for module_id, total, required, max_score in lesson_rows[enrollment.course_id]:
+            module = progress.module(module_id)
+            module.total_lessons = total
+            module.required_lessons = required
+            module.max_score = max_score
+        result[enrollment.enrollment_id] = progress
+
+    for row in _completion_totals(list(result)):
+        module = result[row['enrollment_id']].module(row['lesson__module_id'])
+        module.completed_lessons = row['completed']
+        module.completed_required_lessons = row['completed_required']
+        module.score = row['score'] or 0
+
+    return result
+
+
+def get_enrollment_progress(enrollment):
+    """Прогресс по одному зачислению"""
+    if enrollment is None:
+        return None
+    return get_enrollments_progress([enrollment])[enrollment.enrollment_id]
+
+
+# Денормализованные счетчики прогресса в Enrollment
+
+# Какие уроки учитываются: в completed/total_required_lessons - активные обязательные,
+# в score_sum - все активные. Одни и те же условия при изменениях и при пересчете
+COUNTED_LESSONS = {'is_active': True, 'is_required': True}
+SCORED_LESSONS = {'is_active': True}
+
+
+def _matches(lesson, conditions):
+    return all(getattr(lesson, field) == value for field, value in conditions.items())
+
+
+def _completion_filter(conditions):
+    return {f'lesson__{field}': value for field, value in conditions.items()}
+
+
+def _counted_lessons():
+    return Lesson.objects.filter(**COUNTED_LESSONS)
+
+
+def count_required_lessons(course_id):
+    """Количество учитываемых в прогрессе уроков курса"""
+    return _counted_lessons().filter(module__course_id=course_id).count()
+
+
+def count_required_lessons_by_course(course_ids):
+    """{id курса: количество учитываемых уроков} для набора курсов одним запросом"""
+    counts = dict.fromkeys(course_ids, 0)
+    for course_id, total in _counted_lessons().filter(
+        module__course_id__in=course_ids
+    ).order_by().values('module__course_id').annotate(
+        total=Count('lesson_id')
+    ).values_list('module__course_id', 'total'):
+        counts[course_id] = total
+    return counts
+
+
+def record_completion(enrollment, lesson, score=None):
+    """Создает завершение урока и атомарно обновляет счетчики зачисления"""
+    with transaction.atomic():
+        completion = LessonCompletion.objects.create(
+            enrollment=enrollment,
+            lesson=lesson,
+            score=score
+        )
+        counted = _matches(lesson, COUNTED_LESSONS)
+        scored = _matches(lesson, SCORED_LESSONS)
+        Enrollment.objects.filter(pk=enrollment.pk).update(
+            completed_required_lessons=F('completed_required_lessons') + (1 if counted else 0),
+            score_sum=F('score_sum') + ((score or 0) if scored else 0),
+            last_activity_at=completion.completed_at,
+        )
+        student_stats.lesson_completed(enrollment.student_id, completion)
+    return completion
+
+
+def remove_completion(enrollment, lesson):
+    """Удаляет завершение урока и атомарно обновляет счетчики зачисления"""
+    with transaction.atomic():
+        completion = LessonCompletion.objects.select_for_update().filter(
+            enrollment=enrollment,
+            lesson=lesson
+        ).first()
+        if completion is None:
+            return False
+        completion.delete()
+        counted = _matches(lesson, COUNTED_LESSONS)
+        scored = _matches(lesson, SCORED_LESSONS)
+        Enrollment.objects.filter(pk=enrollment.pk).update(
+            completed_required_lessons=F('completed_required_lessons') - (1 if counted else 0),
+            score_sum=F('score_sum') - ((completion.score or 0) if scored else 0),
+            last_activity_at=timezone.now(),
+        )
+        student_stats.lesson_uncompleted(enrollment.student_id, completion.score)
+    return True
+
+
+def rebuild_enrollment_counters(enrollments):
+    """
+    Пересчитывает счетчики для набора зачислений одним UPDATE
+    с коррелированными подзапросами. Возвращает число обновленных строк.
+    """
+    total_required = Lesson.objects.filter(
+        module__course_id=OuterRef('course_id'), **COUNTED_LESSONS
+    ).order_by().values('module__course_id').annotate(c=Count('lesson_id')).values('c')
+
+    completions = LessonCompletion.objects.filter(
+        enrollment_id=OuterRef('pk'),
+        lesson__module__course_id=OuterRef('course_id'),
+    ).order_by().values('enrollment_id')
+    completed_required = completions.filter(
+        **_completion_filter(COUNTED_LESSONS)
+    ).annotate(c=Count('completion_id')).values('c')
+    score_sum = completions.filter(
+        **_completion_filter(SCORED_LESSONS)
+    ).annotate(s=Sum('score')).values('s')
+    last_activity = completions.annotate(m=Max('completed_at')).values('m')
+
+    with transaction.atomic():
+        return enrollments.update(
+            total_required_lessons=Coalesce(Subquery(total_required), 0),
+            completed_required_lessons=Coalesce(Subquery(completed_required), 0),
+            score_sum=Coalesce(Subquery(score_sum), 0),
+            last_activity_at=Coalesce(Subquery(last_activity), F('last_activity_at')),
+        )
+
+
+def refresh_course_counters(course_id):
+    """Пересчет счетчиков всех зачислений курса после изменения его уроков"""
+    updated = rebuild_enrollment_counters(Enrollment.objects.filter(course_id=course_id))
+    student_stats.refresh_course_max_scores(course_id)
+    return updated
+
+
+# Страница "Мои курсы"
+
+STUDENT_COURSES_ORDERINGS = {
+    'activity': (F('last_activity_at').desc(nulls_last=True), '-enrollment_date', 'enrollment_id'),
+    'progress': ('-progress', 'course__title', 'enrollment_id'),
+    'title': ('course__title', 'enrollment_id'),
+}
+DEFAULT_STUDENT_COURSES_SORT = 'activity'
+
+
+def get_student_enrollments(student, status=None, sort=DEFAULT_STUDENT_COURSES_SORT):
+    """
+    Зачисления студента с курсом, прогрессом (из счетчиков зачисления)
+    и количеством активных студентов курса - один запрос независимо от размера каталога
+    """
+    enrollments = Enrollment.objects.filter(student=student).select_related('course').annotate(
+        progress=Case(
+            When(total_required_lessons=0, then=Value(0.0)),
+            default=Cast('completed_required_lessons', FloatField()) * 100 / F('total_required_lessons'),
+            output_field=FloatField(),
+        ),
+        active_students_count=count_subquery(
+            Enrollment.objects.filter(status=EnrollmentStatus.ACTIVE), 'course_id'
+        ),
+    )
+    if status:
+        enrollments = enrollments.filter(status=status)
+    ordering = STUDENT_COURSES_ORDERINGS.get(sort, STUDENT_COURSES_ORDERINGS[DEFAULT_STUDENT_COURSES_SORT])
+    return enrollments.order_by(*ordering)
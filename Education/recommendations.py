@@ -0,0 +1,122 @@
+# recommendations.py
+import heapq
+import math
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Sum
+from .models import Course, CourseNeighbor, Enrollment, EnrollmentStatus
+from .prerequisites import get_prerequisite_graph, get_student_courses
+
+
+RECOMMENDATION_NEIGHBORS = 20
+RECOMMENDATION_BATCH_SIZE = 5000
+# Пары курсов с меньшим числом общих студентов считаются случайным совпадением
+RECOMMENDATION_MIN_COMMON = 2
+RECOMMENDATIONS_LIMIT = 4
+# Сколько кандидатов читается до фильтрации по требованиям и зачислениям
+_CANDIDATES = 50
+
+
+def _student_courses(batch_size):
+    """
+    Множества курсов студентов пачками по batch_size студентов (по возрастанию id).
+    Отмененные зачисления не считаются интересом к курсу.
+    """
+    enrollments = Enrollment.objects.exclude(status=EnrollmentStatus.CANCELLED)
+    students = enrollments.order_by('student_id').values_list('student_id', flat=True).distinct()
+    last_student_id = None
+    while True:
+        batch = students if last_student_id is None else students.filter(student_id__gt=last_student_id)
+        student_ids = list(batch[:batch_size])
+        if not student_ids:
+            break
+        courses = defaultdict(set)
+        for student_id, course_id in enrollments.filter(
+            student_id__gte=student_ids[0], student_id__lte=student_ids[-1]
+        ).values_list('student_id', 'course_id'):
+            courses[student_id].add(course_id)
+        yield courses.values()
+        last_student_id = student_ids[-1]
+
+
+def count_course_pairs(batch_size=RECOMMENDATION_BATCH_SIZE):
+    """
+    Разреженная матрица студент x курс, свернутая в счетчики:
+    (студентов курса, {курс: {другой курс: общих студентов}}).
+    В памяти одна пачка студентов и счетчики пар курсов - объем не зависит от числа зачислений.
+    """
+    course_counts = Counter()
+    pairs = defaultdict(Counter)
+    for batch in _student_courses(batch_size):
+        for course_ids in batch:
+            course_counts.update(course_ids)
+            for course_id in course_ids:
+                row = pairs[course_id]
+                for other_id in course_ids:
+                    if other_id != course_id:
+                        row[other_id] += 1
+    return course_counts, pairs
+
+
+def build_course_neighbors(neighbors=RECOMMENDATION_NEIGHBORS, batch_size=RECOMMENDATION_BATCH_SIZE,
+                           min_common=RECOMMENDATION_MIN_COMMON):
+    """
+    Пересчитывает таблицу CourseNeighbor: для каждого курса top-N курсов по косинусному
+    сходству столбцов матрицы зачислений. Таблица заменяется целиком в одной транзакции.
+    Возвращает число сохраненных пар.
+    """
+    course_counts, pairs = count_course_pairs(batch_size)
+    rows = []
+    for course_id, row in pairs.items():
+        scored = (
+            (common / math.sqrt(course_counts[course_id] * course_counts[other_id]), common, -other_id)
+            for other_id, common in row.items() if common >= min_common
+        )
+        for score, common, other_id in heapq.nlargest(neighbors, scored):
+            rows.append(CourseNeighbor(
+                course_id=course_id, neighbor_id=-other_id, score=score, common_students=common
+            ))
+    with transaction.atomic():
+        CourseNeighbor.objects.all().delete()
+        CourseNeighbor.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def _available(course_ids, student_courses, limit):
+    """Курсы, на которые студент еще не записан и обязательные требования которых выполнены"""
+    completed, enrolled = student_courses
+    graph = get_prerequisite_graph()
+    available = [
+        course_id for course_id in course_ids
+        if course_id not in enrolled and not graph.missing(course_id, completed)[0]
+    ][:limit]
+    courses = Course.objects.filter(is_active=True).in_bulk(available) if available else {}
+    return [courses[course_id] for course_id in available if course_id in courses]
+
+
+def get_course_recommendations(course, student=None, student_courses=None, limit=RECOMMENDATIONS_LIMIT):
+    """
+    "С этим курсом также проходят": соседи курса по убыванию сходства.
+    Без студента остаются только курсы без обязательных требований.
+    """
+    if student_courses is None:
+        student_courses = get_student_courses(student) if student is not None else ({}, set())
+    course_ids = CourseNeighbor.objects.filter(
+        course=course, neighbor__is_active=True
+    ).order_by('-score', 'neighbor_id').values_list('neighbor_id', flat=True)[:_CANDIDATES]
+    return _available(course_ids, student_courses, limit)
+
+
+def get_student_recommendations(student, student_courses=None, limit=RECOMMENDATIONS_LIMIT):
+    """Рекомендации для кабинета: сходство с курсами студента суммируется одним сгруппированным запросом"""
+    student_courses = student_courses or get_student_courses(student)
+    enrolled = student_courses[1]
+    if not enrolled:
+        return []
+    course_ids = CourseNeighbor.objects.filter(
+        course_id__in=enrolled, neighbor__is_active=True
+    ).exclude(neighbor_id__in=enrolled).order_by().values('neighbor_id').annotate(
+        total=Sum('score')
+    ).order_by('-total', 'neighbor_id').values_list('neighbor_id', flat=True)[:_CANDIDATES]
+    return _available(course_ids, student_courses, limit)
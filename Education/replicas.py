@@ -0,0 +1,85 @@
+# replicas.py
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+
+# Значения по умолчанию; переопределяются одноименными настройками
+REPLICA_MAX_LAG = 5
+REPLICA_CHECK_INTERVAL = 10
+
+# Отставание в секундах. Если реплика применила все полученное WAL, она не отстает,
+# даже если последняя транзакция была давно (на простаивающем мастере)
+_LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+
+def configured_replicas():
+    return [alias for alias in getattr(settings, 'DATABASE_REPLICAS', ()) if alias in settings.DATABASES]
+
+
+def measure_lag(alias):
+    """Отставание реплики в секундах; None, если реплика недоступна"""
+    connection = connections[alias]
+    try:
+        if connection.vendor != 'postgresql':
+            connection.ensure_connection()
+            return 0.0
+        with connection.cursor() as cursor:
+            cursor.execute(_LAG_SQL)
+            return float(cursor.fetchone()[0])
+    except DatabaseError:
+        # Сломанное соединение не переиспользуется следующей проверкой
+        try:
+            connection.close()
+        except DatabaseError:
+            pass
+        return None
+
+
+def probe_replicas():
+    """{алиас: отставание в секундах или None} по всем настроенным репликам"""
+    return {alias: measure_lag(alias) for alias in configured_replicas()}
+
+
+_state = {'checked_at': None, 'healthy': []}
+_lock = threading.Lock()
+
+
+def _check_due(now):
+    interval = getattr(settings, 'REPLICA_CHECK_INTERVAL', REPLICA_CHECK_INTERVAL)
+    return _state['checked_at'] is None or now - _state['checked_at'] >= interval
+
+
+def healthy_replicas():
+    """
+    Реплики в ротации: доступные и отстающие не больше REPLICA_MAX_LAG секунд.
+    Проверка выполняется не чаще раза в REPLICA_CHECK_INTERVAL секунд на процесс.
+    """
+    if not configured_replicas():
+        return []
+    now = time.monotonic()
+    if _check_due(now):
+        with _lock:
+            if _check_due(now):
+                max_lag = getattr(settings, 'REPLICA_MAX_LAG', REPLICA_MAX_LAG)
+                _state['healthy'] = [
+                    alias for alias, lag in probe_replicas().items()
+                    if lag is not None and lag <= max_lag
+                ]
+                _state['checked_at'] = now
+    return _state['healthy']
+
+
+def choose_replica():
+    """Случайная реплика из ротации или None (тогда чтение идет на мастер)"""
+    healthy = healthy_replicas()
+    return random.choice(healthy) if healthy else None
@@ -0,0 +1,199 @@
+# review_queue.py
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from .models import HomeworkStatus, HomeworkSubmission, TeacherCourse, urgency_rank
+from .reviewer_stats import invalidate_reviewer_stats
+
+
+REVIEW_BATCH_SIZE = 5
+REVIEW_LEASE = timedelta(minutes=30)
+
+# Задания, ожидающие проверяющего
+QUEUED_STATUSES = (HomeworkStatus.SUBMITTED, HomeworkStatus.RESUBMITTED)
+# Незавершенные задания: в очереди или на проверке
+OPEN_STATUSES = QUEUED_STATUSES + (HomeworkStatus.UNDER_REVIEW,)
+
+class ClaimLost(Exception):
+    """Аренда задания истекла и оно ушло в очередь (или к другому проверяющему)"""
+
+
+# Порядок выдачи: срочность, затем самые старые, затем курс.
+# Первые два поля покрывает индекс submissions_queue_rank_idx
+QUEUE_ORDERING = ('urgency_rank', 'submitted_at', 'enrollment__course_id', 'submission_id')
+
+
+def _expired(now):
+    return Q(status=HomeworkStatus.UNDER_REVIEW, lease_expires_at__lt=now)
+
+
+def claimable(now=None, course_ids=None, reviewer=None):
+    """
+    Задания, которые можно взять: из очереди и с истекшей арендой.
+    Назначенные балансировщиком задания из очереди достаются только своему проверяющему.
+    """
+    now = now or timezone.now()
+    queued = Q(status__in=QUEUED_STATUSES)
+    if reviewer is not None:
+        queued &= Q(reviewer__isnull=True) | Q(reviewer=reviewer)
+    submissions = HomeworkSubmission.objects.filter(queued | _expired(now))
+    if course_ids is not None:
+        submissions = submissions.filter(enrollment__course_id__in=course_ids)
+    return submissions.annotate(urgency_rank=urgency_rank()).order_by(*QUEUE_ORDERING)
+
+
+def reviewer_course_ids(reviewer):
+    return TeacherCourse.objects.filter(reviewer=reviewer).values('course_id')
+
+
+def _workload_changed(changes):
+    # Импорт здесь: модуль нагрузки сам зависит от очереди
+    from .workload import apply_workload_changes
+    apply_workload_changes(changes)
+
+
+def _stats_changed(reviewer_ids):
+    # Массовые update() не отправляют post_save, поэтому статистику
+    # проверяющих сбрасываем явно
+    for reviewer_id in set(reviewer_ids):
+        if reviewer_id is not None:
+            invalidate_reviewer_stats(reviewer_id)
+
+
+def claim_submissions(reviewer, limit=REVIEW_BATCH_SIZE, lease=REVIEW_LEASE, course_ids=None):
+    """
+    Атомарно закрепляет за проверяющим до limit заданий из начала очереди.
+    Строки выбираются через SELECT ... FOR UPDATE SKIP LOCKED, поэтому
+    параллельные проверяющие не ждут друг друга и не получают одно задание.
+    По умолчанию берутся только задания курсов проверяющего.
+    """
+    if course_ids is None:
+        course_ids = reviewer_course_ids(reviewer)
+    now = timezone.now()
+    with transaction.atomic():
+        rows = list(
+            claimable(now, course_ids, reviewer).select_for_update(
+                skip_locked=True, of=('self',)
+            ).values_list('submission_id', 'reviewer_id')[:limit]
+        )
+        ids = [submission_id for submission_id, _ in rows]
+        if ids:
+            HomeworkSubmission.objects.filter(pk__in=ids).update(
+                status=HomeworkStatus.UNDER_REVIEW,
+                reviewer=reviewer,
+                claimed_at=now,
+                lease_expires_at=now + lease,
+            )
+
+    # Задания, назначенные другим (истекшая аренда), переходят к взявшему
+    changes = defaultdict(int)
+    for _, previous_reviewer_id in rows:
+        if previous_reviewer_id != reviewer.pk:
+            changes[previous_reviewer_id] -= 1
+            changes[reviewer.pk] += 1
+    _workload_changed(changes)
+    if ids:
+        _stats_changed([reviewer.pk] + [previous_reviewer_id for _, previous_reviewer_id in rows])
+    return list(
+        HomeworkSubmission.objects.filter(pk__in=ids).annotate(
+            urgency_rank=urgency_rank()
+        ).select_related(
+            'homework__lesson__module__course',
+            'enrollment__student'
+        ).order_by(*QUEUE_ORDERING)
+    )
+
+
+def _held(submission, reviewer, now):
+    return HomeworkSubmission.objects.filter(
+        pk=submission.pk,
+        reviewer=reviewer,
+        status=HomeworkStatus.UNDER_REVIEW,
+        lease_expires_at__gte=now,
+    )
+
+
+def renew_claim(submission, reviewer, lease=REVIEW_LEASE):
+    """Продлевает аренду задания; ClaimLost, если она уже истекла"""
+    now = timezone.now()
+    if not _held(submission, reviewer, now).update(lease_expires_at=now + lease):
+        raise ClaimLost(submission.pk)
+
+
+def release_claim(submission, reviewer):
+    """Возвращает задание в общую очередь до истечения аренды"""
+    released = _held(submission, reviewer, timezone.now()).update(
+        status=HomeworkStatus.SUBMITTED,
+        reviewer=None,
+        claimed_at=None,
+        lease_expires_at=None,
+    )
+    if released:
+        _workload_changed({reviewer.pk: -1})
+        _stats_changed([reviewer.pk])
+    return bool(released)
+
+
+def complete_review(submission, reviewer, status, score=None, feedback=''):
+    """Сохраняет результат проверки, если задание все еще закреплено за проверяющим"""
+    now = timezone.now()
+    updated = _held(submission, reviewer, now).update(
+        status=status,
+        score=score,
+        feedback=feedback,
+        reviewed_at=now,
+        lease_expires_at=None,
+    )
+    if not updated:
+        raise ClaimLost(submission.pk)
+    if status not in OPEN_STATUSES:
+        _workload_changed({reviewer.pk: -1})
+    _stats_changed([reviewer.pk])
+
+
+def requeue_expired(now=None):
+    """
+    Возвращает в очередь задания с истекшей арендой и заново распределяет их
+    между проверяющими курса. Возвращает количество возвращенных заданий
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        rows = list(
+            HomeworkSubmission.objects.filter(_expired(now)).select_for_update(
+                skip_locked=True
+            ).values_list('submission_id', 'enrollment_id', 'reviewer_id')
+        )
+        if rows:
+            HomeworkSubmission.objects.filter(pk__in=[row[0] for row in rows]).update(
+                status=HomeworkStatus.SUBMITTED,
+                reviewer=None,
+                claimed_at=None,
+                lease_expires_at=None,
+            )
+
+    changes = defaultdict(int)
+    for _, _, reviewer_id in rows:
+        changes[reviewer_id] -= 1
+    _workload_changed(changes)
+    _stats_changed(changes)
+
+    from .workload import assign_submission
+    for submission_id, enrollment_id, _ in rows:
+        assign_submission(HomeworkSubmission(submission_id=submission_id, enrollment_id=enrollment_id))
+    return len(rows)
+
+
+def get_claimed_submissions(reviewer, now=None):
+    """Задания, закрепленные за проверяющим, в порядке очереди"""
+    now = now or timezone.now()
+    return HomeworkSubmission.objects.filter(
+        reviewer=reviewer,
+        status=HomeworkStatus.UNDER_REVIEW,
+        lease_expires_at__gte=now,
+    ).annotate(urgency_rank=urgency_rank()).select_related(
+        'homework__lesson__module__course',
+        'enrollment__student'
+    ).order_by(*QUEUE_ORDERING)
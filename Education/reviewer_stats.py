@@ -0,0 +1,78 @@
+# reviewer_stats.py
+from django.core.cache import cache
+from django.db.models import Avg, Count, FloatField, Min, Q
+from django.utils import timezone
+from .models import Course, Enrollment, EnrollmentStatus, HomeworkStatus
+from .catalog import count_subquery
+from .routers import reads_rls_tables
+
+
+REVIEWER_STATS_CACHE_TIMEOUT = 60
+
+
+def _cache_key(reviewer_id):
+    return f'education:reviewer_stats:{reviewer_id}'
+
+
+def annotate_reviewer_stats(courses, reviewer):
+    """
+    Статистика преподавателя по курсам одним запросом:
+    активные студенты, задания на проверке, все задания, средний балл,
+    дата самого старого непроверенного задания
+    """
+    submissions = 'enrollments__homework_submissions'
+    own = Q(**{f'{submissions}__reviewer': reviewer})
+    pending = own & Q(**{f'{submissions}__status': HomeworkStatus.UNDER_REVIEW})
+    return reads_rls_tables(courses).annotate(
+        active_students=count_subquery(
+            Enrollment.objects.filter(status=EnrollmentStatus.ACTIVE), 'course_id'
+        ),
+        total_submissions=Count(submissions, filter=own),
+        pending_submissions=Count(submissions, filter=pending),
+        average_score=Avg(f'{submissions}__score', filter=own, output_field=FloatField()),
+        oldest_pending_at=Min(f'{submissions}__submitted_at', filter=pending),
+    )
+
+
+def _stats(course, now):
+    return {
+        'active_students_count': course.active_students,
+        'pending_in_course': course.pending_submissions,
+        'total_in_course': course.total_submissions,
+        'average_score': course.average_score,
+        'oldest_pending_at': course.oldest_pending_at,
+        'oldest_pending_age': now - course.oldest_pending_at if course.oldest_pending_at else None,
+    }
+
+
+def get_reviewer_courses_stats(reviewer, use_cache=True):
+    """
+    Курсы преподавателя со статистикой: [{'course': ..., 'stats': {...}}].
+    Количество запросов не зависит от числа курсов; результат кэшируется ненадолго.
+    """
+    key = _cache_key(reviewer.pk)
+    courses = cache.get(key) if use_cache else None
+    if courses is None:
+        courses = list(
+            annotate_reviewer_stats(
+                Course.objects.filter(teacher_courses__reviewer=reviewer), reviewer
+            ).order_by('title', 'course_id')
+        )
+        if use_cache:
+            cache.set(key, courses, REVIEWER_STATS_CACHE_TIMEOUT)
+
+    # Возраст считаем при чтении, чтобы он не "застывал" в кэше
+    now = timezone.now()
+    return [{'course': course, 'stats': _stats(course, now)} for course in courses]
+
+
+def get_reviewer_course_stats(reviewer, course):
+    """Статистика преподавателя по одному курсу (тот же запрос, без кэша)"""
+    course = annotate_reviewer_stats(Course.objects.filter(pk=course.pk), reviewer).first()
+    if course is None:
+        return None
+    return _stats(course, timezone.now())
+
+
+def invalidate_reviewer_stats(reviewer_id):
+    cache.delete(_cache_key(reviewer_id))
@@ -0,0 +1,152 @@
+# routers.py
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from .replicas import choose_replica
+
+
+ROLE_ADMIN = 'admin'
+ROLE_TEACHER = 'teacher'
+ROLE_STUDENT = 'student'
+
+# Соединение каждой роли (пользователи edu_admin / edu_teacher / edu_student из файла Roles)
+ROLE_DATABASES = {
+    ROLE_ADMIN: DEFAULT_DB_ALIAS,
+    ROLE_TEACHER: 'teacher_db',
+    ROLE_STUDENT: 'student_db',
+}
+
+# Таблицы под RLS (политики в файле Roles): строки видны, только если соединение передало
+# django.user_id. Соединения ролей общие для всех пользователей процесса и его не передают,
+# а с ним страницы все равно не могли бы читать эти таблицы целиком (студенты и задания курса,
+# счетчики каталога). Поэтому таблицы под RLS читаются через default
+RLS_TABLES = frozenset({'students', 'enrollments', 'lesson_completions', 'homework_submissions'})
+
+# Таблицы, на которые роли выдан SELECT (повторяет GRANT из файла Roles), без таблиц под RLS.
+# Роутер видит только модель запроса, поэтому запрос к этим таблицам, который join'ит таблицы
+# под RLS, помечается reads_rls_tables()
+_STUDENT_TABLES = frozenset({
+    'courses', 'modules', 'lessons', 'homeworks', 'reviewers',
+    'tags', 'course_tags', 'course_prerequisites', 'course_neighbors', 'student_stats',
+})
+ROLE_READ_TABLES = {
+    'student_db': _STUDENT_TABLES,
+    # teacher_group включает student_group
+    'teacher_db': _STUDENT_TABLES | {'teacher_courses'},
+}
+
+# Cookie, закрепляющая пользователя за мастером после записи (read-your-writes)
+PRIMARY_COOKIE = 'edu_primary'
+READ_YOUR_WRITES_WINDOW = 15
+
+# Подсказка роутеру в QuerySet._hints (Django передает ее в db_for_read)
+_RLS_HINT = 'education_rls_tables'
+
+_current_role = ContextVar('education_db_role', default=None)
+# {'pinned': чтение только с мастера, 'wrote': в запросе была запись}
+_request_state = ContextVar('education_db_state', default=None)
+_replica_reads = ContextVar('education_replica_reads', default=False)
+
+
+@contextmanager
+def use_db_role(role, pinned=False):
+    """Роль базы данных на время запроса (или задачи); вложенные блоки восстанавливают прежнюю"""
+    token = _current_role.set(role)
+    state_token = _request_state.set({'pinned': pinned, 'wrote': False})
+    try:
+        yield
+    finally:
+        _request_state.reset(state_token)
+        _current_role.reset(token)
+
+
+def get_db_role():
+    return _current_role.get()
+
+
+@contextmanager
+def replica_reads():
+    """
+    Чтение в блоке (или декорированной функции) можно отдать реплике: каталог, аналитика.
+    Запрос, закрепленный за мастером или уже писавший в базу, читает с мастера.
+    """
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def reads_rls_tables(queryset):
+    """Запрос join'ит таблицы под RLS: читается через default (или реплику), а не соединением роли"""
+    queryset = queryset.all()
+    queryset._hints = {**queryset._hints, _RLS_HINT: True}
+    return queryset
+
+
+def wrote_to_primary():
+    state = _request_state.get()
+    return state is not None and state['wrote']
+
+
+def _replica_allowed():
+    state = _request_state.get()
+    return state is None or not (state['pinned'] or state['wrote'])
+
+
+def role_for_request(request):
+    """Роль по типу пользователя: администратор, одобренный преподаватель или студент (и гость)"""
+    user = request.user
+    if not user.is_authenticated:
+        return ROLE_STUDENT
+    if user.is_superuser or user.is_staff:
+        return ROLE_ADMIN
+    profile = request.profile
+    if profile.has_reviewer and profile.is_approved:
+        return ROLE_TEACHER
+    return ROLE_STUDENT
+
+
+def role_alias(role=None):
+    """Соединение роли; если алиас не настроен, используется default"""
+    alias = ROLE_DATABASES.get(role or get_db_role(), DEFAULT_DB_ALIAS)
+    return alias if alias in settings.DATABASES else DEFAULT_DB_ALIAS
+
+
+class RoleRouter:
+    """
+    Чтение идет через соединение роли текущего запроса, если роли выдан SELECT на таблицу.
+    Запись - всегда через default: у ролей нет DELETE, а transaction.atomic() без using
+    открывает транзакцию на default, и все ее запросы должны идти одним соединением.
+    Алиас возвращается всегда явно, иначе Django взял бы базу объекта из подсказки instance.
+    В блоках replica_reads() чтение идет на случайную реплику из ротации (см. replicas.py).
+    """
+
+    def db_for_read(self, model, **hints):
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            # Внутри транзакции читаем ее соединением: видны свои записи, работает select_for_update
+            return DEFAULT_DB_ALIAS
+        if _replica_reads.get() and _replica_allowed():
+            replica = choose_replica()
+            if replica is not None:
+                return replica
+        alias = role_alias()
+        if hints.get(_RLS_HINT) or model._meta.db_table not in ROLE_READ_TABLES.get(alias, ()):
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        state = _request_state.get()
+        # Сессии и last_login не закрепляют пользователя за мастером: реплики читают только данные платформы
+        if state is not None and model._meta.app_label == 'Education':
+            state['wrote'] = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Все алиасы (и реплики) смотрят в одну базу education_platform
+        return obj1._state.db in settings.DATABASES and obj2._state.db in settings.DATABASES
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,108 @@
+# search.py
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (
+    SearchHeadline, SearchQuery, SearchRank, SearchVector, TrigramWordSimilarity
+)
+from django.db import connections
+from django.db.models import F, FloatField, OuterRef, Q, Subquery, TextField
+from django.db.models.functions import Cast
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+from .models import Course, CourseTag
+
+
+# Полнотекстовый поиск ищет одновременно по русской и английской морфологии
+SEARCH_CONFIGS = ('russian', 'english')
+TRIGRAM_THRESHOLD = 0.3
+
+# Служебные маркеры подсветки: заменяются на <mark> уже после экранирования текста
+_START_SEL = '\x02'
+_STOP_SEL = '\x03'
+
+
+def is_full_text_available(using='default'):
+    return connections[using].vendor == 'postgresql'
+
+
+def _tag_names():
+    return CourseTag.objects.filter(
+        course_id=OuterRef('course_id')
+    ).order_by().values('course_id').annotate(
+        names=StringAgg('tag__name', delimiter=' ')
+    ).values('names')
+
+
+def search_vector_expression():
+    """tsvector курса: название (A), названия тегов (B), описание (C)"""
+    tag_names = Subquery(_tag_names(), output_field=TextField())
+    vector = None
+    for weight, source in (('A', F('title')), ('B', tag_names), ('C', F('description'))):
+        for config in SEARCH_CONFIGS:
+            part = SearchVector(source, config=config, weight=weight)
+            vector = part if vector is None else vector + part
+    return vector
+
+
+def update_search_vectors(courses=None):
+    """Пересчитывает search_vector для набора курсов одним UPDATE"""
+    if courses is None:
+        courses = Course.objects.all()
+    if not is_full_text_available(courses.db):
+        return 0
+    return courses.update(search_vector=search_vector_expression())
+
+
+def build_search_query(query):
+    search_query = None
+    for config in SEARCH_CONFIGS:
+        part = SearchQuery(query, config=config, search_type='websearch')
+        search_query = part if search_query is None else search_query | part
+    return search_query
+
+
+def search_courses(courses, query):
+    """
+    Фильтрует и ранжирует курсы по поисковому запросу.
+    Возвращает (queryset, ordering), где ordering - поля для keyset-пагинации.
+    На PostgreSQL используется tsvector с ранжированием и подсветкой,
+    при отсутствии совпадений - триграммный поиск по названию (опечатки).
+    На других СУБД - поиск по вхождению подстроки.
+    """
+    if not is_full_text_available(courses.db):
+        courses = courses.filter(
+            Q(title__icontains=query) |
+            Q(description__icontains=query) |
+            Q(course_id__in=CourseTag.objects.filter(tag__name__icontains=query).values('course_id'))
+        )
+        return courses, None
+
+    search_query = build_search_query(query)
+    found = courses.filter(search_vector=search_query)
+    if found.exists():
+        found = found.annotate(
+            # real -> double, чтобы значение в курсоре пагинации сравнивалось точно
+            rank=Cast(SearchRank(F('search_vector'), search_query), FloatField()),
+            headline=SearchHeadline(
+                'description',
+                search_query,
+                config=SEARCH_CONFIGS[0],
+                start_sel=_START_SEL,
+                stop_sel=_STOP_SEL,
+                max_words=35,
+                min_words=15,
+            ),
+        )
+        return found, ('-rank', 'course_id')
+
+    similar = courses.annotate(
+        similarity=Cast(TrigramWordSimilarity(query, 'title'), FloatField())
+    ).filter(similarity__gt=TRIGRAM_THRESHOLD)
+    return similar, ('-similarity', 'course_id')
+
+
+def highlight(headline):
+    """Экранирует фрагмент из ts_headline и размечает совпадения тегом <mark>"""
+    if not headline:
+        return ''
+    text = escape(headline).replace(_START_SEL, '<mark>').replace(_STOP_SEL, '</mark>')
+    return mark_safe(text)
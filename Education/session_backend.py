@@ -0,0 +1,111 @@
+# session_backend.py
+from django.conf import settings
+from django.contrib.sessions.backends.base import UpdateError
+from django.core import checks
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+from django.db import router
+from django.utils import timezone
+
+
+# Значения по умолчанию; переопределяются одноименными настройками
+SESSION_REFRESH_INTERVAL = 300
+SESSION_PURGE_BATCH_SIZE = 1000
+
+# Кэши, не общие для процессов: выход в одном процессе не виден остальным
+_LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def _refresh_key(session_key):
+    return f'education:session_refreshed:{session_key}'
+
+
+class SessionStore(CachedDBStore):
+    """
+    Сессии в кэше с записью в базу только при изменении содержимого.
+    При SESSION_SAVE_EVERY_REQUEST сессия сохраняется на каждый запрос ради скользящего
+    срока жизни; такое продление пишется в базу (одним UPDATE expire_date) не чаще раза
+    в SESSION_REFRESH_INTERVAL секунд на сессию, остальные сохранения в базу не ходят.
+    Срок в базе отстает от срока cookie не больше чем на этот интервал.
+    Закэшированной сессии тоже верим не дольше интервала: после него сессия перечитывается
+    из базы, и удаленная там (выход, очистка) перестает действовать. Кэш должен быть общим
+    для всех процессов (см. check_session_cache), иначе выход виден остальным процессам
+    только через SESSION_REFRESH_INTERVAL.
+    """
+
+    cache_key_prefix = 'education:session:'
+
+    def _refresh_interval(self):
+        return getattr(settings, 'SESSION_REFRESH_INTERVAL', SESSION_REFRESH_INTERVAL)
+
+    def load(self):
+        # Интервал с последней записи в базу прошел - закэшированные данные не используем
+        if self.session_key is not None and self._cache.get(_refresh_key(self.session_key)) is None:
+            self._cache.delete(self.cache_key)
+        return super().load()
+
+    async def aload(self):
+        if self.session_key is not None and await self._cache.aget(_refresh_key(self.session_key)) is None:
+            await self._cache.adelete(await self.acache_key())
+        return await super().aload()
+
+    def save(self, must_create=False):
+        if must_create or self.session_key is None or self.modified:
+            super().save(must_create=must_create)
+            self._cache.set(_refresh_key(self.session_key), True, self._refresh_interval())
+            return
+        # Только продление срока: первое сохранение за интервал пишет его в базу
+        if not self._cache.add(_refresh_key(self.session_key), True, self._refresh_interval()):
+            return
+        updated = self.model.objects.using(router.db_for_write(self.model)).filter(
+            session_key=self.session_key
+        ).update(expire_date=self.get_expiry_date())
+        if not updated:
+            # Сессию удалили (выход на другом устройстве, очистка): как и стандартный бэкенд
+            self._cache.delete(_refresh_key(self.session_key))
+            raise UpdateError
+        self._cache.set(self.cache_key, self._get_session(no_load=True), self.get_expiry_age())
+
+    def delete(self, session_key=None):
+        if session_key is None and self.session_key is not None:
+            session_key = self.session_key
+        if session_key is not None:
+            self._cache.delete(_refresh_key(session_key))
+        super().delete(session_key)
+
+    @classmethod
+    def clear_expired(cls, batch_size=None):
+        """
+        Удаляет истекшие сессии пачками по SESSION_PURGE_BATCH_SIZE ключей: каждая пачка -
+        отдельный короткий DELETE по первичному ключу, без долгих блокировок таблицы.
+        Возвращает число удаленных сессий (вызывается командой clearsessions).
+        """
+        batch_size = batch_size or getattr(settings, 'SESSION_PURGE_BATCH_SIZE', SESSION_PURGE_BATCH_SIZE)
+        sessions = cls.get_model_class().objects
+        now = timezone.now()
+        deleted = 0
+        while True:
+            keys = list(sessions.filter(expire_date__lt=now).values_list('session_key', flat=True)[:batch_size])
+            if not keys:
+                return deleted
+            deleted += sessions.filter(session_key__in=keys, expire_date__lt=now).delete()[0]
+            if len(keys) < batch_size:
+                return deleted
+
+
+def check_session_cache(app_configs, **kwargs):
+    """Проверка запуска: кэш сессий этого бэкенда общий для всех процессов"""
+    if settings.SESSION_ENGINE != __name__:
+        return []
+    alias = settings.SESSION_CACHE_ALIAS
+    backend = settings.CACHES.get(alias, {}).get('BACKEND')
+    if backend not in _LOCAL_CACHE_BACKENDS:
+        return []
+    return [checks.Error(
+        f'{__name__} требует общего для всех процессов кэша сессий, а кэш "{alias}" - {backend}',
+        hint='Настройте для SESSION_CACHE_ALIAS Redis или Memcached: иначе выход из аккаунта '
+             'в одном процессе не виден остальным до истечения SESSION_REFRESH_INTERVAL.',
+        id='Education.E001',
+    )]
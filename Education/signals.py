@@ -0,0 +1,251 @@
+# signals.py
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from .models import (
+    Student, Reviewer, Tag, Course, CourseTag, Module, Lesson, Enrollment,
+    HomeworkSubmission, TeacherCourse, CoursePrerequisite
+)
+from .profile import invalidate_profile
+from .catalog import invalidate_catalog
+from .search import update_search_vectors
+from .reviewer_stats import invalidate_reviewer_stats
+from .review_queue import OPEN_STATUSES, QUEUED_STATUSES
+from .prerequisites import invalidate_prerequisite_graph
+from .lesson_sequence import lesson_changed, module_changed
+from . import auto_enrollment
+from . import cooccurrence
+from . import tags
+from . import student_stats
+from . import workload
+from . import typeahead
+
+
+@receiver([post_save, post_delete], sender=Student)
+@receiver([post_save, post_delete], sender=Reviewer)
+def invalidate_user_profile(sender, instance, **kwargs):
+    """Сбрасываем кэш профиля в сессиях при изменении студента/преподавателя"""
+    invalidate_profile(instance.email)
+
+
+@receiver([post_save, post_delete], sender=Course)
+@receiver([post_save, post_delete], sender=CourseTag)
+@receiver([post_save, post_delete], sender=Module)
+@receiver([post_save, post_delete], sender=Lesson)
+@receiver([post_save, post_delete], sender=Enrollment)
+def invalidate_catalog_cache(sender, **kwargs):
+    """Любое изменение, видимое в каталоге, сбрасывает кэш его страниц"""
+    invalidate_catalog()
+
+
+@receiver(m2m_changed, sender=Course.tags.through)
+def invalidate_catalog_on_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    invalidate_catalog()
+    if reverse:
+        if pk_set:
+            update_search_vectors(Course.objects.filter(pk__in=pk_set))
+    else:
+        update_search_vectors(Course.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=Course)
+def update_course_search_vector(sender, instance, **kwargs):
+    """Поисковый вектор курса пересчитывается при каждом сохранении"""
+    update_search_vectors(Course.objects.filter(pk=instance.pk))
+
+
+@receiver([post_save, post_delete], sender=CourseTag)
+def update_search_vector_on_course_tag(sender, instance, **kwargs):
+    update_search_vectors(Course.objects.filter(pk=instance.course_id))
+
+
+@receiver(post_save, sender=Tag)
+def update_search_vectors_on_tag(sender, instance, created, **kwargs):
+    # Название тега входит в поисковый вектор всех его курсов
+    if not created:
+        update_search_vectors(Course.objects.filter(course_tags__tag=instance))
+
+
+# Счетчики курсов у тегов
+
+@receiver([post_save, post_delete], sender=Tag)
+def invalidate_tag_widgets(sender, **kwargs):
+    tags.invalidate_tag_widgets()
+
+
+@receiver(post_save, sender=CourseTag)
+def count_added_course_tag(sender, instance, created, **kwargs):
+    if created:
+        tags.course_tag_changed(instance, 1)
+
+
+@receiver(post_delete, sender=CourseTag)
+def count_removed_course_tag(sender, instance, **kwargs):
+    tags.course_tag_changed(instance, -1)
+
+
+@receiver(m2m_changed, sender=Course.tags.through)
+def count_course_tags_m2m(sender, instance, action, reverse, pk_set, **kwargs):
+    # add()/remove()/set() создают и удаляют связи без post_save/post_delete
+    if action == 'pre_clear':
+        # После очистки уже не узнать, какие теги были у курса
+        instance._cleared_tag_ids = (
+            [instance.pk] if reverse else list(instance.tags.values_list('tag_id', flat=True))
+        )
+    elif action == 'post_clear':
+        tags.refresh_tag_counts(getattr(instance, '_cleared_tag_ids', []))
+    elif action in ('post_add', 'post_remove'):
+        tags.refresh_tag_counts([instance.pk] if reverse else pk_set or [])
+
+
+@receiver(post_save, sender=Course)
+def count_course_tags_on_course(sender, instance, created, **kwargs):
+    # Активность курса входит в active_course_count его тегов
+    if not created:
+        tags.refresh_course_tag_counts(instance.pk)
+
+
+# Матрица совместной встречаемости тегов (после коммита, чтобы другие процессы
+# не перестроили копию из базы раньше, чем изменение станет видно)
+
+@receiver(post_save, sender=CourseTag)
+def add_course_tag_cooccurrence(sender, instance, created, **kwargs):
+    if created:
+        course_id = instance.course_id
+        transaction.on_commit(lambda: cooccurrence.refresh_courses([course_id]))
+
+
+@receiver(post_delete, sender=CourseTag)
+def remove_course_tag_cooccurrence(sender, instance, **kwargs):
+    course_id, tag_id = instance.course_id, instance.tag_id
+    transaction.on_commit(lambda: cooccurrence.link_removed(course_id, tag_id))
+
+
+@receiver(m2m_changed, sender=Course.tags.through)
+def update_cooccurrence_m2m(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse and action == 'post_clear':
+        tag_id = instance.pk
+        transaction.on_commit(lambda: cooccurrence.tag_cleared(tag_id))
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        course_ids = set(pk_set or ()) if reverse else {instance.pk}
+        transaction.on_commit(lambda: cooccurrence.refresh_courses(course_ids))
+
+
+@receiver(post_save, sender=Course)
+def update_cooccurrence_on_course(sender, instance, created, **kwargs):
+    # В матрице только активные курсы
+    if not created:
+        course_id = instance.pk
+        transaction.on_commit(lambda: cooccurrence.refresh_courses([course_id]))
+
+
+# Последовательность уроков курса (навигация и "продолжить")
+
+@receiver([post_save, post_delete], sender=Module)
+def invalidate_lesson_sequence_on_module(sender, instance, **kwargs):
+    module_changed(instance)
+
+
+@receiver([post_save, post_delete], sender=Lesson)
+def invalidate_lesson_sequence_on_lesson(sender, instance, **kwargs):
+    lesson_changed(instance)
+
+
+# Префиксный индекс подсказок поиска
+
+@receiver(post_save, sender=Course)
+def update_course_typeahead(sender, instance, **kwargs):
+    typeahead.update_course(instance)
+
+
+@receiver(post_delete, sender=Course)
+def remove_course_typeahead(sender, instance, **kwargs):
+    typeahead.remove_course(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Enrollment)
+def update_course_popularity_typeahead(sender, instance, **kwargs):
+    # Популярность курса в подсказках - число активных студентов
+    typeahead.update_course_popularity(instance.course_id)
+
+
+@receiver(post_save, sender=Tag)
+def update_tag_typeahead(sender, instance, **kwargs):
+    typeahead.update_tag(instance)
+
+
+@receiver(post_delete, sender=Tag)
+def remove_tag_typeahead(sender, instance, **kwargs):
+    typeahead.remove_tag(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=HomeworkSubmission)
+@receiver([post_save, post_delete], sender=TeacherCourse)
+def invalidate_reviewer_stats_cache(sender, instance, **kwargs):
+    if instance.reviewer_id is not None:
+        invalidate_reviewer_stats(instance.reviewer_id)
+
+
+# Балансировка нагрузки проверяющих
+
+@receiver(post_save, sender=HomeworkSubmission)
+def assign_new_submission(sender, instance, created, **kwargs):
+    if created:
+        if instance.reviewer_id is None and instance.status in QUEUED_STATUSES:
+            workload.assign_submission(instance)
+        elif instance.status in OPEN_STATUSES:
+            workload.apply_workload_changes({instance.reviewer_id: 1})
+    elif not hasattr(instance, '_loaded_status'):
+        # Объект не загружался из базы: прежнее состояние неизвестно, счетчики пересоберутся
+        workload.invalidate_workload_on_commit()
+    else:
+        # Переход статуса или смена проверяющего вне очереди проверки: -1 прежнему, +1 новому
+        changes = defaultdict(int)
+        if instance._loaded_status in OPEN_STATUSES:
+            changes[instance._loaded_reviewer_id] -= 1
+        if instance.status in OPEN_STATUSES:
+            changes[instance.reviewer_id] += 1
+        workload.apply_workload_changes(changes)
+    instance._loaded_status = instance.status
+    instance._loaded_reviewer_id = instance.reviewer_id
+
+
+@receiver(post_delete, sender=HomeworkSubmission)
+def release_deleted_submission(sender, instance, **kwargs):
+    if instance.status in OPEN_STATUSES:
+        workload.apply_workload_changes({instance.reviewer_id: -1})
+
+
+@receiver([post_save, post_delete], sender=Reviewer)
+@receiver([post_save, post_delete], sender=TeacherCourse)
+def invalidate_workload_on_reviewers(sender, **kwargs):
+    workload.invalidate_workload_on_commit()
+
+
+@receiver([post_save, post_delete], sender=CoursePrerequisite)
+def invalidate_prerequisites(sender, **kwargs):
+    invalidate_prerequisite_graph()
+
+
+# Переходы статуса зачисления: автозачисление и сводная статистика студента
+
+@receiver(post_save, sender=Enrollment)
+def track_enrollment_status(sender, instance, created, **kwargs):
+    previous_status = getattr(instance, '_loaded_status', None)
+    student_stats.enrollment_saved(instance, created, previous_status)
+    if auto_enrollment.became_completed(instance, created):
+        # Завершение курса зачисляет студента на открывшиеся курсы после коммита
+        student_id = instance.student_id
+        transaction.on_commit(lambda: auto_enrollment.enroll_unlocked([student_id]))
+    instance._loaded_status = instance.status
+
+
+@receiver(post_delete, sender=Enrollment)
+def rebuild_stats_on_enrollment_delete(sender, instance, **kwargs):
+    # После коммита: при удалении самого студента пересчитывать уже некого
+    student_id = instance.student_id
+    transaction.on_commit(lambda: student_stats.rebuild_student_stats([student_id]))
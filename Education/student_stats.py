@@ -0,0 +1,173 @@
+# student_stats.py
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db.models import Case, Count, F, IntegerField, Max, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest, TruncDate
+from django.utils import timezone
+from .models import Enrollment, EnrollmentStatus, Lesson, LessonCompletion, Student, StudentStats
+from .routers import reads_rls_tables
+
+
+STATS_BATCH_SIZE = 1000
+
+_REBUILT_FIELDS = (
+    'courses_count', 'completed_courses_count', 'lessons_completed', 'total_score', 'max_score',
+    'current_streak', 'longest_streak', 'last_activity_date', 'last_activity_at', 'updated_at',
+)
+
+
+def _streaks(days):
+    """(серия, заканчивающаяся последним днем; лучшая серия) по возрастающим дням активности"""
+    current = longest = 0
+    previous = None
+    for day in days:
+        current = current + 1 if previous is not None and (day - previous).days == 1 else 1
+        longest = max(longest, current)
+        previous = day
+    return current, longest
+
+
+def rebuild_student_stats(student_ids):
+    """
+    Пересчитывает статистику набора студентов с нуля: четыре сгруппированных
+    запроса и одна вставка с обновлением при конфликте. Возвращает число строк.
+    """
+    student_ids = list(Student.objects.filter(pk__in=student_ids).values_list('student_id', flat=True))
+    if not student_ids:
+        return 0
+    stats = {student_id: StudentStats(student_id=student_id) for student_id in student_ids}
+
+    for row in Enrollment.objects.filter(student_id__in=student_ids).order_by().values(
+        'student_id'
+    ).annotate(
+        courses=Count('enrollment_id'),
+        completed=Count('enrollment_id', filter=Q(status=EnrollmentStatus.COMPLETED)),
+    ):
+        stats[row['student_id']].courses_count = row['courses']
+        stats[row['student_id']].completed_courses_count = row['completed']
+
+    completions = LessonCompletion.objects.filter(enrollment__student_id__in=student_ids)
+    for row in completions.order_by().values('enrollment__student_id').annotate(
+        lessons=Count('completion_id'),
+        score=Sum('score'),
+        last_activity=Max('completed_at'),
+    ):
+        item = stats[row['enrollment__student_id']]
+        item.lessons_completed = row['lessons']
+        item.total_score = row['score'] or 0
+        item.last_activity_at = row['last_activity']
+
+    for row in reads_rls_tables(Lesson.objects.filter(
+        is_active=True,
+        module__course__enrollments__student_id__in=student_ids
+    )).order_by().values('module__course__enrollments__student_id').annotate(max_score=Sum('max_score')):
+        stats[row['module__course__enrollments__student_id']].max_score = row['max_score'] or 0
+
+    # Серии считаются по дням с завершенными уроками (в часовом поясе проекта)
+    days = defaultdict(list)
+    for student_id, day in completions.annotate(day=TruncDate('completed_at')).order_by(
+        'enrollment__student_id', 'day'
+    ).values_list('enrollment__student_id', 'day').distinct():
+        days[student_id].append(day)
+    for student_id, student_days in days.items():
+        item = stats[student_id]
+        item.current_streak, item.longest_streak = _streaks(student_days)
+        item.last_activity_date = student_days[-1]
+
+    StudentStats.objects.bulk_create(
+        stats.values(),
+        update_conflicts=True,
+        unique_fields=['student'],
+        update_fields=_REBUILT_FIELDS,
+    )
+    return len(stats)
+
+
+def get_student_stats(student):
+    """Статистика студента одной строкой; при отсутствии строки она строится"""
+    stats = StudentStats.objects.filter(student=student).first()
+    if stats is None:
+        rebuild_student_stats([student.pk])
+        stats = StudentStats.objects.filter(student=student).first()
+    return stats
+
+
+def _update_or_rebuild(student_id, **changes):
+    changes['updated_at'] = timezone.now()
+    if not StudentStats.objects.filter(student_id=student_id).update(**changes):
+        rebuild_student_stats([student_id])
+
+
+def _decrement(field, amount=1):
+    return Greatest(F(field) - amount, Value(0))
+
+
+def lesson_completed(student_id, completion):
+    """Учитывает завершение урока одним UPDATE, включая серию дней"""
+    day = timezone.localdate(completion.completed_at)
+    streak = Case(
+        When(last_activity_date=day, then=F('current_streak')),
+        When(last_activity_date=day - timedelta(days=1), then=F('current_streak') + 1),
+        default=Value(1),
+        output_field=IntegerField(),
+    )
+    _update_or_rebuild(
+        student_id,
+        lessons_completed=F('lessons_completed') + 1,
+        total_score=F('total_score') + (completion.score or 0),
+        current_streak=streak,
+        longest_streak=Greatest('longest_streak', streak),
+        last_activity_date=day,
+        last_activity_at=completion.completed_at,
+    )
+
+
+def lesson_uncompleted(student_id, score):
+    """Отмена завершения урока; серии дней уточняет только полный пересчет"""
+    _update_or_rebuild(
+        student_id,
+        lessons_completed=_decrement('lessons_completed'),
+        total_score=_decrement('total_score', score or 0),
+    )
+
+
+def _course_max_score(course_id):
+    return Lesson.objects.filter(
+        module__course_id=course_id,
+        is_active=True
+    ).aggregate(total=Sum('max_score'))['total'] or 0
+
+
+def enrollment_saved(enrollment, created, previous_status):
+    """Учитывает новое зачисление и переходы в статус "завершено" и обратно"""
+    if not created and previous_status is None:
+        # Прежний статус неизвестен (объект не загружался из базы)
+        rebuild_student_stats([enrollment.student_id])
+        return
+
+    completed = enrollment.status == EnrollmentStatus.COMPLETED
+    was_completed = previous_status == EnrollmentStatus.COMPLETED
+    changes = {}
+    if created:
+        changes['courses_count'] = F('courses_count') + 1
+        changes['max_score'] = F('max_score') + _course_max_score(enrollment.course_id)
+    if completed and not was_completed:
+        changes['completed_courses_count'] = F('completed_courses_count') + 1
+    elif was_completed and not completed:
+        changes['completed_courses_count'] = _decrement('completed_courses_count')
+    if changes:
+        _update_or_rebuild(enrollment.student_id, **changes)
+
+
+def refresh_course_max_scores(course_id):
+    """Пересчитывает максимальный балл студентов курса после изменения его уроков (один UPDATE)"""
+    max_score = Lesson.objects.filter(
+        is_active=True,
+        module__course__enrollments__student_id=OuterRef('student_id')
+    ).order_by().values('module__course__enrollments__student_id').annotate(
+        total=Sum('max_score')
+    ).values('total')
+    return StudentStats.objects.filter(
+        student__enrollments__course_id=course_id
+    ).update(max_score=Coalesce(Subquery(max_score, output_field=IntegerField()), 0))
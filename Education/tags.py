@@ -0,0 +1,268 @@
+# tags.py
+import hashlib
+import re
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, Q
+from django.utils.text import slugify
+from .cache_versions import bump_version, get_version
+from .models import Course, CourseTag, Tag
+from .catalog import count_subquery
+from . import typeahead
+
+
+def tag_count_expressions():
+    """Точные значения счетчиков тега коррелированными подзапросами"""
+    links = CourseTag.objects.all()
+    return {
+        'course_count': count_subquery(links, 'tag_id', 'tag_id'),
+        'active_course_count': count_subquery(links.filter(course__is_active=True), 'tag_id', 'tag_id'),
+    }
+
+
+def refresh_tag_counts(tag_ids):
+    """Пересчитывает счетчики набора тегов одним UPDATE. Возвращает число тегов"""
+    tag_ids = list(tag_ids)
+    if not tag_ids:
+        return 0
+    updated = Tag.objects.filter(pk__in=tag_ids).update(**tag_count_expressions())
+    typeahead.update_tag_popularity(tag_ids)
+    invalidate_tag_widgets()
+    return updated
+
+
+def refresh_course_tag_counts(course_id):
+    """Пересчет счетчиков тегов курса (например, после смены is_active)"""
+    return refresh_tag_counts(
+        CourseTag.objects.filter(course_id=course_id).values_list('tag_id', flat=True)
+    )
+
+
+def _course_is_active(course_tag):
+    if CourseTag.course.is_cached(course_tag):
+        return course_tag.course.is_active
+    return Course.objects.filter(pk=course_tag.course_id, is_active=True).exists()
+
+
+def course_tag_changed(course_tag, delta):
+    """Учитывает добавление (delta=1) или удаление (delta=-1) связи курса с тегом"""
+    changes = {'course_count': F('course_count') + delta}
+    if _course_is_active(course_tag):
+        changes['active_course_count'] = F('active_course_count') + delta
+    Tag.objects.filter(pk=course_tag.tag_id).update(**changes)
+    typeahead.update_tag_popularity([course_tag.tag_id])
+    invalidate_tag_widgets()
+
+
+def reconcile_tag_counts():
+    """Исправляет разошедшиеся счетчики всех тегов. Возвращает число исправленных тегов"""
+    drifted = list(Tag.objects.annotate(
+        **{f'actual_{field}': expression for field, expression in tag_count_expressions().items()}
+    ).exclude(
+        course_count=F('actual_course_count'),
+        active_course_count=F('actual_active_course_count'),
+    ).values_list('tag_id', flat=True))
+    return refresh_tag_counts(drifted)
+
+
+# Популярные теги и облако тегов: один закэшированный список на все виджеты
+
+TAG_WIDGETS_CACHE_TIMEOUT = 600
+TAG_WIDGETS_VERSION_KEY = 'education:tag_widgets_version'
+POPULAR_TAGS_LIMIT = 8
+# Размеры шрифта облака (em) - от наименее к наиболее популярным
+TAG_CLOUD_FONT_SIZES = (0.8, 1.1, 1.4, 1.7, 2.0)
+
+
+def get_tag_widgets_version():
+    return get_version(TAG_WIDGETS_VERSION_KEY)
+
+
+def invalidate_tag_widgets():
+    bump_version(TAG_WIDGETS_VERSION_KEY)
+
+
+def _font_size(count, max_count):
+    bucket = (count * len(TAG_CLOUD_FONT_SIZES) - 1) // max_count
+    return TAG_CLOUD_FONT_SIZES[bucket]
+
+
+def get_tag_widgets():
+    """
+    {'featured': популярные теги, 'cloud': теги с активными курсами и font_size}
+    по убыванию числа активных курсов. Один запрос на версию кэша.
+    """
+    key = f'education:tag_widgets:{get_tag_widgets_version()}'
+    widgets = cache.get(key)
+    if widgets is None:
+        tags = list(Tag.objects.filter(
+            Q(is_featured=True) | Q(active_course_count__gt=0)
+        ).order_by('-active_course_count', 'name'))
+        cloud = [tag for tag in tags if tag.active_course_count > 0]
+        for tag in cloud:
+            tag.font_size = _font_size(tag.active_course_count, cloud[0].active_course_count)
+        widgets = {
+            'featured': [tag for tag in tags if tag.is_featured],
+            'cloud': cloud,
+        }
+        cache.set(key, widgets, TAG_WIDGETS_CACHE_TIMEOUT)
+    return widgets
+
+
+def get_popular_tags(limit=POPULAR_TAGS_LIMIT):
+    return get_tag_widgets()['featured'][:limit]
+
+
+def get_tag_cloud():
+    return get_tag_widgets()['cloud']
+
+
+# Выделение tag_id и slug
+
+TAG_IMPORT_BATCH_SIZE = 1000
+# Если slugify ничего не оставил от названия (например, кириллица)
+DEFAULT_TAG_SLUG = 'tag'
+_SUFFIX_RE = re.compile(r'^(.*)-(\d+)$')
+
+
+def free_tag_ids(limit=1):
+    """
+    Наименьшие свободные tag_id ниже максимального (дыры после удалений) одним запросом:
+    ряд 1..max(tag_id) без занятых значений. Новые значения выше максимума выдает автоинкремент.
+    """
+    table = connection.ops.quote_name(Tag._meta.db_table)
+    column = connection.ops.quote_name(Tag._meta.pk.column)
+    if connection.vendor == 'postgresql':
+        series = f'select generate_series(1, (select coalesce(max({column}), 0) from {table})) as id'
+    else:
+        series = (
+            f'with recursive s(id) as (select 1 union all select id + 1 from s '
+            f'where id < (select coalesce(max({column}), 0) from {table})) select id from s'
+        )
+    sql = (
+        f'select g.id from ({series}) g '
+        f'where not exists (select 1 from {table} t where t.{column} = g.id) '
+        f'order by g.id limit %s'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [limit])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def create_tag(tag):
+    """Сохраняет новый тег в наименьший свободный tag_id (если дыр нет - автоинкремент)"""
+    free_ids = free_tag_ids()
+    if free_ids:
+        try:
+            with transaction.atomic():
+                tag.tag_id = free_ids[0]
+                tag.save(force_insert=True)
+                return tag
+        except IntegrityError:
+            # Дыру занял параллельный запрос - берем следующий номер автоинкремента
+            tag.tag_id = None
+    tag.save(force_insert=True)
+    return tag
+
+
+def base_slug(name):
+    return slugify(name)[:Tag._meta.get_field('slug').max_length - 8] or DEFAULT_TAG_SLUG
+
+
+class SlugAllocator:
+    """
+    Уникальные slug вида base, base-1, base-2, ... без проверки каждого варианта в базе:
+    занятые суффиксы каждой основы собираются из уже существующих slug
+    """
+
+    def __init__(self, slugs=()):
+        self._taken = defaultdict(set)
+        for slug in slugs:
+            self._add(slug)
+
+    def _add(self, slug):
+        self._taken[slug].add(0)
+        match = _SUFFIX_RE.match(slug)
+        if match:
+            self._taken[match.group(1)].add(int(match.group(2)))
+
+    def allocate(self, name):
+        base = base_slug(name)
+        taken = self._taken[base]
+        suffix = 0
+        while suffix in taken:
+            suffix += 1
+        slug = f'{base}-{suffix}' if suffix else base
+        self._add(slug)
+        return slug
+
+
+def unique_slug(name, exclude_pk=None):
+    """Свободный slug для названия одним запросом по префиксу"""
+    slugs = Tag.objects.filter(slug__startswith=base_slug(name))
+    if exclude_pk is not None:
+        slugs = slugs.exclude(pk=exclude_pk)
+    return SlugAllocator(slugs.values_list('slug', flat=True)).allocate(name)
+
+
+def _color_candidates(name):
+    digest = hashlib.md5(name.encode()).hexdigest()
+    for offset in range(0, len(digest) - 5):
+        yield f'#{digest[offset:offset + 6]}'
+    counter = 0
+    while True:
+        counter += 1
+        yield f'#{hashlib.md5(f"{name}:{counter}".encode()).hexdigest()[:6]}'
+
+
+def _allocate_color(name, used):
+    # Цвет тега уникален: без явного цвета выбираем детерминированный по названию
+    for color in _color_candidates(name):
+        if color not in used:
+            used.add(color)
+            return color
+
+
+def import_tags(rows, batch_size=TAG_IMPORT_BATCH_SIZE):
+    """
+    Массовое создание тегов: rows - словари с name и необязательными description,
+    color, is_featured. Теги с уже существующими названиями пропускаются.
+    Несколько запросов на всю пачку: существующие названия, slug и цвета,
+    свободные tag_id и bulk_create. Возвращает созданные теги.
+    """
+    rows = list({row['name'].strip(): row for row in rows if row.get('name', '').strip()}.values())
+    names = [row['name'].strip() for row in rows]
+    existing = set()
+    for start in range(0, len(names), batch_size):
+        existing.update(Tag.objects.filter(name__in=names[start:start + batch_size]).values_list('name', flat=True))
+    rows = [row for row in rows if row['name'].strip() not in existing]
+    if not rows:
+        return []
+
+    slugs = SlugAllocator(Tag.objects.values_list('slug', flat=True))
+    used_colors = set(Tag.objects.values_list('color', flat=True))
+    free_ids = iter(free_tag_ids(len(rows)))
+    tags = []
+    for row in rows:
+        name = row['name'].strip()
+        color = (row.get('color') or '').strip()
+        if not color or color in used_colors:
+            color = _allocate_color(name, used_colors)
+        else:
+            used_colors.add(color)
+        tags.append(Tag(
+            tag_id=next(free_ids, None),
+            name=name,
+            slug=slugs.allocate(name),
+            description=row.get('description') or None,
+            color=color,
+            is_featured=bool(row.get('is_featured')),
+        ))
+    with transaction.atomic():
+        Tag.objects.bulk_create(tags, batch_size=batch_size)
+    # bulk_create не отправляет сигналы: подсказки перестроятся при следующем обращении
+    typeahead.invalidate_indexes()
+    invalidate_tag_widgets()
+    return tags
@@ -1,3 +1,930 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from unittest import mock, skipIf, skipUnless
 
-# Create your tests here.
+from django.contrib.auth.models import AnonymousUser, User
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import (
+    Course, CourseNeighbor, CoursePrerequisite, CourseTag, Enrollment, EnrollmentStatus, Homework, HomeworkStatus,
+    HomeworkSubmission, Lesson, LessonCompletion, Module, Reviewer, Student, StudentStats, Tag, TeacherCourse,
+)
+from .auto_enrollment import enroll_unlocked
+from .catalog import annotate_catalog_counts
+from .cooccurrence import get_tag_cooccurrence
+from .lesson_sequence import get_lesson_sequence, get_resume_lessons
+from .middleware import DatabaseRoleMiddleware
+from .prerequisites import get_prerequisite_graph
+from .progress import rebuild_enrollment_counters, record_completion, remove_completion
+from .recommendations import build_course_neighbors
+from .review_queue import claim_submissions, requeue_expired
+from .reviewer_stats import get_reviewer_courses_stats
+from .routers import (
+    PRIMARY_COOKIE, READ_YOUR_WRITES_WINDOW, ROLE_STUDENT, RoleRouter, replica_reads, use_db_role,
+)
+from .search import highlight, is_full_text_available, search_courses, update_search_vectors, _START_SEL, _STOP_SEL
+from .session_backend import _refresh_key, check_session_cache
+from .student_stats import rebuild_student_stats
+from .typeahead import PrefixIndex
+from . import analytics, cache_versions, lesson_sequence, replicas, tags, typeahead, workload
+
+
+# Тесты не зависят от внешнего Redis: кэш и сессии на время тестов локальные
+TEST_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+def create_course(reviewer, title='Курс', modules=1, lessons=2):
+    course = Course.objects.create(title=title, duration_weeks=4, price=0)
+    TeacherCourse.objects.create(reviewer=reviewer, course=course, is_main_teacher=True)
+    for module_order in range(1, modules + 1):
+        module = Module.objects.create(course=course, title=f'Модуль {module_order}', module_order=module_order)
+        for lesson_order in range(1, lessons + 1):
+            Lesson.objects.create(
+                module=module, title=f'Урок {lesson_order}', lesson_order=lesson_order,
+                duration_minutes=30, content='Текст',
+            )
+    return course
+
+
+@override_settings(CACHES=TEST_CACHES)
+class EducationTestCase(TestCase):
+    """Общие данные: администратор, студент с зачислением и одобренный преподаватель"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        cls.student_user = User.objects.create_user('student', 'student@example.com', 'password')
+        cls.reviewer_user = User.objects.create_user('reviewer', 'reviewer@example.com', 'password')
+        cls.student = Student.objects.create(first_name='Иван', last_name='Иванов', email='student@example.com')
+        cls.reviewer = Reviewer.objects.create(
+            first_name='Петр', last_name='Петров', email='reviewer@example.com',
+            hire_date=date(2024, 1, 1), specialization='Python', is_approved=True,
+        )
+        cls.tag = Tag.objects.create(name='Python', slug='python')
+        cls.course = create_course(cls.reviewer, title='Python', modules=2, lessons=3)
+        CourseTag.objects.create(course=cls.course, tag=cls.tag)
+        cls.enrollment = Enrollment.objects.create(student=cls.student, course=cls.course)
+        cls.lesson = Lesson.objects.filter(module__course=cls.course).order_by('module__module_order', 'lesson_order').first()
+        LessonCompletion.objects.create(enrollment=cls.enrollment, lesson=cls.lesson, score=10)
+        cls.homework = Homework.objects.create(lesson=cls.lesson, title='Задание', description='Решить', deadline_days=7)
+        HomeworkSubmission.objects.create(homework=cls.homework, enrollment=cls.enrollment, submission_text='Ответ')
+
+    def setUp(self):
+        cache.clear()
+
+
+class QueryCountTests(EducationTestCase):
+    """
+    Число запросов к базе на страницу: защита от N+1 и от потерянного кэширования.
+    Каждая страница открывается с пустым кэшем свежим входом пользователя. Внутри
+    транзакции TestCase роутер направляет все чтения в default, поэтому
+    assertNumQueries видит все запросы страницы
+    """
+
+    def assertPageQueries(self, num, name, *args, user=None, query=''):
+        cache.clear()
+        self.client.logout()
+        if user is not None:
+            self.client.force_login(user)
+        with self.assertNumQueries(num):
+            response = self.client.get(reverse(name, args=args) + query)
+        self.assertEqual(response.status_code, 200)
+
+    def assertActionQueries(self, num, name, *args, user, data=None):
+        """
+        POST-действие с редиректом; в счет входят и действия после коммита.
+        Индексы подсказок построены, как в работающем процессе: сигналы обновляют их точечно
+        """
+        cache.clear()
+        typeahead.build_indexes()
+        self.client.force_login(user)
+        with self.assertNumQueries(num), self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse(name, args=args), data or {})
+        self.assertEqual(response.status_code, 302)
+        return response
+
+    def test_public_pages(self):
+        self.assertPageQueries(1, 'home')
+        self.assertPageQueries(3, 'course_list')
+        self.assertPageQueries(2, 'course_autocomplete', query='?q=Py')
+        self.assertPageQueries(8, 'course_detail', self.course.pk)
+        self.assertPageQueries(5, 'courses_by_tag', self.tag.slug)
+        self.assertPageQueries(1, 'tag_cloud')
+        self.assertPageQueries(0, 'choose_registration_type')
+        self.assertPageQueries(0, 'login')
+
+    def test_cached_public_pages(self):
+        for name in ('home', 'course_list', 'tag_cloud'):
+            self.client.get(reverse(name))
+            with self.assertNumQueries(0):
+                self.client.get(reverse(name))
+
+    def test_student_pages(self):
+        user = self.student_user
+        self.assertPageQueries(12, 'dashboard', user=user)
+        self.assertPageQueries(17, 'course_detail', self.course.pk, user=user)
+        self.assertPageQueries(8, 'student_courses', user=user)
+        self.assertPageQueries(15, 'course_modules', self.course.pk, user=user)
+        self.assertPageQueries(11, 'lesson_detail', self.lesson.pk, user=user)
+        self.assertPageQueries(9, 'student_stats', user=user)
+
+    def test_student_actions(self):
+        user = self.student_user
+        other = create_course(self.reviewer, title='Python 2')
+        self.assertActionQueries(16, 'enroll_in_course', other.pk, user=user)
+        self.assertTrue(Enrollment.objects.filter(student=self.student, course=other).exists())
+        lesson = Lesson.objects.filter(module__course=self.course).exclude(pk=self.lesson.pk).first()
+        self.assertActionQueries(18, 'complete_lesson', lesson.pk, user=user, data={'score': '50'})
+        self.assertTrue(LessonCompletion.objects.filter(enrollment=self.enrollment, lesson=lesson).exists())
+
+    def test_reviewer_pages(self):
+        user = self.reviewer_user
+        self.assertPageQueries(11, 'dashboard', user=user)
+        self.assertPageQueries(11, 'course_manage', self.course.pk, user=user)
+        self.assertPageQueries(12, 'course_edit', self.course.pk, user=user)
+        self.assertPageQueries(10, 'module_edit', self.lesson.module_id, user=user)
+        self.assertPageQueries(11, 'lesson_edit', self.lesson.pk, user=user)
+        self.assertPageQueries(7, 'course_create', user=user)
+        self.assertPageQueries(7, 'module_create', user=user)
+        self.assertPageQueries(9, 'lesson_create', user=user)
+
+    def test_reviewer_actions(self):
+        user = self.reviewer_user
+        self.assertActionQueries(12, 'review_claim', user=user)
+        submission = HomeworkSubmission.objects.get()
+        self.assertEqual(submission.status, HomeworkStatus.UNDER_REVIEW)
+        self.assertActionQueries(
+            9, 'review_complete', submission.pk, user=user,
+            data={'status': HomeworkStatus.APPROVED, 'score': '8', 'feedback': 'Хорошо'},
+        )
+        submission.refresh_from_db()
+        self.assertEqual((submission.status, submission.score), (HomeworkStatus.APPROVED, 8))
+
+    def test_admin_pages(self):
+        user = self.admin
+        self.assertPageQueries(7, 'tag_management', user=user)
+        self.assertPageQueries(8, 'tag_edit', self.tag.pk, user=user)
+        self.assertPageQueries(6, 'tag_create', user=user)
+        # Только чтение rollup-таблиц: пересчет аналитики не выполняется при открытии страницы
+        self.assertPageQueries(12, 'platform_stats', user=user)
+        # Метрики пулов берутся из памяти процесса: запрос только за пользователем
+        self.assertPageQueries(1, 'db_pool_stats', user=user)
+
+
+class SessionStoreTests(EducationTestCase):
+
+    def test_deleted_session_stops_working_after_refresh_interval(self):
+        self.client.force_login(self.student_user)
+        self.assertEqual(self.client.get(reverse('dashboard')).status_code, 200)
+        session_key = self.client.session.session_key
+        # Выход в другом процессе с собственным кэшем: строки в базе нет, кэш этого процесса цел
+        Session.objects.filter(session_key=session_key).delete()
+        self.assertEqual(self.client.get(reverse('dashboard')).status_code, 200)
+        # Прошел SESSION_REFRESH_INTERVAL - сессия перечитывается из базы
+        cache.delete(_refresh_key(session_key))
+        self.assertRedirects(
+            self.client.get(reverse('dashboard')), f"{reverse('login')}?next={reverse('dashboard')}",
+            fetch_redirect_response=False,
+        )
+
+    def test_local_session_cache_is_rejected(self):
+        self.assertEqual([error.id for error in check_session_cache(None)], ['Education.E001'])
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache'}}):
+            self.assertEqual(check_session_cache(None), [])
+
+
+class PrerequisiteTests(EducationTestCase):
+
+    def test_cycle_is_rejected_on_save(self):
+        advanced = create_course(self.reviewer, title='Python 2')
+        expert = create_course(self.reviewer, title='Python 3')
+        CoursePrerequisite.objects.create(course=advanced, required_course=self.course)
+        CoursePrerequisite.objects.create(course=expert, required_course=advanced)
+        with self.assertRaises(ValidationError):
+            CoursePrerequisite.objects.create(course=self.course, required_course=expert)
+        self.assertEqual(CoursePrerequisite.objects.count(), 2)
+
+    def test_graph_follows_saved_prerequisites(self):
+        advanced = create_course(self.reviewer, title='Python 2')
+        self.assertEqual(get_prerequisite_graph().required_for(advanced.pk), frozenset())
+        CoursePrerequisite.objects.create(course=advanced, required_course=self.course)
+        self.assertEqual(get_prerequisite_graph().required_for(advanced.pk), {self.course.pk})
+
+
+class AutoEnrollmentTests(EducationTestCase):
+
+    def test_completed_course_enrolls_into_unlocked_courses(self):
+        advanced = create_course(self.reviewer, title='Python 2')
+        strict = create_course(self.reviewer, title='Python для отличников')
+        CoursePrerequisite.objects.create(course=advanced, required_course=self.course, min_score=70)
+        CoursePrerequisite.objects.create(course=strict, required_course=self.course, min_score=95)
+
+        enrollment = Enrollment.objects.get(pk=self.enrollment.pk)
+        enrollment.status = EnrollmentStatus.COMPLETED
+        enrollment.overall_score = 80
+        # Зачисление на открывшиеся курсы выполняется после коммита
+        with self.captureOnCommitCallbacks(execute=True):
+            enrollment.save()
+        self.assertEqual(
+            set(Enrollment.objects.filter(student=self.student).values_list('course_id', 'status')),
+            {(self.course.pk, EnrollmentStatus.COMPLETED), (advanced.pk, EnrollmentStatus.ACTIVE)},
+        )
+        # Повторный запуск ничего не добавляет
+        self.assertEqual(enroll_unlocked([self.student.pk]), 0)
+
+
+class AnalyticsTests(EducationTestCase):
+    """Rollup-таблицы сверяются с итогами, посчитанными напрямую по исходным таблицам"""
+
+    def setUp(self):
+        super().setUp()
+        # События общих данных переносятся на пять дней назад, новые - сегодня
+        moment = timezone.now() - timedelta(days=5)
+        Student.objects.update(registration_date=moment)
+        Course.objects.update(created_at=moment)
+        Enrollment.objects.update(enrollment_date=moment)
+        LessonCompletion.objects.update(completed_at=moment)
+        HomeworkSubmission.objects.update(submitted_at=moment)
+        other = create_course(self.reviewer, title='Python 2')
+        student = Student.objects.create(first_name='Анна', last_name='Смирнова', email='anna@example.com')
+        enrollment = Enrollment.objects.create(student=student, course=other)
+        for lesson in Lesson.objects.filter(module__course=other):
+            LessonCompletion.objects.create(enrollment=enrollment, lesson=lesson, score=40)
+        enrollment.status = EnrollmentStatus.COMPLETED
+        enrollment.overall_score = 90
+        enrollment.completion_date = timezone.now()
+        enrollment.save()
+
+    def expected(self, start=None):
+        def since(queryset, field):
+            return queryset.filter(**{f'{field}__gte': analytics._day_start(start)}) if start else queryset
+
+        completed = since(Enrollment.objects.filter(status=EnrollmentStatus.COMPLETED), 'completion_date')
+        completions = since(LessonCompletion.objects.all(), 'completed_at')
+        return {
+            'new_students': since(Student.objects.all(), 'registration_date').count(),
+            'new_courses': since(Course.objects.all(), 'created_at').count(),
+            'new_enrollments': since(Enrollment.objects.all(), 'enrollment_date').count(),
+            'completed_courses': completed.count(),
+            'course_score_sum': sum(completed.values_list('overall_score', flat=True)),
+            'lessons_completed': completions.count(),
+            'lesson_score_sum': sum(completions.values_list('score', flat=True)),
+            'submissions': since(HomeworkSubmission.objects.all(), 'submitted_at').count(),
+        }
+
+    def totals(self, start=None):
+        totals = analytics.get_totals(start)
+        return {field: totals[field] for field in self.expected()}
+
+    def test_backfill_in_chunks_matches_source_tables(self):
+        today = timezone.localdate()
+        self.assertEqual(analytics.backfill_analytics(today - timedelta(days=9), today, chunk_days=3), 10)
+        self.assertEqual(self.totals(), self.expected())
+        self.assertEqual(self.totals(today - timedelta(days=2)), self.expected(today - timedelta(days=2)))
+        breakdown = analytics.get_course_breakdown(today - timedelta(days=9), today)
+        self.assertEqual(
+            {row['course_id']: row['lessons_completed'] for row in breakdown},
+            dict(Enrollment.objects.values_list('course_id').annotate(Count('completions'))),
+        )
+
+    def test_refresh_rebuilds_lookback_without_double_counting(self):
+        analytics.refresh_analytics(force=True)
+        self.assertEqual(self.totals(), self.expected())
+        submission = HomeworkSubmission.objects.get()
+        submission.status = HomeworkStatus.APPROVED
+        submission.score = 70
+        submission.reviewed_at = timezone.now()
+        submission.save()
+        analytics.refresh_analytics(force=True)
+        analytics.refresh_analytics(force=True)
+        self.assertEqual(self.totals(), self.expected())
+        totals = analytics.get_totals()
+        self.assertEqual((totals['reviewed_submissions'], totals['review_score_sum']), (1, 70))
+
+
+class CatalogTests(EducationTestCase):
+
+    def test_first_page_link_keeps_filters(self):
+        response = self.client.get(reverse('course_list'), {
+            'query': 'Py', 'tags': [self.tag.pk], 'difficulty': 'beginner', 'after': 'cursor',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.context['is_first_page'])
+        self.assertEqual(
+            response.context['first_page_query'], f'query=Py&tags={self.tag.pk}&difficulty=beginner'
+        )
+
+
+class SearchTests(EducationTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.django_course = Course.objects.create(
+            title='Веб-разработка на Django', description='Сайты и API', duration_weeks=4, price=0
+        )
+        cls.data_course = Course.objects.create(
+            title='Анализ данных', description='Pandas и немного Django для отчетов', duration_weeks=4, price=0
+        )
+        CourseTag.objects.create(course=cls.data_course, tag=Tag.objects.create(name='Аналитика', slug='analytics', color='#17a2b8'))
+
+    def search(self, query):
+        courses, ordering = search_courses(Course.objects.all(), query)
+        return [course.title for course in courses.order_by(*(ordering or ('course_id',)))], ordering
+
+    def test_highlight_escapes_text_and_marks_matches(self):
+        self.assertEqual(
+            highlight(f'<b>{_START_SEL}Django{_STOP_SEL}</b>'), '&lt;b&gt;<mark>Django</mark>&lt;/b&gt;'
+        )
+        self.assertEqual(highlight(None), '')
+
+    @skipIf(connection.vendor == 'postgresql', 'Путь без полнотекстового поиска')
+    def test_substring_fallback(self):
+        self.assertFalse(is_full_text_available())
+        self.assertEqual(update_search_vectors(), 0)
+        # Название, описание и имя тега; без ранжирования
+        self.assertEqual(self.search('django'), (['Веб-разработка на Django', 'Анализ данных'], None))
+        self.assertEqual(self.search('налитик'), (['Анализ данных'], None))
+        self.assertEqual(self.search('Python'), (['Python'], None))
+        self.assertEqual(self.search('Haskell'), ([], None))
+
+    @skipUnless(connection.vendor == 'postgresql', 'Полнотекстовый поиск есть только у PostgreSQL')
+    def test_full_text_ranking_and_tags(self):
+        # Совпадение в названии весит больше, чем в описании
+        self.assertEqual(self.search('Django'), (['Веб-разработка на Django', 'Анализ данных'], ('-rank', 'course_id')))
+        # Вектор обновляется сигналами при переименовании тега курса
+        tag = Tag.objects.get(slug='analytics')
+        tag.name = 'Статистика'
+        tag.save()
+        self.assertEqual(self.search('статистика')[0], ['Анализ данных'])
+
+    @skipUnless(connection.vendor == 'postgresql', 'Триграммы есть только у PostgreSQL')
+    def test_trigram_fallback_for_typos(self):
+        self.assertEqual(self.search('Djnago'), (['Веб-разработка на Django'], ('-similarity', 'course_id')))
+
+
+class CooccurrenceTests(EducationTestCase):
+
+    def test_cache_reset_rebuilds_process_matrix(self):
+        matrix = get_tag_cooccurrence()
+        self.assertIs(get_tag_cooccurrence(), matrix)
+        # После сброса кэша версия новая, а не снова начальная: старая копия не используется
+        cache.clear()
+        self.assertIsNot(get_tag_cooccurrence(), matrix)
+
+
+class RecommendationTests(EducationTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        # Курс self.course: 3 студента, django: 3, data: 1 (отмененное зачисление не считается)
+        cls.django_course = create_course(cls.reviewer, title='Django')
+        cls.data_course = create_course(cls.reviewer, title='Анализ данных')
+        students = [
+            Student.objects.create(first_name='Студент', last_name=str(number), email=f'student{number}@example.com')
+            for number in range(1, 4)
+        ]
+        for student, courses in zip(students, (
+            (cls.course, cls.django_course),
+            (cls.course, cls.data_course),
+            (cls.django_course,),
+        )):
+            for course in courses:
+                Enrollment.objects.create(student=student, course=course)
+        Enrollment.objects.create(student=cls.student, course=cls.django_course)
+        Enrollment.objects.create(
+            student=students[2], course=cls.data_course, status=EnrollmentStatus.CANCELLED
+        )
+
+    def neighbors(self):
+        return {
+            (row.course_id, row.neighbor_id): (round(row.score, 3), row.common_students)
+            for row in CourseNeighbor.objects.all()
+        }
+
+    def test_cosine_scores_and_min_common(self):
+        self.assertEqual(build_course_neighbors(batch_size=2), 2)
+        self.assertEqual(self.neighbors(), {
+            (self.course.pk, self.django_course.pk): (0.667, 2),
+            (self.django_course.pk, self.course.pk): (0.667, 2),
+        })
+        # Без порога остается пара с одним общим студентом
+        self.assertEqual(build_course_neighbors(batch_size=2, min_common=1), 4)
+        self.assertEqual(self.neighbors()[(self.data_course.pk, self.course.pk)], (0.577, 1))
+
+    def test_neighbors_limit_keeps_best_scores(self):
+        build_course_neighbors(neighbors=1, min_common=1)
+        self.assertEqual(
+            set(CourseNeighbor.objects.filter(course=self.course).values_list('neighbor_id', flat=True)),
+            {self.django_course.pk},
+        )
+
+
+class LessonSequenceTests(EducationTestCase):
+
+    def test_moved_lesson_leaves_old_course_sequence(self):
+        other = create_course(self.reviewer, title='Другой курс')
+        self.assertIsNotNone(get_lesson_sequence(self.course.pk).position(self.lesson.pk))
+        self.assertIsNone(get_lesson_sequence(other.pk).position(self.lesson.pk))
+
+        lesson = Lesson.objects.get(pk=self.lesson.pk)
+        lesson.module = other.modules.get()
+        lesson.lesson_order = 10
+        lesson.save()
+        self.assertIsNone(get_lesson_sequence(self.course.pk).position(lesson.pk))
+        self.assertIsNotNone(get_lesson_sequence(other.pk).position(lesson.pk))
+
+    def test_resume_lessons_fetch_versions_in_one_call(self):
+        courses = [self.course] + [create_course(self.reviewer, title=f'Курс {number}') for number in range(3)]
+        for course in courses[1:]:
+            Enrollment.objects.create(student=self.student, course=course)
+        enrollments = list(Enrollment.objects.filter(student=self.student))
+        expected = {
+            enrollment.pk: Lesson.objects.filter(module__course_id=enrollment.course_id).exclude(
+                completions__enrollment=enrollment
+            ).order_by('module__module_order', 'lesson_order').first().pk
+            for enrollment in enrollments
+        }
+        # Памяти процесса хватает на два курса: остальные читаются из общего кэша
+        with mock.patch.object(lesson_sequence, '_LOCAL_SIZE', 2):
+            lesson_sequence._local.clear()
+            get_resume_lessons(enrollments)
+            self.assertEqual(len(lesson_sequence._local), 2)
+            shared = mock.MagicMock(wraps=cache)
+            with mock.patch.object(lesson_sequence, 'cache', shared), \
+                    mock.patch.object(cache_versions, 'cache', shared):
+                resume = get_resume_lessons(enrollments)
+            self.assertEqual({pk: lesson.lesson_id for pk, lesson in resume.items()}, expected)
+            self.assertEqual(shared.get_many.call_count, 2)
+            shared.get.assert_not_called()
+            shared.set_many.assert_not_called()
+            self.assertEqual(len(lesson_sequence._local), 2)
+
+
+class PrefixIndexTests(SimpleTestCase):
+    """Префиксный индекс подсказок - без базы: результаты сверяются с полным перебором"""
+
+    def setUp(self):
+        self.entries = {}
+
+    def build(self, entries):
+        self.entries = {ident: (label, popularity) for ident, label, popularity in entries}
+        return PrefixIndex.build((ident, label, popularity, ()) for ident, label, popularity in entries)
+
+    def expected(self, query, limit):
+        words = query.casefold().replace('ё', 'е').split()
+        found = [
+            (-popularity, label, ident) for ident, (label, popularity) in self.entries.items()
+            if all(any(w.startswith(word) for w in label.casefold().replace('ё', 'е').split()) for word in words)
+        ]
+        return [(ident, label, -negative) for negative, label, ident in sorted(found)[:limit]]
+
+    def test_multi_word_query(self):
+        index = self.build([
+            (1, 'Python для анализа данных', 5),
+            (2, 'Django и Python', 9),
+            (3, 'Django REST', 7),
+        ])
+        self.assertEqual(index.search('py dj'), [(2, 'Django и Python', 9)])
+        self.assertEqual(index.search('дан py'), [(1, 'Python для анализа данных', 5)])
+        self.assertEqual(index.search('django'), [(2, 'Django и Python', 9), (3, 'Django REST', 7)])
+        self.assertEqual(index.search('java'), [])
+
+    def test_yo_is_normalized(self):
+        index = self.build([(1, 'Ёлочные игрушки', 1)])
+        self.assertEqual(index.search('елоч'), [(1, 'Ёлочные игрушки', 1)])
+        self.assertEqual(index.search('ЁЛ'), [(1, 'Ёлочные игрушки', 1)])
+
+    def test_popularity_moves_item_in_and_out_of_head(self):
+        index = self.build([(ident, f'Python {ident}', ident) for ident in range(1, 101)])
+        # Широкий префикс: голова из 64 лучших строится при первом поиске
+        self.assertEqual(index.search('python', 3), self.expected('python', 3))
+        index.set_popularity(1, 1000)
+        self.entries[1] = ('Python 1', 1000)
+        self.assertEqual(index.search('python', 3)[0], (1, 'Python 1', 1000))
+        index.set_popularity(100, -1)
+        self.entries[100] = ('Python 100', -1)
+        for limit in (3, 64):
+            self.assertEqual(index.search('python', limit), self.expected('python', limit))
+        self.assertEqual(index.search('p', 8), self.expected('p', 8))
+
+    def test_remove(self):
+        index = self.build([(1, 'Python', 1), (2, 'Pascal', 2)])
+        index.remove(2)
+        del self.entries[2]
+        self.assertNotIn(2, index)
+        self.assertEqual(index.search('p'), [(1, 'Python', 1)])
+
+    def test_head_shrinking_below_limit(self):
+        index = self.build([(ident, f'Python {ident}', ident) for ident in range(1, 301)])
+        self.assertEqual(index.search('python', 8), self.expected('python', 8))
+        # Из головы удалены почти все элементы: остальные берутся просмотром диапазона
+        for ident in range(300, 240, -1):
+            index.remove(ident)
+            del self.entries[ident]
+        self.assertEqual(index.search('python', 8), self.expected('python', 8))
+        self.assertEqual(index.search('py', 8), self.expected('py', 8))
+
+    def test_multi_word_results_follow_changes(self):
+        index = self.build([(ident, f'Python курс {ident}', ident) for ident in range(1, 301)])
+        self.assertEqual(index.search('py ку', 5), self.expected('py ку', 5))
+        index.add(1000, 'Python курс продвинутый', 500)
+        self.entries[1000] = ('Python курс продвинутый', 500)
+        self.assertEqual(index.search('py ку', 5), self.expected('py ку', 5))
+        self.assertEqual(index.search('py прод', 5), [(1000, 'Python курс продвинутый', 500)])
+
+
+class RoleRouterTests(SimpleTestCase):
+
+    def test_rls_tables_are_read_through_default(self):
+        with use_db_role(ROLE_STUDENT):
+            self.assertEqual(Course.objects.all().db, 'student_db')
+            self.assertEqual(Enrollment.objects.all().db, 'default')
+            # Счетчики студентов по курсам join'ят enrollments: соединение роли увидело бы не все строки
+            self.assertEqual(annotate_catalog_counts(Course.objects.all()).filter(is_active=True).db, 'default')
+
+
+@override_settings(DATABASE_REPLICAS=['teacher_db'])
+class ReadYourWritesTests(SimpleTestCase):
+    """Реплика - алиас teacher_db; после записи пользователь закреплен за мастером через cookie"""
+    databases = {'teacher_db'}
+
+    def setUp(self):
+        replicas._state.update(checked_at=None, healthy=[])
+        self.addCleanup(replicas._state.update, checked_at=None, healthy=[])
+        self.router = RoleRouter()
+
+    def catalog_db(self):
+        with replica_reads():
+            return Course.objects.all().db
+
+    def handle(self, view, cookies=None):
+        request = RequestFactory().post('/')
+        request.COOKIES.update(cookies or {})
+        request.user = AnonymousUser()
+        return DatabaseRoleMiddleware(view)(request)
+
+    def test_write_pins_rest_of_request_to_primary(self):
+        with use_db_role(ROLE_STUDENT):
+            self.assertEqual(self.catalog_db(), 'teacher_db')
+            # Сессии не закрепляют пользователя за мастером
+            self.router.db_for_write(Session)
+            self.assertEqual(self.catalog_db(), 'teacher_db')
+            self.router.db_for_write(Enrollment)
+            self.assertEqual(self.catalog_db(), 'student_db')
+
+    def test_cookie_is_set_after_write_and_pins_next_request(self):
+        reads = []
+
+        def write(request):
+            reads.append(self.catalog_db())
+            self.router.db_for_write(Enrollment)
+            return HttpResponse()
+
+        response = self.handle(write)
+        self.assertEqual(reads, ['teacher_db'])
+        self.assertEqual(response.cookies[PRIMARY_COOKIE]['max-age'], READ_YOUR_WRITES_WINDOW)
+        self.assertTrue(response.cookies[PRIMARY_COOKIE]['httponly'])
+
+        def read(request):
+            reads.append(self.catalog_db())
+            return HttpResponse()
+
+        response = self.handle(read, {PRIMARY_COOKIE: '1'})
+        self.assertEqual(reads[-1], 'student_db')
+        self.assertNotIn(PRIMARY_COOKIE, response.cookies)
+        self.handle(read)
+        self.assertEqual(reads[-1], 'teacher_db')
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_cookie_without_replicas(self):
+        def write(request):
+            self.router.db_for_write(Enrollment)
+            return HttpResponse()
+
+        self.assertNotIn(PRIMARY_COOKIE, self.handle(write).cookies)
+
+
+class ReviewerStatsTests(EducationTestCase):
+
+    def test_query_count_does_not_depend_on_courses(self):
+        with self.assertNumQueries(1):
+            stats = get_reviewer_courses_stats(self.reviewer, use_cache=False)
+        self.assertEqual(len(stats), 1)
+
+        for number in range(5):
+            course = create_course(self.reviewer, title=f'Курс {number}')
+            enrollment = Enrollment.objects.create(student=self.student, course=course)
+            homework = Homework.objects.create(
+                lesson=Lesson.objects.filter(module__course=course).first(),
+                title='Задание', description='Решить', deadline_days=7,
+            )
+            HomeworkSubmission.objects.create(
+                homework=homework, enrollment=enrollment, reviewer=self.reviewer, submission_text='Ответ',
+                status=HomeworkStatus.UNDER_REVIEW, score=80,
+            )
+        with self.assertNumQueries(1):
+            stats = get_reviewer_courses_stats(self.reviewer, use_cache=False)
+        self.assertEqual(len(stats), 6)
+        self.assertEqual(
+            [item['stats']['pending_in_course'] for item in stats if item['course'] != self.course], [1] * 5
+        )
+
+    def test_cached_stats_need_no_queries(self):
+        get_reviewer_courses_stats(self.reviewer)
+        with self.assertNumQueries(0):
+            get_reviewer_courses_stats(self.reviewer)
+
+
+class ReviewQueueTests(EducationTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.reviewer_user)
+        self.submission = HomeworkSubmission.objects.get(enrollment=self.enrollment)
+
+    def pending(self):
+        return get_reviewer_courses_stats(self.reviewer)[0]['stats']['pending_in_course']
+
+    def test_claim_renew_and_complete_from_dashboard(self):
+        self.assertEqual(self.pending(), 0)
+        self.client.post(reverse('review_claim'))
+        self.submission.refresh_from_db()
+        self.assertEqual(self.submission.status, HomeworkStatus.UNDER_REVIEW)
+        # Статистика в кэше сброшена, хотя задание обновлено через update()
+        self.assertEqual(self.pending(), 1)
+
+        lease_expires_at = self.submission.lease_expires_at
+        self.client.post(reverse('review_renew', args=[self.submission.pk]))
+        self.submission.refresh_from_db()
+        self.assertGreater(self.submission.lease_expires_at, lease_expires_at)
+
+        response = self.client.get(reverse('dashboard'))
+        self.assertContains(response, reverse('review_complete', args=[self.submission.pk]))
+        self.client.post(
+            reverse('review_complete', args=[self.submission.pk]),
+            {'status': HomeworkStatus.APPROVED, 'score': 90, 'feedback': 'Хорошо'},
+        )
+        self.submission.refresh_from_db()
+        self.assertEqual((self.submission.status, self.submission.score), (HomeworkStatus.APPROVED, 90))
+        self.assertEqual(self.pending(), 0)
+
+    def test_score_above_maximum_is_rejected(self):
+        claim_submissions(self.reviewer)
+        self.client.post(
+            reverse('review_complete', args=[self.submission.pk]),
+            {'status': HomeworkStatus.APPROVED, 'score': self.homework.max_score + 1},
+        )
+        self.submission.refresh_from_db()
+        self.assertEqual(self.submission.status, HomeworkStatus.UNDER_REVIEW)
+
+
+class ProgressCounterTests(EducationTestCase):
+
+    def assertCountersRebuildUnchanged(self):
+        self.enrollment.refresh_from_db()
+        counters = (self.enrollment.completed_required_lessons, self.enrollment.score_sum)
+        rebuild_enrollment_counters(Enrollment.objects.filter(pk=self.enrollment.pk))
+        self.enrollment.refresh_from_db()
+        self.assertEqual((self.enrollment.completed_required_lessons, self.enrollment.score_sum), counters)
+        return counters
+
+    def test_inactive_lesson_is_not_scored(self):
+        rebuild_enrollment_counters(Enrollment.objects.filter(pk=self.enrollment.pk))
+        lesson = Lesson.objects.filter(module__course=self.course).exclude(pk=self.lesson.pk).first()
+        Lesson.objects.filter(pk=lesson.pk).update(is_active=False)
+        lesson.refresh_from_db()
+
+        record_completion(self.enrollment, lesson, score=40)
+        self.assertEqual(self.assertCountersRebuildUnchanged(), (1, 10))
+        remove_completion(self.enrollment, lesson)
+        self.assertEqual(self.assertCountersRebuildUnchanged(), (1, 10))
+
+    def test_active_lesson_is_counted_and_scored(self):
+        rebuild_enrollment_counters(Enrollment.objects.filter(pk=self.enrollment.pk))
+        lesson = Lesson.objects.filter(module__course=self.course).exclude(pk=self.lesson.pk).first()
+        record_completion(self.enrollment, lesson, score=40)
+        self.assertEqual(self.assertCountersRebuildUnchanged(), (2, 50))
+
+    def test_module_methods_share_one_progress_tree(self):
+        modules = list(Module.objects.filter(course=self.course).order_by('module_order'))
+        user = User.objects.get(pk=self.student_user.pk)
+        # Студент, зачисление и два агрегирующих запроса - для всех модулей вместе
+        with self.assertNumQueries(4):
+            progress = [module.get_module_progress(user) for module in modules]
+            completed = [module.get_completed_lessons_count(user) for module in modules]
+        self.assertEqual(progress, [33, 0])
+        self.assertEqual(completed, [1, 0])
+
+
+class StudentStatsTests(EducationTestCase):
+
+    def snapshot(self):
+        return StudentStats.objects.filter(student=self.student).values(
+            'courses_count', 'completed_courses_count', 'lessons_completed', 'total_score', 'max_score',
+            'current_streak', 'longest_streak', 'last_activity_date',
+        ).get()
+
+    def test_incremental_updates_match_rebuild(self):
+        rebuild_student_stats([self.student.pk])
+        other = create_course(self.reviewer, title='Python 2')
+        other_enrollment = Enrollment.objects.create(student=self.student, course=other)
+        lessons = list(Lesson.objects.filter(module__course=other).order_by('lesson_order'))
+        record_completion(other_enrollment, lessons[0], score=30)
+        record_completion(other_enrollment, lessons[1], score=40)
+        remove_completion(other_enrollment, lessons[1])
+        enrollment = Enrollment.objects.get(pk=self.enrollment.pk)
+        enrollment.status = EnrollmentStatus.COMPLETED
+        enrollment.save()
+
+        incremental = self.snapshot()
+        self.assertEqual(
+            (incremental['courses_count'], incremental['completed_courses_count'],
+             incremental['lessons_completed'], incremental['total_score']),
+            (2, 1, 2, 40),
+        )
+        rebuild_student_stats([self.student.pk])
+        self.assertEqual(self.snapshot(), incremental)
+
+
+class TagCounterTests(EducationTestCase):
+    """Счетчики тегов после каждого пути изменения связей совпадают с точным пересчетом"""
+
+    def setUp(self):
+        super().setUp()
+        self.data = Tag.objects.create(name='Данные', slug='data', color='#17a2b8')
+        self.draft = create_course(self.reviewer, title='Черновик')
+        Course.objects.filter(pk=self.draft.pk).update(is_active=False)
+        self.draft.refresh_from_db()
+
+    def counts(self, tag):
+        tag.refresh_from_db()
+        return tag.course_count, tag.active_course_count
+
+    def assertCountsExact(self):
+        # Пересчет не находит разошедшихся тегов
+        self.assertEqual(tags.reconcile_tag_counts(), 0)
+
+    def test_course_tag_rows(self):
+        link = CourseTag.objects.create(course=self.course, tag=self.data)
+        draft_link = CourseTag.objects.create(course=self.draft, tag=self.data)
+        self.assertEqual(self.counts(self.data), (2, 1))
+        self.assertCountsExact()
+        draft_link.delete()
+        self.assertEqual(self.counts(self.data), (1, 1))
+        link.delete()
+        self.assertEqual(self.counts(self.data), (0, 0))
+        self.assertCountsExact()
+
+    def test_m2m_add_remove_and_clear(self):
+        self.course.tags.add(self.data)
+        self.draft.tags.add(self.data, self.tag)
+        self.assertEqual((self.counts(self.data), self.counts(self.tag)), ((2, 1), (2, 1)))
+        self.assertCountsExact()
+        self.draft.tags.remove(self.tag)
+        self.assertEqual(self.counts(self.tag), (1, 1))
+        # Очистка со стороны курса и со стороны тега
+        self.draft.tags.clear()
+        self.assertEqual(self.counts(self.data), (1, 1))
+        self.data.courses.clear()
+        self.assertEqual(self.counts(self.data), (0, 0))
+        self.course.tags.set([self.data])
+        self.assertEqual((self.counts(self.data), self.counts(self.tag)), ((1, 1), (0, 0)))
+        self.assertCountsExact()
+
+    def test_course_activity_moves_active_count(self):
+        self.draft.tags.add(self.data)
+        self.assertEqual(self.counts(self.data), (1, 0))
+        self.draft.is_active = True
+        self.draft.save()
+        self.assertEqual(self.counts(self.data), (1, 1))
+        self.assertCountsExact()
+
+    def test_reconcile_fixes_drift(self):
+        Tag.objects.filter(pk=self.tag.pk).update(course_count=5, active_course_count=0)
+        self.assertEqual(tags.reconcile_tag_counts(), 1)
+        self.assertEqual(self.counts(self.tag), (1, 1))
+        self.assertCountsExact()
+
+
+class SlugAllocatorTests(SimpleTestCase):
+
+    def test_suffixes_follow_taken_slugs(self):
+        slugs = tags.SlugAllocator(['python', 'python-1', 'python-3', 'python-basics', 'django-2'])
+        self.assertEqual(slugs.allocate('Python'), 'python-2')
+        self.assertEqual(slugs.allocate('Python'), 'python-4')
+        self.assertEqual(slugs.allocate('Django'), 'django')
+        self.assertEqual(slugs.allocate('Django'), 'django-1')
+        self.assertEqual(slugs.allocate('Python basics'), 'python-basics-1')
+
+    def test_cyrillic_name_falls_back_to_default_slug(self):
+        slugs = tags.SlugAllocator([tags.DEFAULT_TAG_SLUG])
+        self.assertEqual(tags.base_slug('Аналитика'), tags.DEFAULT_TAG_SLUG)
+        self.assertEqual(slugs.allocate('Аналитика'), f'{tags.DEFAULT_TAG_SLUG}-1')
+        self.assertEqual(slugs.allocate('Данные'), f'{tags.DEFAULT_TAG_SLUG}-2')
+
+
+class TagImportTests(EducationTestCase):
+
+    def setUp(self):
+        super().setUp()
+        # Дыры в tag_id после удалений
+        created = [
+            Tag.objects.create(name=f'Тег {number}', slug=f'tag-{number}', color=f'#00000{number}')
+            for number in range(1, 5)
+        ]
+        self.holes = sorted(tag.pk for tag in created[:2])
+        Tag.objects.filter(pk__in=self.holes).delete()
+
+    def test_free_tag_ids_fill_holes_below_max(self):
+        free = tags.free_tag_ids(10)
+        self.assertTrue(set(self.holes) <= set(free))
+        self.assertLess(max(free), Tag.objects.order_by('-pk')[0].pk)
+        tag = tags.create_tag(Tag(name='Новый', slug='new', color='#17a2b8'))
+        self.assertEqual(tag.pk, free[0])
+        self.assertEqual(tags.free_tag_ids(10), free[1:])
+
+    def test_import_skips_existing_names_and_fills_holes(self):
+        free = tags.free_tag_ids(2)
+        created = tags.import_tags([
+            {'name': 'Python'},
+            # Повтор названия в файле: берется последняя строка
+            {'name': 'Аналитика'},
+            {'name': ' Аналитика ', 'color': '#17a2b8'},
+            {'name': 'Django', 'is_featured': True},
+            {'name': ''},
+        ])
+        self.assertEqual([tag.name for tag in created], ['Аналитика', 'Django'])
+        self.assertEqual(sorted(tag.pk for tag in created), free)
+        self.assertEqual(
+            set(Tag.objects.filter(name__in=['Аналитика', 'Django']).values_list('slug', 'color', 'is_featured')),
+            {('tag', '#17a2b8', False), ('django', created[1].color, True)},
+        )
+        self.assertEqual(Tag.objects.filter(name='Python').count(), 1)
+        self.assertEqual(tags.import_tags([{'name': 'Django'}]), [])
+
+
+class WorkloadTests(EducationTestCase):
+    """Счетчики нагрузки меняются после коммита: тесты выполняют отложенные изменения явно"""
+
+    def setUp(self):
+        super().setUp()
+        workload.invalidate_workload()
+        self.balancer = workload.get_balancer()
+        # Задание из общих данных назначено проверяющему при создании
+        self.assertEqual(workload.get_workload(self.reviewer.pk), 1)
+
+    def committed(self):
+        return self.captureOnCommitCallbacks(execute=True)
+
+    def submit(self):
+        submission = HomeworkSubmission.objects.create(
+            homework=self.homework, enrollment=self.enrollment, submission_text='Ответ'
+        )
+        self.assertEqual(submission.reviewer_id, self.reviewer.pk)
+        return HomeworkSubmission.objects.get(pk=submission.pk)
+
+    def test_status_change_adjusts_load_without_rebuild(self):
+        with self.committed():
+            submission = self.submit()
+        self.assertEqual(workload.get_workload(self.reviewer.pk), 2)
+        with self.committed():
+            submission.status = HomeworkStatus.APPROVED
+            submission.save()
+        self.assertIs(workload.get_balancer(), self.balancer)
+        self.assertEqual(workload.get_workload(self.reviewer.pk), 1)
+        with self.committed():
+            submission.status = HomeworkStatus.RESUBMITTED
+            submission.save()
+        self.assertEqual(workload.get_workload(self.reviewer.pk), 2)
+
+    def test_rolled_back_submission_leaves_load_unchanged(self):
+        with self.committed():
+            with self.assertRaises(ValidationError):
+                with transaction.atomic():
+                    self.submit()
+                    # До коммита нагрузка не меняется
+                    self.assertEqual(workload.get_workload(self.reviewer.pk), 1)
+                    raise ValidationError('Ошибка после отправки задания')
+        self.assertIs(workload.get_balancer(), self.balancer)
+        self.assertEqual(workload.get_workload(self.reviewer.pk), 1)
+
+    def test_expired_claims_are_reassigned(self):
+        with self.committed():
+            submission = self.submit()
+        HomeworkSubmission.objects.filter(pk=submission.pk).update(
+            status=HomeworkStatus.UNDER_REVIEW, lease_expires_at=timezone.now() - timedelta(minutes=1)
+        )
+        with self.committed():
+            self.assertEqual(requeue_expired(), 1)
+        submission.refresh_from_db()
+        self.assertEqual((submission.status, submission.reviewer_id), (HomeworkStatus.SUBMITTED, self.reviewer.pk))
+        self.assertEqual(workload.get_workload(self.reviewer.pk), 2)
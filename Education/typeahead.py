@@ -0,0 +1,370 @@
+# typeahead.py
+import heapq
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+
+from django.db.models import Count, Q
+from django.urls import reverse
+from .models import Course, Enrollment, EnrollmentStatus, Tag
+from .routers import reads_rls_tables, replica_reads
+
+
+TYPEAHEAD_LIMIT = 8
+TYPEAHEAD_MAX_LIMIT = 20
+# Полная перестройка раз в 10 минут подтягивает изменения из других процессов
+TYPEAHEAD_REBUILD_INTERVAL = 600
+
+# Для префиксов с большим числом совпадений хранится готовый top-k ("голова"),
+# который поддерживается при изменениях; головы коротких префиксов строятся сразу
+_HEAD_SIZE = 64
+_HEAD_MIN_RANGE = 256
+_EAGER_PREFIX_LENGTH = 2
+# Результаты тяжелых запросов из нескольких слов - до первого изменения индекса
+_RESULTS_CACHE_SIZE = 1024
+_WORD_RE = re.compile(r'\w+')
+
+
+def normalize(text):
+    return text.casefold().replace('ё', 'е')
+
+
+def split_words(text):
+    return _WORD_RE.findall(normalize(text or ''))
+
+
+def _prefix_end(prefix):
+    """Наименьшая строка, которая больше любой строки с данным префиксом"""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def _prefixes(words, max_length=None):
+    result = set()
+    for word in words:
+        length = len(word) if max_length is None else min(len(word), max_length)
+        result.update(word[:i] for i in range(1, length + 1))
+    return result
+
+
+class PrefixIndex:
+    """
+    Префиксный индекс в памяти процесса.
+    Слова названий хранятся в отсортированном списке пар (слово, id),
+    диапазон совпадений по префиксу находится двумя bisect'ами.
+    Для широких префиксов хранится отсортированный top-k по популярности,
+    поэтому поиск не просматривает весь диапазон.
+    """
+
+    def __init__(self):
+        self._terms = []
+        self._items = {}
+        self._heads = {}
+        self._results = {}
+        self._lock = threading.RLock()
+
+    @classmethod
+    def build(cls, entries):
+        """entries - итерируемое (id, название, популярность, доп. ключевые слова)"""
+        index = cls()
+        terms = []
+        for ident, label, popularity, keywords in entries:
+            words = index._words(label, keywords)
+            index._items[ident] = (label, words, popularity)
+            terms.extend((word, ident) for word in words)
+        terms.sort()
+        index._terms = terms
+
+        # Головы коротких префиксов: один проход по элементам в порядке выдачи
+        heads = {}
+        for ident in sorted(index._items, key=index._rank):
+            for prefix in _prefixes(index._items[ident][1], _EAGER_PREFIX_LENGTH):
+                head = heads.setdefault(prefix, [])
+                if len(head) < _HEAD_SIZE:
+                    head.append(index._rank(ident))
+        index._heads = heads
+        return index
+
+    @staticmethod
+    def _words(label, keywords=()):
+        words = set(split_words(label))
+        for keyword in keywords:
+            words.update(split_words(keyword))
+        return tuple(sorted(words))
+
+    def _rank(self, ident):
+        """Ключ порядка выдачи: популярность по убыванию, затем название"""
+        label, _, popularity = self._items[ident]
+        return (-popularity, label, ident)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, ident):
+        return ident in self._items
+
+    def add(self, ident, label, popularity=0, keywords=()):
+        """Добавляет элемент или заменяет существующий"""
+        with self._lock:
+            self._remove(ident)
+            words = self._words(label, keywords)
+            self._items[ident] = (label, words, popularity)
+            for word in words:
+                insort(self._terms, (word, ident))
+            self._heads_insert(ident)
+            self._results.clear()
+
+    def remove(self, ident):
+        with self._lock:
+            self._remove(ident)
+            self._results.clear()
+
+    def set_popularity(self, ident, popularity):
+        with self._lock:
+            item = self._items.get(ident)
+            if item is None or item[2] == popularity:
+                return
+            self._heads_remove(ident)
+            self._items[ident] = (item[0], item[1], popularity)
+            self._heads_insert(ident)
+            self._results.clear()
+
+    def _remove(self, ident):
+        item = self._items.get(ident)
+        if item is None:
+            return
+        self._heads_remove(ident)
+        for word in item[1]:
+            position = bisect_left(self._terms, (word, ident))
+            if position < len(self._terms) and self._terms[position] == (word, ident):
+                del self._terms[position]
+        del self._items[ident]
+
+    # Голова - точный top-N диапазона: все элементы вне нее не лучше последнего в ней.
+    # Удаление элемента и вставка лучше последнего этот инвариант сохраняют.
+
+    def _heads_remove(self, ident):
+        rank = self._rank(ident)
+        for prefix in _prefixes(self._items[ident][1]):
+            head = self._heads.get(prefix)
+            if head is None:
+                continue
+            position = bisect_left(head, rank)
+            if position < len(head) and head[position] == rank:
+                del head[position]
+
+    def _heads_insert(self, ident):
+        rank = self._rank(ident)
+        for prefix in _prefixes(self._items[ident][1]):
+            head = self._heads.get(prefix)
+            if head is None or not head or rank > head[-1]:
+                continue
+            insort(head, rank)
+            if len(head) > _HEAD_SIZE:
+                head.pop()
+
+    def _range(self, prefix):
+        start = bisect_left(self._terms, (prefix,))
+        end = bisect_left(self._terms, (_prefix_end(prefix),), start)
+        return start, end
+
+    @staticmethod
+    def _matches(item_words, others):
+        # Слова элемента через пробел: проверка префикса - поиск подстроки ' ' + слово
+        text = ' ' + ' '.join(item_words)
+        return all(' ' + other in text for other in others)
+
+    def _scan(self, start, end, others, limit):
+        """Просмотр диапазона слов с отбором top-k"""
+        terms = self._terms
+        items = self._items
+        idents = {terms[position][1] for position in range(start, end)}
+        if others:
+            idents = [ident for ident in idents if self._matches(items[ident][1], others)]
+        return heapq.nsmallest(limit, map(self._rank, idents))
+
+    def search(self, query, limit=TYPEAHEAD_LIMIT):
+        """
+        Элементы, в названии которых каждое слово запроса является префиксом
+        какого-либо слова. Возвращает [(id, название, популярность)]
+        по убыванию популярности.
+        """
+        words = split_words(query)
+        if not words or limit <= 0:
+            return []
+
+        with self._lock:
+            if len(words) == 1:
+                ranks = self._search_prefix(words[0], limit)
+            else:
+                ranks = self._search_words(words, limit)
+
+        return [(ident, label, -negative_popularity) for negative_popularity, label, ident in ranks]
+
+    def _search_prefix(self, prefix, limit):
+        head = self._heads.get(prefix)
+        if head is not None and len(head) >= limit:
+            return head[:limit]
+        start, end = self._range(prefix)
+        if head is None and end - start < _HEAD_MIN_RANGE:
+            return self._scan(start, end, (), limit)
+        head = self._heads[prefix] = self._scan(start, end, (), _HEAD_SIZE)
+        return head[:limit]
+
+    def _search_words(self, words, limit):
+        key = (tuple(words), limit)
+        cached = self._results.get(key)
+        if cached is not None:
+            return cached
+
+        # Отбираем по самому узкому из диапазонов слов запроса
+        ranges = {word: self._range(word) for word in words}
+        prefix = min(words, key=lambda word: ranges[word][1] - ranges[word][0])
+        others = list(words)
+        others.remove(prefix)
+        start, end = ranges[prefix]
+
+        ranks = []
+        if end - start >= _HEAD_MIN_RANGE:
+            # Голова упорядочена по выдаче: если в ней нашлось k совпадений, это и есть top-k
+            items = self._items
+            ranks = [
+                rank for rank in self._search_prefix(prefix, _HEAD_SIZE)
+                if self._matches(items[rank[2]][1], others)
+            ][:limit]
+        if len(ranks) < limit:
+            ranks = self._scan(start, end, others, limit)
+            if end - start >= _HEAD_MIN_RANGE:
+                if len(self._results) >= _RESULTS_CACHE_SIZE:
+                    self._results.clear()
+                self._results[key] = ranks
+        return ranks
+
+
+# Индексы процесса строятся при первом обращении и обновляются сигналами моделей
+
+_state = {'indexes': None, 'built_at': 0.0}
+_build_lock = threading.Lock()
+
+
+def _active_students(courses):
+    return reads_rls_tables(courses).annotate(
+        popularity=Count('enrollments', filter=Q(enrollments__status=EnrollmentStatus.ACTIVE))
+    )
+
+
+def _course_popularity(course_id):
+    return Enrollment.objects.filter(course_id=course_id, status=EnrollmentStatus.ACTIVE).count()
+
+
+def _course_entries():
+    courses = _active_students(Course.objects.filter(is_active=True)).order_by()
+    for course_id, title, popularity in courses.values_list('course_id', 'title', 'popularity'):
+        yield course_id, title, popularity, ()
+
+
+def _tag_entries():
+    for tag_id, name, slug, course_count in Tag.objects.order_by().values_list(
+        'tag_id', 'name', 'slug', 'course_count'
+    ):
+        yield tag_id, name, course_count, (slug,)
+
+
+@replica_reads()
+def build_indexes():
+    indexes = {
+        'courses': PrefixIndex.build(_course_entries()),
+        'tags': PrefixIndex.build(_tag_entries()),
+    }
+    _state['indexes'] = indexes
+    _state['built_at'] = time.monotonic()
+    return indexes
+
+
+def get_indexes():
+    indexes = _state['indexes']
+    if indexes is not None and time.monotonic() - _state['built_at'] < TYPEAHEAD_REBUILD_INTERVAL:
+        return indexes
+    with _build_lock:
+        if _state['indexes'] is indexes:
+            indexes = build_indexes()
+        return _state['indexes']
+
+
+def invalidate_indexes():
+    """Индексы будут перестроены из базы при следующем обращении"""
+    _state['indexes'] = None
+
+
+def _built_index(name):
+    """Индекс для точечного обновления; если он еще не построен, обновлять нечего"""
+    indexes = _state['indexes']
+    return indexes[name] if indexes is not None else None
+
+
+def update_course(course):
+    index = _built_index('courses')
+    if index is None:
+        return
+    if not course.is_active:
+        index.remove(course.pk)
+        return
+    index.add(course.pk, course.title, _course_popularity(course.pk))
+
+
+def remove_course(course_id):
+    index = _built_index('courses')
+    if index is not None:
+        index.remove(course_id)
+
+
+def update_course_popularity(course_id):
+    index = _built_index('courses')
+    if index is None or course_id not in index:
+        return
+    index.set_popularity(course_id, _course_popularity(course_id))
+
+
+def update_tag(tag):
+    index = _built_index('tags')
+    if index is not None:
+        index.add(tag.pk, tag.name, tag.course_count, (tag.slug,))
+
+
+def update_tag_popularity(tag_ids):
+    index = _built_index('tags')
+    if index is None:
+        return
+    for tag_id, course_count in Tag.objects.filter(pk__in=tag_ids).values_list('tag_id', 'course_count'):
+        index.set_popularity(tag_id, course_count)
+
+
+def remove_tag(tag_id):
+    index = _built_index('tags')
+    if index is not None:
+        index.remove(tag_id)
+
+
+def suggest(query, limit=TYPEAHEAD_LIMIT):
+    """Подсказки для строки поиска: курсы и теги по убыванию популярности"""
+    indexes = get_indexes()
+    courses = [
+        {
+            'id': course_id,
+            'title': title,
+            'students': popularity,
+            'url': reverse('course_detail', args=[course_id]),
+        }
+        for course_id, title, popularity in indexes['courses'].search(query, limit)
+    ]
+    catalog_url = reverse('course_list')
+    tags = [
+        {
+            'id': tag_id,
+            'name': name,
+            'courses': course_count,
+            'url': f'{catalog_url}?tags={tag_id}',
+        }
+        for tag_id, name, course_count in indexes['tags'].search(query, limit)
+    ]
+    return {'query': query, 'courses': courses, 'tags': tags}
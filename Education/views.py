@@ -1,6 +1,6 @@
 # views.py
 from venv import logger
-from django.http import HttpResponseForbidden
+from django.http import HttpResponseForbidden, JsonResponse
 from django.utils import timezone
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
@@ -11,6 +11,29 @@ from django.db.models import Count, Q
 from django.db.models.query import QuerySet
 from .models import *
 from .forms import *
+from .profile import UserProfile, get_student
+from .catalog import annotate_catalog_counts, get_catalog_page
+from .prerequisites import check_eligibility
+from .student_stats import get_student_stats
+from .tags import create_tag, get_popular_tags, get_tag_cloud
+from .cooccurrence import get_similar_tags
+from .lesson_sequence import get_lesson_sequence
+from .analytics import (
+    get_platform_summary, get_totals, get_trend, get_course_breakdown,
+    ANALYTICS_TREND_DAYS
+)
+from .review_queue import ClaimLost, claim_submissions, complete_review, release_claim, renew_claim
+from .typeahead import suggest, TYPEAHEAD_LIMIT, TYPEAHEAD_MAX_LIMIT
+from .db_pool import pool_stats
+from .page_context import (
+    run_blocks, student_dashboard_blocks, student_dashboard_context,
+    reviewer_dashboard_blocks, reviewer_dashboard_context, reviewer_dashboard_fallback,
+    course_detail_blocks, course_detail_context, course_modules_blocks, course_modules_context
+)
+from .progress import (
+    get_enrollment_progress, count_required_lessons,
+    record_completion, remove_completion, refresh_course_counters, get_student_enrollments
+)
 
 #Работает
 def is_admin(user):
@@ -134,37 +157,29 @@ def reviewer_register(request):
 # Вспомогательная функция для проверки, является ли пользователь студентом
 def is_student(user):
     """Проверяет, есть ли у пользователя профиль студента"""
-    return Student.objects.filter(email=user.email).exists()
+    return get_student(user) is not None
 
 #Работает
 @login_required
 def dashboard(request):
     """Универсальный личный кабинет с приоритетом преподавателя"""
-    user = request.user
+    profile = request.profile
     
     # Проверяем, является ли пользователь преподавателем (приоритет)
-    try:
-        reviewer = Reviewer.objects.get(email=user.email)
-        if reviewer.is_approved:
-            return reviewer_dashboard(request, reviewer)
+    if profile.has_reviewer:
+        if profile.is_approved:
+            return reviewer_dashboard(request, profile.reviewer)
         else:
             # Если преподаватель не одобрен, проверяем студента
-            try:
-                student = Student.objects.get(email=user.email)
+            if profile.has_student:
                 messages.info(request, 'Ваш аккаунт преподавателя ожидает одобрения. Пока доступен студенческий аккаунт.')
-                return student_dashboard(request, student)
-            except Student.DoesNotExist:
-                messages.warning(request, 'Ваш аккаунт преподавателя ожидает одобрения администратора.')
-                return reviewer_dashboard(request, reviewer)
-    except Reviewer.DoesNotExist:
-        pass
+                return student_dashboard(request, profile.student)
+            messages.warning(request, 'Ваш аккаунт преподавателя ожидает одобрения администратора.')
+            return reviewer_dashboard(request, profile.reviewer)
     
     # Проверяем, является ли пользователь студентом
-    try:
-        student = Student.objects.get(email=user.email)
-        return student_dashboard(request, student)
-    except Student.DoesNotExist:
-        pass
+    if profile.has_student:
+        return student_dashboard(request, profile.student)
     
     # Если нет ни студента, ни преподавателя - предлагаем завершить регистрацию
     messages.warning(request, 'Пожалуйста, завершите регистрацию.')
@@ -173,132 +188,114 @@ def dashboard(request):
 #Работает
 def student_dashboard(request, student):
     """Дашборд для студента"""
-    # Оптимизированный запрос для прогресса
-    enrollments_with_progress = student.enrollments.select_related('course').annotate(
-        total_lessons=Count('course__modules__lessons', filter=Q(course__modules__lessons__is_required=True)),
-        completed_lessons=Count('completions', filter=Q(completions__lesson__is_required=True))
+    # Прогресс берется из счетчиков зачисления, без агрегирующих запросов
+    enrollments = list(student.enrollments.select_related('course'))
+    context = student_dashboard_context(
+        student, enrollments, *run_blocks(student_dashboard_blocks(student, enrollments))
     )
-    
-    # Добавляем процент прогресса
-    for enrollment in enrollments_with_progress:
-        if enrollment.total_lessons > 0:
-            enrollment.progress_percentage = round((enrollment.completed_lessons / enrollment.total_lessons) * 100, 2)
-        else:
-            enrollment.progress_percentage = 0
-    
-    context = {
-        'student': student,
-        'reviewer': None,
-        'active_enrollments': enrollments_with_progress.filter(status='active'),
-        'completed_enrollments': enrollments_with_progress.filter(status='completed'),
-        'user_type': 'student'
-    }
     return render(request, 'dashboard/student_dashboard.html', context)
 
 #Работает
 def reviewer_dashboard(request, reviewer):
     try:
-        # Используем методы модели
-        pending_submissions = reviewer.pending_submissions_count()
-        total_submissions = reviewer.homework_submissions.count()
-        
-        # Последние задания
-        recent_submissions = reviewer.homework_submissions.filter(
-            status=HomeworkStatus.UNDER_REVIEW
-        ).select_related(
-            'homework__lesson__module__course',
-            'enrollment__student'
-        )[:5]
-        
-        # Курсы преподавателя через метод модели
-        teacher_courses = reviewer.get_teacher_courses()
-        # ВЫЧИСЛЯЕМ ВСЕ ДАННЫЕ ЗАРАНЕЕ для шаблона
-        courses_with_stats = []
-        for teacher_course in teacher_courses:
-            # Вычисляем количество активных студентов
-            course = Course.objects.get(course_id=teacher_course.course_id)
-            active_students_count = course.enrollments.filter(status='active').count()
-            
-            # Вычисляем задания на проверку в этом курсе
-            pending_in_course = reviewer.homework_submissions.filter(
-                enrollment__course=course,
-                status=HomeworkStatus.UNDER_REVIEW
-            ).count()
-            
-            # Общее количество submission'ов в курсе
-            total_in_course = reviewer.homework_submissions.filter(
-                enrollment__course=course
-            ).count()
-            
-            courses_with_stats.append({
-                'course': course,
-                'stats': {
-                    'active_students_count': active_students_count,  # Уже вычисленное значение
-                    'pending_in_course': pending_in_course,          # Уже вычисленное значение
-                    'total_in_course': total_in_course               # Уже вычисленное значение
-                }
-            })
-        
-        context = {
-            'student': None,
-            'reviewer': reviewer,
-            'pending_submissions': pending_submissions,
-            'total_submissions': total_submissions,
-            'recent_submissions': recent_submissions,
-            'courses_with_stats': courses_with_stats,
-            'user_type': 'reviewer'
-        }
-        return render(request, 'dashboard/reviewer_dashboard.html', context)
-        
+        context = reviewer_dashboard_context(reviewer, *run_blocks(reviewer_dashboard_blocks(reviewer)))
     except Exception as e:
-        logger.error(f"Error in reviewer_dashboard_final: {str(e)}")
-        
-        # Резервный контекст
-        context = {
-            'student': None,
-            'reviewer': reviewer,
-            'pending_submissions': reviewer.homework_submissions.filter(
-                status=HomeworkStatus.UNDER_REVIEW
-            ).count(),
-            'total_submissions': reviewer.homework_submissions.count(),
-            'recent_submissions': [],
-            'courses_with_stats': [],
-            'user_type': 'reviewer'
-        }
-        return render(request, 'dashboard/reviewer_dashboard.html', context)
+        logger.error(f"Error in reviewer_dashboard: {str(e)}")
+        context = reviewer_dashboard_fallback(reviewer)
+    return render(request, 'dashboard/reviewer_dashboard.html', context)
 
 
 @login_required
-def student_stats(request):
-    """Статистика студента"""
-    # Получаем все зачисления
-    enrollments = Enrollment.objects.filter(student=Student.objects.get(email=request.user.email)).select_related('course')
+def review_claim(request):
+    """Взять на проверку очередную порцию заданий"""
+    profile = request.profile
+    if not (profile.has_reviewer and profile.is_approved):
+        return HttpResponseForbidden('Доступ запрещен')
     
-    # Общая статистика
-    total_courses = enrollments.count()
-    completed_courses = sum(1 for e in enrollments if e.course.is_course_completed(request.user))
+    if request.method == 'POST':
+        claimed = claim_submissions(profile.reviewer)
+        if claimed:
+            messages.success(request, f'Взято на проверку заданий: {len(claimed)}')
+        else:
+            messages.info(request, 'Очередь проверки пуста.')
+    return redirect('dashboard')
+
+
+@login_required
+def review_release(request, submission_id):
+    """Вернуть задание в очередь"""
+    profile = request.profile
+    if not profile.has_reviewer:
+        return HttpResponseForbidden('Доступ запрещен')
     
-    # Подсчет уроков
-    total_lessons_completed = 0
-    total_score = 0
-    max_possible_score = 0
+    if request.method == 'POST':
+        submission = get_object_or_404(HomeworkSubmission, submission_id=submission_id)
+        if release_claim(submission, profile.reviewer):
+            messages.success(request, 'Задание возвращено в очередь.')
+        else:
+            messages.warning(request, 'Задание уже не закреплено за вами.')
+    return redirect('dashboard')
+
+
+@login_required
+def review_renew(request, submission_id):
+    """Продлить проверку задания"""
+    profile = request.profile
+    if not profile.has_reviewer:
+        return HttpResponseForbidden('Доступ запрещен')
     
-    for enrollment in enrollments:
-        total_lessons_completed += enrollment.completed_lessons_count
-        total_score += enrollment.total_score
-        max_possible_score += enrollment.course.get_max_possible_score()
+    if request.method == 'POST':
+        submission = get_object_or_404(HomeworkSubmission, submission_id=submission_id)
+        try:
+            renew_claim(submission, profile.reviewer)
+            messages.success(request, 'Проверка задания продлена.')
+        except ClaimLost:
+            messages.warning(request, 'Задание уже не закреплено за вами.')
+    return redirect('dashboard')
+
+
+@login_required
+def review_complete(request, submission_id):
+    """Сохранить результат проверки задания"""
+    profile = request.profile
+    if not profile.has_reviewer:
+        return HttpResponseForbidden('Доступ запрещен')
+    
+    if request.method == 'POST':
+        submission = get_object_or_404(
+            HomeworkSubmission.objects.select_related('homework'), submission_id=submission_id
+        )
+        form = ReviewResultForm(request.POST, max_score=submission.homework.max_score)
+        if form.is_valid():
+            try:
+                complete_review(submission, profile.reviewer, **form.cleaned_data)
+                messages.success(request, 'Результат проверки сохранен.')
+            except ClaimLost:
+                messages.warning(request, 'Задание уже не закреплено за вами.')
+        else:
+            for errors in form.errors.values():
+                for error in errors:
+                    messages.error(request, error)
+    return redirect('dashboard')
+
+
+@login_required
+def student_stats(request):
+    """Статистика студента"""
+    student = request.profile.student
+    if student is None:
+        return redirect('home')
+    
+    # Сводка поддерживается при завершении уроков и изменении зачислений - одна строка
+    stats = get_student_stats(student)
     
     # Последние завершенные уроки
     recent_completions = LessonCompletion.objects.filter(
-        enrollment__student=request.user
+        enrollment__student=student
     ).select_related('lesson', 'lesson__module', 'lesson__module__course').order_by('-completed_at')[:10]
     
     context = {
-        'total_courses': total_courses,
-        'completed_courses': completed_courses,
-        'total_lessons_completed': total_lessons_completed,
-        'total_score': total_score,
-        'max_possible_score': max_possible_score,
+        'stats': stats,
         'recent_completions': recent_completions,
         'title': 'Моя статистика'
     }
@@ -308,22 +305,21 @@ def student_stats(request):
 @login_required
 def student_courses(request):
     """Страница курсов"""
-    try:
-        student = Student.objects.get(email=request.user.email)
-    except (Student.DoesNotExist, AttributeError):
+    student = request.profile.student
+    if student is None:
         return redirect('home')
 
-    active_courses = Course.objects.filter(is_active=True)
-    my_courses = []
-    for active_course in active_courses:
-        try:
-            enrollment = Enrollment.objects.get(student=student, course=active_course)
-            my_courses.append(active_course)
-        except Enrollment.DoesNotExist:
-            pass
+    # Страница строится от зачислений студента: курс, прогресс и число студентов - одним запросом
+    filter_form = StudentCoursesFilterForm(request.GET)
+    status, sort = filter_form.get_filters()
+    enrollments = list(get_student_enrollments(student, status, sort))
 
-    context = {'my_courses': my_courses}
-        
+    context = {
+        'enrollments': enrollments,
+        'filter_form': filter_form,
+        'status': status,
+        'sort': sort,
+    }
 
     return render(request, 'courses/student_courses.html', context)
 
@@ -331,74 +327,71 @@ def student_courses(request):
 #Работает
 def course_list(request):
     """Публичный список всех активных курсов с поиском и фильтрацией"""
-    courses = Course.objects.filter(is_active=True).prefetch_related('tags', 'modules')
-    
     # Форма поиска
     search_form = CourseSearchForm(request.GET)
     tag_filter_form = TagFilterForm(request.GET)
     
     # Применяем фильтры
-    query = request.GET.get('query', '')
-    selected_tags = request.GET.getlist('tags')
+    query = search_form.get_query()
+    selected_tags = [tag for tag in request.GET.getlist('tags') if tag.isdigit()]
     difficulty = request.GET.get('difficulty', '')
+    cursor = request.GET.get('after', '')
     
-    if query:
-        courses = courses.filter(
-            Q(title__icontains=query) |
-            Q(description__icontains=query) |
-            Q(tags__name__icontains=query)
-        ).distinct()
-    
-    if selected_tags:
-        courses = courses.filter(tags__in=selected_tags).distinct()
-    
-    if difficulty:
-        courses = courses.filter(difficulty_level=difficulty)
+    # Страница каталога (кэшируется, счетчики приходят аннотациями)
+    page = get_catalog_page(query, selected_tags, difficulty, cursor)
     
     # Получаем популярные теги для сайдбара
-    popular_tags = Tag.objects.filter(is_featured=True).annotate(
-        active_courses_count=Count('courses', filter=Q(courses__is_active=True))
-    ).order_by('-active_courses_count')[:10]
+    popular_tags = get_popular_tags(10)
+    
+    # Ссылки на следующую и первую страницы сохраняют параметры поиска и фильтры
+    next_page_query = None
+    if page['next_cursor']:
+        params = request.GET.copy()
+        params['after'] = page['next_cursor']
+        next_page_query = params.urlencode()
+    params = request.GET.copy()
+    params.pop('after', None)
+    first_page_query = params.urlencode()
     
-    # Статистика для отображения
-    total_courses = courses.count()
-
-    total_lessons = {}
-    for course in courses:
-        lesson_counter = 0
-        for module in course.modules.all():
-            lesson_counter += module.lessons.count()
-        total_lessons[course] = lesson_counter
-
-    print(total_lessons)
     context = {
-        'courses': courses,
-        'total_lessons': total_lessons,
+        'courses': page['courses'],
         'search_form': search_form,
         'tag_filter_form': tag_filter_form,
         'popular_tags': popular_tags,
-        'total_courses': total_courses,
+        'total_courses': page['total_courses'],
+        'next_page_query': next_page_query,
+        'first_page_query': first_page_query,
+        'is_first_page': not cursor,
         'query': query,
         'selected_tags': selected_tags,
         'active_tab': 'courses'
     }
     return render(request, 'courses/course_list.html', context)
 
+def course_autocomplete(request):
+    """Подсказки для строки поиска каталога (JSON) из префиксного индекса в памяти"""
+    query = request.GET.get('q', '').strip()
+    try:
+        limit = int(request.GET.get('limit', TYPEAHEAD_LIMIT))
+    except ValueError:
+        limit = TYPEAHEAD_LIMIT
+    limit = max(1, min(limit, TYPEAHEAD_MAX_LIMIT))
+    return JsonResponse(suggest(query, limit))
+
 #Работает
 def courses_by_tag(request, tag_slug):
     """Список курсов по конкретному тегу"""
     tag = get_object_or_404(Tag, slug=tag_slug)
-    courses = Course.objects.filter(
+    courses = annotate_catalog_counts(Course.objects.filter(
         tags=tag, 
         is_active=True
-    ).prefetch_related('tags', 'modules', 'enrollments')
+    )).prefetch_related('tags')
     
-    # Похожие теги
-    similar_tags = Tag.objects.filter(
-        courses__in=courses
-    ).exclude(pk=tag.pk).annotate(
-        common_courses=Count('pk')
-    ).order_by('-common_courses')[:5]
+    # Похожие теги - из матрицы совместной встречаемости в памяти и кэша облака тегов
+    cloud = {cloud_tag.pk: cloud_tag for cloud_tag in get_tag_cloud()}
+    similar_tags = [
+        cloud[tag_id] for tag_id in get_similar_tags(tag.pk) if tag_id in cloud
+    ]
     
     context = {
         'tag': tag,
@@ -411,19 +404,8 @@ def courses_by_tag(request, tag_slug):
 #Работает
 def tag_cloud(request):
     """Облако тегов для публичного доступа"""
-    tags = Tag.objects.annotate(
-        tag_course_count=Count('courses', filter=Q(courses__is_active=True))  # Изменили название
-    ).filter(tag_course_count__gt=0).order_by('-tag_course_count')
-    
-    # Группируем теги по популярности для разного размера шрифта
-    if tags:
-        max_count = tags[0].tag_course_count  # Обновили название
-        for tag in tags:
-            if max_count > 0:
-                # Вычисляем размер шрифта от 0.8em до 2em
-                tag.font_size = 0.8 + (tag.tag_course_count / max_count) * 1.2  # Обновили название
-            else:
-                tag.font_size = 1
+    # Теги с активными курсами и размером шрифта по популярности (общий кэш виджетов тегов)
+    tags = get_tag_cloud()
     
     context = {
         'tags': tags,
@@ -435,55 +417,7 @@ def tag_cloud(request):
 def course_detail(request, course_id):
     """Детальная страница курса (доступна без регистрации)"""
     course = get_object_or_404(Course, pk=course_id, is_active=True)
-    
-    course_info = {
-        'course': course,
-        'is_enrolled': False,
-        'can_enroll': False,
-        'is_authenticated': request.user.is_authenticated,
-        'needs_student_profile': False,
-        'missing_requirements': {'mandatory': [], 'recommended': []}
-    }
-    
-    if request.user.is_authenticated:
-        try:
-            student = Student.objects.get(email=request.user.email)
-            # Проверяем, записан ли студент
-            try:
-                enrollment = Enrollment.objects.get(student=student, course=course)
-                course_info['is_enrolled'] = True
-                course_info['enrollment_status'] = enrollment.status
-            except Enrollment.DoesNotExist:
-                course_info['is_enrolled'] = False
-            
-            # Проверяем возможность записи
-            if not course_info['is_enrolled']:
-                can_enroll, missing_requirements = check_course_prerequisites(student, course)
-                course_info['can_enroll'] = can_enroll
-                course_info['missing_requirements'] = missing_requirements
-                
-        except Student.DoesNotExist:
-            # У пользователя нет профиля студента
-            course_info['needs_student_profile'] = True
-    
-    # Получаем модули и уроки курса
-    modules = course.modules.all().prefetch_related('lessons').order_by('module_order')
-    
-    # Статистика курса
-    course_stats = {
-        'total_modules': modules.count(),
-        'total_lessons': Lesson.objects.filter(module__course=course).count(),
-        'active_students': course.enrollments.filter(status='active').count(),
-        'completed_students': course.enrollments.filter(status='completed').count(),
-    }
-    
-    context = {
-        'course': course,
-        'modules': modules,
-        'course_stats': course_stats,
-        **course_info  # Добавляем всю информацию о статусе
-    }
-    
+    context = course_detail_context(course, *run_blocks(course_detail_blocks(request, course)))
     return render(request, 'courses/course_detail.html', context)
 
 #Работает
@@ -492,9 +426,8 @@ def enroll_in_course(request, course_id):
     """Зачисление студента на курс (только для аутентифицированных)"""
     course = get_object_or_404(Course, pk=course_id, is_active=True)
     
-    try:
-        student = Student.objects.get(email=request.user.email)
-    except Student.DoesNotExist:
+    student = request.profile.student
+    if student is None:
         messages.error(request, 'Для записи на курс необходимо завершить регистрацию студента.')
         return redirect('student_register')
     
@@ -515,77 +448,21 @@ def enroll_in_course(request, course_id):
         student=student,
         course=course,
         enrollment_date=timezone.now(),
-        status='active'
+        status='active',
+        total_required_lessons=count_required_lessons(course.course_id),
+        last_activity_at=timezone.now()
     )
     
     messages.success(request, f'Вы успешно записаны на курс "{course.title}"!')
     return redirect('dashboard')
 
 #Работает?
-def check_course_prerequisites(student, course):
+def check_course_prerequisites(student, course, student_courses=None):
     """
     Проверяет, выполнены ли все предварительные требования для курса
     Возвращает (can_enroll: bool, missing_requirements: dict)
     """
-    # Получаем все обязательные предварительные требования
-    prerequisites = CoursePrerequisite.objects.filter(
-        course=course,
-        requirement_type='mandatory'
-    )
-    
-    missing_requirements = []
-    
-    for prereq in prerequisites:
-        required_course = prereq.required_course
-        min_score = prereq.min_score
-        
-        # Проверяем, завершил ли студент требуемый курс
-        try:
-            enrollment = Enrollment.objects.get(
-                student=student,
-                course=required_course,
-                status='completed'
-            )
-            
-            # Проверяем минимальный балл, если требуется
-            if min_score > 0:
-                if enrollment.overall_score is None or enrollment.overall_score < min_score:
-                    missing_requirements.append({
-                        'course': required_course,
-                        'reason': f'Необходимый балл: {min_score}, ваш балл: {enrollment.overall_score or "не оценен"}'
-                    })
-            
-        except Enrollment.DoesNotExist:
-            missing_requirements.append({
-                'course': required_course,
-                'reason': 'Курс не завершен'
-            })
-    
-    # Проверяем рекомендованные требования (только для информации)
-    recommended_prerequisites = CoursePrerequisite.objects.filter(
-        course=course,
-        requirement_type='recommended'
-    )
-    
-    recommended_info = []
-    for prereq in recommended_prerequisites:
-        required_course = prereq.required_course
-        try:
-            Enrollment.objects.get(
-                student=student,
-                course=required_course,
-                status='completed'
-            )
-            # Студент выполнил рекомендованное требование
-        except Enrollment.DoesNotExist:
-            recommended_info.append(required_course)
-    
-    can_enroll = len(missing_requirements) == 0
-    
-    return can_enroll, {
-        'mandatory': missing_requirements,
-        'recommended': recommended_info
-    }
+    return check_eligibility(student, course, student_courses)
 
 #Работает
 def custom_login(request):
@@ -602,19 +479,20 @@ def custom_login(request):
             # Логиним пользователя
             login(request, user)
             
+            # Определяем профиль уже вошедшего пользователя (сохраняется в сессии)
+            profile = UserProfile(request)
+            request.profile = profile
+            
             # Проверяем тип пользователя и показываем соответствующее сообщение
-            try:
-                student = Student.objects.get(email=user.email)
-                messages.success(request, f'Добро пожаловать, {student.get_full_name()}!')
-            except Student.DoesNotExist:
-                try:
-                    reviewer = Reviewer.objects.get(email=user.email)
-                    if reviewer.is_approved:
-                        messages.success(request, f'Добро пожаловать, преподаватель {reviewer.get_full_name()}!')
-                    else:
-                        messages.warning(request, f'Добро пожаловать! Ваш аккаунт преподавателя ожидает одобрения.')
-                except Reviewer.DoesNotExist:
-                    messages.info(request, 'Добро пожаловать! Завершите регистрацию.')
+            if profile.has_student:
+                messages.success(request, f'Добро пожаловать, {profile.student.get_full_name()}!')
+            elif profile.has_reviewer:
+                if profile.is_approved:
+                    messages.success(request, f'Добро пожаловать, преподаватель {profile.reviewer.get_full_name()}!')
+                else:
+                    messages.warning(request, f'Добро пожаловать! Ваш аккаунт преподавателя ожидает одобрения.')
+            else:
+                messages.info(request, 'Добро пожаловать! Завершите регистрацию.')
             
             # Перенаправляем на next или dashboard
             next_url = request.POST.get('next', 'dashboard')
@@ -628,19 +506,48 @@ def custom_login(request):
     }
     return render(request, 'registration/login.html', context)
 
+@login_required
+@user_passes_test(is_admin)
+def platform_stats(request):
+    """
+    Аналитика платформы для администратора (из ежедневных rollup-таблиц).
+    Страница только читает rollup; догоняет его по расписанию команда backfill_analytics --incremental
+    """
+    days = request.GET.get('days', '')
+    days = int(days) if days in ('7', '30', '90', '365') else ANALYTICS_TREND_DAYS
+    trend = get_trend(days)
+    start, end = trend[0].date, trend[-1].date
+    
+    context = {
+        'summary': get_platform_summary(),
+        'period_totals': get_totals(start, end),
+        'trend': trend,
+        'course_breakdown': get_course_breakdown(start, end),
+        'days': days,
+        'period_choices': (7, 30, 90, 365),
+        'title': 'Аналитика платформы'
+    }
+    return render(request, 'dashboard/platform_stats.html', context)
+
+@login_required
+@user_passes_test(is_admin)
+def db_pool_stats(request):
+    """Метрики пулов соединений процесса, обслужившего запрос (JSON для мониторинга)"""
+    return JsonResponse({'pools': pool_stats()})
+
 #Работает
 @login_required
 @user_passes_test(is_admin)
 def tag_management(request):
     """Управление тегами"""
-    tags = Tag.objects.all().prefetch_related('tagged_courses')
+    tags = Tag.objects.all()
     
-    # Статистика по тегам
+    # Статистика по тегам (поддерживаемые счетчики, без запросов на каждый тег)
     tags_with_stats = []
     for tag in tags:
         stats = {
-            'course_count': tag.tagged_courses.count(),
-            'active_courses': tag.tagged_courses.filter(course__is_active=True).count(),
+            'course_count': tag.course_count,
+            'active_courses': tag.active_course_count,
         }
         tags_with_stats.append({
             'tag': tag,
@@ -659,18 +566,8 @@ def tag_create(request):
     if request.method == 'POST':
         form = TagForm(request.POST)
         if form.is_valid():
-            new_form = request.POST.copy()
-            for i in range(1, Tag.objects.count() + 1):
-                try:
-                    tag = Tag.objects.get(tag_id = i)
-                except:
-                    new_form["tag_id"] = i
-                    break
-            if not new_form["tag_id"]:
-                new_form['tag_id'] = Tag.objects.count() + 1
-            form = TagForm(new_form)
-            print(form.data['tag_id'])
-            tag = form.save()
+            # Наименьший свободный tag_id находится одним запросом
+            tag = create_tag(form.save(commit=False))
             messages.success(request, f'Тег "{tag.name}" успешно создан!')
             return redirect('tag_management')
     else:
@@ -736,7 +633,7 @@ def course_create(request):
             form.save_m2m()  # Для тегов
             messages.success(request, f'Курс "{course.title}" успешно создан!')
             teacher_course = TeacherCourse(
-                reviewer=Reviewer.objects.get(email=request.user.email),
+                reviewer=request.profile.reviewer,
                 course=course,
                 is_main_teacher=True,
             )
@@ -785,7 +682,7 @@ def module_create(request):
         form = ModuleForm(initial=initial)
     
     # Фильтруем курсы только текущего преподавателя
-    teacher_courses = TeacherCourse.objects.filter(reviewer=Reviewer.objects.get(email=request.user.email))
+    teacher_courses = TeacherCourse.objects.filter(reviewer_id=request.profile.reviewer_id)
     courses = Course.objects.filter(course_id__in=teacher_courses.values_list('course'))
     form.fields['course'].queryset = courses    
     context = {
@@ -814,13 +711,14 @@ def lesson_create(request):
         if form.is_valid():
             print("valid")
             lesson = form.save()
+            refresh_course_counters(module.course_id)
             messages.success(request, f'Урок "{lesson.title}" успешно создан!')
             return redirect('dashboard')
         print(form.errors)
     else:
         form = LessonForm()
-        # Фильтруем модули только курсов текущего преподавателяteacher_courses = TeacherCourse.objects.filter(reviewer=Reviewer.objects.get(email=request.user.email))
-        teacher_courses = TeacherCourse.objects.filter(reviewer=Reviewer.objects.get(email=request.user.email))
+        # Фильтруем модули только курсов текущего преподавателя
+        teacher_courses = TeacherCourse.objects.filter(reviewer_id=request.profile.reviewer_id)
         courses = Course.objects.filter(course_id__in=teacher_courses.values_list('course'))
         modules = Module.objects.filter(course__in=courses)
         form.fields['module'].queryset = modules
@@ -864,6 +762,7 @@ def module_delete(request, pk):
     if request.method == 'POST':
         module_title = module.title
         module.delete()
+        refresh_course_counters(course_id)
         messages.success(request, f'Модуль "{module_title}" успешно удален!')
         return redirect('course_manage', pk=course_id)
     return redirect('module_edit', module_id=pk)
@@ -876,6 +775,7 @@ def lesson_delete(request, pk):
     if request.method == 'POST':
         lesson_title = lesson.title
         lesson.delete()
+        refresh_course_counters(course_id)
         messages.success(request, f'Урок "{lesson_title}" успешно удален!')
         return redirect('course_manage', pk=course_id)
     return redirect('lesson_edit', lesson_id=pk)
@@ -885,7 +785,7 @@ def lesson_delete(request, pk):
 def course_edit(request, pk):
     """Редактирование существующего курса"""
     course = get_object_or_404(Course, pk=pk)
-    reviewer = Reviewer.objects.get(email=request.user.email)
+    reviewer = request.profile.reviewer
     try:
         teacher_course = TeacherCourse.objects.get(reviewer=reviewer,course=course)
     except:
@@ -895,10 +795,8 @@ def course_edit(request, pk):
         form = CourseForm(request.POST, request.FILES, instance=course)
         print(form.data)
         if form.is_valid():
+            # Счетчики тегов обновляются сигналами при изменении связей курса
             course = form.save()
-            for tag in Tag.objects.all():
-                tag.course_count = tag.courses.count()
-                tag.save()
             messages.success(request, f'Курс "{course.title}" успешно обновлен!')
             return redirect('course_manage', pk=course.course_id)
         print(form.errors)
@@ -918,7 +816,7 @@ def module_edit(request, pk):
     module = get_object_or_404(Module, module_id=pk)
     reviewer = None
     try:
-        reviewer = Reviewer.objects.get(email=request.user.email)
+        reviewer = request.profile.reviewer
         teacher_course = TeacherCourse.objects.get(reviewer=reviewer,course=module.course)
     except:
         return HttpResponseForbidden("У вас нет прав для редактирования этого курса")
@@ -949,7 +847,7 @@ def module_edit(request, pk):
 def lesson_edit(request, pk):
     """Редактирование существующего урока"""
     lesson = get_object_or_404(Lesson, lesson_id=pk)
-    reviewer = Reviewer.objects.get(email=request.user.email)
+    reviewer = request.profile.reviewer
     
     try:
         teacher_course = TeacherCourse.objects.get(reviewer=reviewer,course=lesson.module.course)
@@ -962,6 +860,8 @@ def lesson_edit(request, pk):
         form = LessonForm(new_form, request.FILES, instance=lesson)
         if form.is_valid():
             lesson = form.save()
+            # Тип/активность урока могли измениться - пересчитываем прогресс
+            refresh_course_counters(lesson.module.course_id)
             messages.success(request, f'Урок "{lesson.title}" успешно обновлен!')
             return redirect('course_manage', pk=lesson.module.course.course_id)
         print(form.errors)
@@ -983,45 +883,12 @@ def lesson_edit(request, pk):
 def course_modules(request, course_id):
     # Проверяем, записан ли студент на курс
     enrollment = get_object_or_404(
-        Enrollment, 
+        Enrollment.objects.select_related('course'),
         course_id=course_id, 
-        student=Student.objects.get(email=request.user.email)
+        student=request.profile.student
     )
-    
-    course = enrollment.course
-    # Получаем модули курса
-    modules = course.modules.order_by('module_order')
-    
-
-    total_lessons = {}
-    lesson_counter = 0
-    modules = Module.objects.filter(course=course)
-    module_progress = {}
-    for module in modules:
-        lesson_counter += module.lessons.count()
-        module_progress[module.module_id] = module.get_module_progress(request.user)
-    total_lessons[course] = lesson_counter
-
-    is_completed = course.is_course_completed(request.user)
-    author = None
-    try:
-        teacher_course = TeacherCourse.objects.get(course=course)
-        author = teacher_course.reviewer
-    except:
-        pass
-    context = {
-        'course': course,
-        'enrollment': enrollment,
-        'modules': modules,  # modules уже содержат все необходимые данные
-        'course_progress': course.get_course_progress(request.user),  # процент завершения
-        'completed_course_lessons': course.get_completed_lessons_count(request.user),
-        'total_course_lessons': course.total_active_lessons,
-        'total_score': course.get_user_score(request.user),
-        'max_score': course.get_max_possible_score(),
-        'is_course_completed': course.is_course_completed(request.user),
-        'title': f'Модули курса: {course.title}',
-        'author': author
-    }
+    # Весь прогресс по курсу (модули, уроки, баллы) одним расчетом
+    context = course_modules_context(enrollment, *run_blocks(course_modules_blocks(enrollment)))
     return render(request, 'courses/course_modules.html', context)
 
 
@@ -1029,13 +896,17 @@ def course_modules(request, course_id):
 @login_required
 def lesson_detail(request, lesson_id):
     """Детальная страница урока для студента - упрощенная версия"""
-    lesson = get_object_or_404(Lesson, lesson_id=lesson_id, is_active=True)
+    lesson = get_object_or_404(
+        Lesson.objects.select_related('module__course'),
+        lesson_id=lesson_id,
+        is_active=True
+    )
     
     # Проверяем, записан ли студент на курс
     enrollment = get_object_or_404(
         Enrollment,
-        course=lesson.module.course,
-        student=Student.objects.get(email=request.user.email)
+        course_id=lesson.module.course_id,
+        student=request.profile.student
     )
 
     completion = None
@@ -1047,32 +918,19 @@ def lesson_detail(request, lesson_id):
     except LessonCompletion.DoesNotExist:
         pass
     
-    # Получаем соседние уроки
-    next_lesson = Lesson.objects.filter(
-        module=lesson.module,
-        lesson_order__gt=lesson.lesson_order,
-        is_active=True
-    ).order_by('lesson_order').first()
-    
-    prev_lesson = Lesson.objects.filter(
-        module=lesson.module,
-        lesson_order__lt=lesson.lesson_order,
-        is_active=True
-    ).order_by('-lesson_order').first()
-    
-    # Получаем все уроки модуля
-    module_lessons = Lesson.objects.filter(
-        module=lesson.module,
-        is_active=True
-    ).order_by('lesson_order')
+    # Соседние уроки (в том числе в соседних модулях) и уроки модуля - из последовательности курса
+    sequence = get_lesson_sequence(lesson.module.course_id)
+    position = sequence.position(lesson.lesson_id)
     
     context = {
         'lesson': lesson,
         'enrollment': enrollment,
         'completion': completion,
-        'next_lesson': next_lesson,
-        'prev_lesson': prev_lesson,
-        'module_lessons': module_lessons,
+        'next_lesson': sequence.next(lesson.lesson_id),
+        'prev_lesson': sequence.previous(lesson.lesson_id),
+        'module_lessons': sequence.module_lessons(lesson.module_id),
+        'lesson_number': position + 1 if position is not None else None,
+        'lessons_count': len(sequence),
         'title': lesson.title
     }
     return render(request, 'courses/lesson_detail.html', context)
@@ -1081,13 +939,17 @@ def lesson_detail(request, lesson_id):
 def complete_lesson(request, lesson_id):
     """Отметить урок как завершенный"""
     if request.method == 'POST':
-        lesson = get_object_or_404(Lesson, lesson_id=lesson_id, is_active=True)
+        lesson = get_object_or_404(
+            Lesson.objects.select_related('module__course'),
+            lesson_id=lesson_id,
+            is_active=True
+        )
         
         # Проверяем, записан ли студент на курс
         enrollment = get_object_or_404(
             Enrollment,
             course=lesson.module.course,
-            student=Student.objects.get(email=request.user.email)
+            student=request.profile.student
         )
         
         # Проверяем, не завершен ли уже урок
@@ -1096,7 +958,7 @@ def complete_lesson(request, lesson_id):
             return redirect('lesson_detail', lesson_id=lesson_id)
         
         # Получаем балл из формы, если есть
-        score = request.POST.get('score')
+        score = request.POST.get('score') or None
         if score:
             try:
                 score = int(score)
@@ -1107,33 +969,27 @@ def complete_lesson(request, lesson_id):
             except (ValueError, TypeError):
                 score = None
         
-        # Создаем запись о завершении
-        completion = LessonCompletion.objects.create(
-            enrollment=enrollment,
-            lesson=lesson,
-            score=score
-        )
+        # Создаем запись о завершении и обновляем счетчики прогресса
+        completion = record_completion(enrollment, lesson, score)
         
         messages.success(request, f'Урок "{lesson.title}" успешно завершен!')
         
+        progress = get_enrollment_progress(enrollment)
+        
         # Проверяем, завершен ли теперь модуль
         module = lesson.module
-        module_completed = module.get_module_progress(request.user) == 100
+        module_completed = progress.module(module.module_id).is_completed
         
         if module_completed:
             messages.success(request, f'Поздравляем! Вы завершили модуль "{module.title}"!')
         
         # Проверяем, завершен ли теперь курс
-        course_completed = lesson.module.course.is_course_completed(request.user)
+        course_completed = progress.is_completed
         if course_completed:
             messages.success(request, f'🎉 Поздравляем! Вы завершили курс "{lesson.module.course.title}"!')
         
-        # Перенаправляем на следующий урок или список модулей
-        next_lesson = Lesson.objects.filter(
-            module=lesson.module,
-            lesson_order__gt=lesson.lesson_order,
-            is_active=True
-        ).order_by('lesson_order').first()
+        # Перенаправляем на следующий урок курса или в личный кабинет
+        next_lesson = get_lesson_sequence(module.course_id).next(lesson.lesson_id)
         
         if next_lesson:
             return redirect('lesson_detail', lesson_id=next_lesson.lesson_id)
@@ -1153,16 +1009,11 @@ def uncomplete_lesson(request, lesson_id):
         enrollment = get_object_or_404(
             Enrollment,
             course=lesson.module.course,
-            student=Student.objects.get(email=request.user.email)
+            student=request.profile.student
         )
         
-        # Удаляем запись о завершении
-        deleted_count, _ = LessonCompletion.objects.filter(
-            enrollment=enrollment,
-            lesson=lesson
-        ).delete()
-        
-        if deleted_count > 0:
+        # Удаляем запись о завершении и обновляем счетчики прогресса
+        if remove_completion(enrollment, lesson):
             messages.success(request, f'Завершение урока "{lesson.title}" отменено.')
         else:
             messages.info(request, 'Этот урок еще не был завершен.')
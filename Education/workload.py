@@ -0,0 +1,217 @@
+# workload.py
+import heapq
+import itertools
+import threading
+import time
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count
+from .models import Enrollment, HomeworkSubmission, Reviewer, TeacherCourse, UserStatus
+from .review_queue import OPEN_STATUSES, QUEUED_STATUSES, QUEUE_ORDERING, urgency_rank
+from .reviewer_stats import invalidate_reviewer_stats
+
+
+# Счетчики процесса периодически сверяются с базой (изменения из других процессов)
+WORKLOAD_REBUILD_INTERVAL = 60
+BACKLOG_BATCH_SIZE = 1000
+
+
+class WorkloadBalancer:
+    """
+    Счетчики нагрузки одобренных проверяющих в памяти процесса
+    (нагрузка - назначенные проверяющему незавершенные задания).
+    Для каждого курса - min-heap (нагрузка, номер последнего назначения, id),
+    поэтому задание уходит наименее загруженному проверяющему курса,
+    а при равной нагрузке - тому, кто дольше не получал заданий.
+    Устаревшие записи кучи отбрасываются при выборе (ленивое удаление).
+    Выбор не меняет счетчики: назначение учитывается через adjust() после коммита.
+    """
+
+    def __init__(self, loads, reviewer_courses, last_assigned=None, sequence=None):
+        self._loads = dict(loads)
+        self._reviewer_courses = reviewer_courses
+        self._last_assigned = dict(last_assigned) if last_assigned else dict.fromkeys(self._loads, 0)
+        self._sequence = sequence or itertools.count(1)
+        self._heaps = defaultdict(list)
+        self._lock = threading.RLock()
+        for reviewer_id in self._loads:
+            self._push(reviewer_id)
+
+    @classmethod
+    def from_db(cls):
+        """Строит счетчики двумя запросами: курсы проверяющих и их текущая нагрузка"""
+        reviewers = Reviewer.objects.filter(is_approved=True, status=UserStatus.ACTIVE)
+        reviewer_courses = defaultdict(list)
+        for course_id, reviewer_id in TeacherCourse.objects.filter(
+            reviewer__in=reviewers
+        ).values_list('course_id', 'reviewer_id'):
+            reviewer_courses[reviewer_id].append(course_id)
+
+        loads = dict.fromkeys(reviewer_courses, 0)
+        for row in HomeworkSubmission.objects.filter(
+            reviewer_id__in=list(loads),
+            status__in=OPEN_STATUSES
+        ).order_by().values('reviewer_id').annotate(open_count=Count('submission_id')):
+            loads[row['reviewer_id']] = row['open_count']
+        return cls(loads, dict(reviewer_courses))
+
+    def _push(self, reviewer_id):
+        entry = (self._loads[reviewer_id], self._last_assigned[reviewer_id], reviewer_id)
+        for course_id in self._reviewer_courses[reviewer_id]:
+            heap = self._heaps[course_id]
+            heapq.heappush(heap, entry)
+            # Куча разрослась из-за устаревших записей - собираем заново
+            if len(heap) > 4 * len(self._loads) + 16:
+                self._compact(course_id)
+
+    def _compact(self, course_id):
+        heap = [
+            (self._loads[reviewer_id], self._last_assigned[reviewer_id], reviewer_id)
+            for reviewer_id in {entry[2] for entry in self._heaps[course_id]}
+        ]
+        heapq.heapify(heap)
+        self._heaps[course_id] = heap
+
+    def _current(self, entry):
+        load, last_assigned, reviewer_id = entry
+        return self._loads.get(reviewer_id) == load and self._last_assigned[reviewer_id] == last_assigned
+
+    def get_load(self, reviewer_id):
+        """Нагрузка проверяющего или None, если он не участвует в распределении"""
+        return self._loads.get(reviewer_id)
+
+    def pick(self, course_id):
+        """Наименее загруженный проверяющий курса (без изменения счетчиков) или None"""
+        with self._lock:
+            heap = self._heaps.get(course_id)
+            while heap:
+                if self._current(heap[0]):
+                    return heap[0][2]
+                heapq.heappop(heap)
+            return None
+
+    def copy(self):
+        """Независимая копия счетчиков: для распределения нескольких заданий внутри транзакции"""
+        with self._lock:
+            return WorkloadBalancer(self._loads, self._reviewer_courses, self._last_assigned, self._sequence)
+
+    def adjust(self, reviewer_id, delta, assigned=False):
+        """Меняет нагрузку проверяющего; assigned - ему только что назначены задания"""
+        with self._lock:
+            if reviewer_id not in self._loads or not delta:
+                return
+            self._loads[reviewer_id] = max(0, self._loads[reviewer_id] + delta)
+            if assigned:
+                self._last_assigned[reviewer_id] = next(self._sequence)
+            self._push(reviewer_id)
+
+
+_state = {'balancer': None, 'built_at': 0.0}
+_build_lock = threading.Lock()
+
+
+def get_balancer():
+    balancer = _state['balancer']
+    if balancer is not None and time.monotonic() - _state['built_at'] < WORKLOAD_REBUILD_INTERVAL:
+        return balancer
+    with _build_lock:
+        if _state['balancer'] is balancer:
+            _state['balancer'] = WorkloadBalancer.from_db()
+            _state['built_at'] = time.monotonic()
+        return _state['balancer']
+
+
+def invalidate_workload():
+    """Счетчики будут перестроены из базы при следующем обращении"""
+    _state['balancer'] = None
+
+
+def get_workload(reviewer_id):
+    return get_balancer().get_load(reviewer_id)
+
+
+def apply_workload_changes(changes, assigned=False):
+    """
+    changes - {reviewer_id: изменение нагрузки}. Применяются после коммита текущей
+    транзакции (вне транзакции - сразу): при откате счетчики процесса не меняются
+    """
+    balancer = _state['balancer']
+    changes = {reviewer_id: delta for reviewer_id, delta in changes.items() if reviewer_id is not None and delta}
+    if balancer is None or not changes:
+        return
+
+    def apply():
+        # Счетчики пересобраны из базы после изменения - оно в них уже учтено
+        if _state['balancer'] is not balancer:
+            return
+        for reviewer_id, delta in changes.items():
+            balancer.adjust(reviewer_id, delta, assigned)
+    transaction.on_commit(apply)
+
+
+def invalidate_workload_on_commit():
+    """Пересборка счетчиков после коммита: до него база еще не видна другим соединениям"""
+    transaction.on_commit(invalidate_workload)
+
+
+def assign_submission(submission):
+    """
+    Назначает новое задание наименее загруженному проверяющему курса.
+    Возвращает id проверяющего или None, если на курсе нет одобренных проверяющих.
+    """
+    course_id = Enrollment.objects.filter(
+        pk=submission.enrollment_id
+    ).values_list('course_id', flat=True).first()
+    reviewer_id = get_balancer().pick(course_id)
+    if reviewer_id is None:
+        return None
+
+    assigned = HomeworkSubmission.objects.filter(
+        pk=submission.pk,
+        reviewer__isnull=True
+    ).update(reviewer_id=reviewer_id)
+    if not assigned:
+        # Задание уже назначили в другом месте
+        return None
+    apply_workload_changes({reviewer_id: 1}, assigned=True)
+    submission.reviewer_id = reviewer_id
+    invalidate_reviewer_stats(reviewer_id)
+    return reviewer_id
+
+
+def assign_backlog(course_ids=None, batch_size=BACKLOG_BATCH_SIZE):
+    """
+    Распределяет все неназначенные задания очереди в одной транзакции.
+    Строки блокируются SKIP LOCKED, чтобы не мешать проверяющим, берущим задания.
+    Возвращает количество назначенных заданий.
+    """
+    submissions = HomeworkSubmission.objects.filter(
+        reviewer__isnull=True,
+        status__in=QUEUED_STATUSES
+    )
+    if course_ids is not None:
+        submissions = submissions.filter(enrollment__course_id__in=course_ids)
+
+    # Задания распределяются по копии счетчиков, общие меняются только после коммита
+    planner = get_balancer().copy()
+    assigned = []
+    with transaction.atomic():
+        rows = submissions.annotate(urgency_rank=urgency_rank()).order_by(
+            *QUEUE_ORDERING
+        ).select_for_update(skip_locked=True, of=('self',)).values_list(
+            'submission_id', 'enrollment__course_id'
+        )
+        for submission_id, course_id in rows:
+            reviewer_id = planner.pick(course_id)
+            if reviewer_id is not None:
+                planner.adjust(reviewer_id, 1, assigned=True)
+                assigned.append(HomeworkSubmission(submission_id=submission_id, reviewer_id=reviewer_id))
+        HomeworkSubmission.objects.bulk_update(assigned, ['reviewer'], batch_size=batch_size)
+        changes = defaultdict(int)
+        for submission in assigned:
+            changes[submission.reviewer_id] += 1
+        apply_workload_changes(changes, assigned=True)
+    for reviewer_id in changes:
+        invalidate_reviewer_stats(reviewer_id)
+    return len(assigned)
@@ -3,6 +3,9 @@ ASGI config for ProjectDB project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Run with an ASGI server, e.g.: WEB_CONCURRENCY=4 uvicorn ProjectDB.asgi:application
+(the worker count also sizes the per-process connection pools, see settings.py).
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -12,5 +15,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ProjectDB.settings')
+# Кабинеты и страницы курса под ASGI обслуживаются асинхронными представлениями
+os.environ.setdefault('DJANGO_ROOT_URLCONF', 'ProjectDB.urls_async')
 
 application = get_asgi_application()
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -37,6 +38,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'Education'
 ]
 
@@ -46,11 +48,14 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'Education.middleware.UserTypeMiddleware',
+    'Education.middleware.DatabaseRoleMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'ProjectDB.urls'
+# Точка входа ASGI подставляет маршруты с асинхронными представлениями (ProjectDB/urls_async.py)
+ROOT_URLCONF = os.environ.get('DJANGO_ROOT_URLCONF', 'ProjectDB.urls')
 
 TEMPLATES = [
     {
@@ -75,6 +80,43 @@ WSGI_APPLICATION = 'ProjectDB.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Каждая роль (см. файл Roles) - отдельный алиас со своим пулом соединений (psycopg_pool):
+# нагрузку студентов, преподавателей и администраторов можно ограничивать и настраивать раздельно.
+# Пул у каждого процесса сервера свой, а верхняя граница числа соединений роли задается
+# в PostgreSQL (CONNECTION LIMIT в Roles) на все процессы сразу: max_size пула роли -
+# ее лимит, деленный на число процессов (WEB_CONCURRENCY, его же читают gunicorn и uvicorn).
+# С пулом CONN_MAX_AGE должен быть 0; CONN_HEALTH_CHECKS включает проверку соединения при выдаче.
+# Метрики пулов - на странице analytics/db-pools/ (см. Education/db_pool.py).
+
+WEB_CONCURRENCY = int(os.environ.get('WEB_CONCURRENCY', 4))
+# Должны совпадать с CONNECTION LIMIT ролей в Roles
+DB_CONNECTION_LIMITS = {'student_db': 60, 'teacher_db': 20}
+
+
+def _pool(min_size, max_size):
+    return {
+        'min_size': min(min_size, max_size),
+        'max_size': max_size,
+        # Соединения пересоздаются раз в полчаса и закрываются после 10 минут простоя
+        'max_lifetime': 1800,
+        'max_idle': 600,
+        # Сколько секунд запрос ждет свободное соединение, прежде чем получить ошибку
+        'timeout': 10,
+    }
+
+
+# Асинхронные страницы (Education/async_views.py) выполняют блоки запросов одновременно,
+# каждый на своем соединении, но не больше ASYNC_QUERY_CONCURRENCY на запрос. Пул роли
+# из max_size соединений обслуживает одновременно не меньше max_size // ASYNC_QUERY_CONCURRENCY
+# таких запросов, остальные ждут соединение до timeout пула
+ASYNC_QUERY_CONCURRENCY = 2
+
+
+def _role_pool(alias, min_size):
+    """Пул роли: лимит соединений роли поровну между процессами сервера"""
+    return _pool(min_size, max(1, DB_CONNECTION_LIMITS[alias] // WEB_CONCURRENCY))
+
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
@@ -83,6 +125,9 @@ DATABASES = {
         'PASSWORD': 'admin_secure_password123',
         'HOST': 'localhost',
         'PORT': '5432',
+        'CONN_MAX_AGE': 0,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {'pool': _pool(2, 10)},
     },
     'student_db': {
         'ENGINE': 'django.db.backends.postgresql',
@@ -91,6 +136,10 @@ DATABASES = {
         'PASSWORD': 'student_secure_password123',
         'HOST': 'localhost',
         'PORT': '5432',
+        'CONN_MAX_AGE': 0,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {'pool': _role_pool('student_db', 4)},
+        'TEST': {'MIRROR': 'default'},
     },
     'teacher_db': {
         'ENGINE': 'django.db.backends.postgresql',
@@ -99,6 +148,48 @@ DATABASES = {
         'PASSWORD': 'teacher_secure_password123',
         'HOST': 'localhost',
         'PORT': '5432',
+        'CONN_MAX_AGE': 0,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {'pool': _role_pool('teacher_db', 2)},
+        'TEST': {'MIRROR': 'default'},
+    }
+}
+
+# Чтение - через соединение роли пользователя, запись - через default
+DATABASE_ROUTERS = ['Education.routers.RoleRouter']
+
+# Реплики для чтения каталога и аналитики (см. Education/replicas.py). Пример реплики:
+# DATABASES['replica'] = {
+#     **DATABASES['default'],
+#     'HOST': 'replica.local',
+#     'OPTIONS': {
+#         'pool': {**_pool(2, 10), 'timeout': 2},  # недоступная реплика не держит проверку долго
+#         'options': '-c default_transaction_read_only=on',
+#         'connect_timeout': 2,
+#     },
+#     'TEST': {'MIRROR': 'default'},
+# }
+# Локально реплику можно направить на тот же сервер PostgreSQL (HOST 'localhost').
+DATABASE_REPLICAS = []
+# Реплика, отстающая больше чем на REPLICA_MAX_LAG секунд или недоступная, выводится из ротации;
+# отставание проверяется раз в REPLICA_CHECK_INTERVAL секунд
+REPLICA_MAX_LAG = 5
+REPLICA_CHECK_INTERVAL = 10
+# Сколько секунд после записи пользователь читает только с мастера
+READ_YOUR_WRITES_WINDOW = 15
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+# Кэш общий для всех процессов и серверов: в нем лежат сессии и версии кэшей (профили,
+# каталог, граф пререквизитов и т.д.), и инвалидация в одном процессе должна быть видна
+# остальным. Локальный LocMemCache для этого не подходит
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379/0'),
+        'KEY_PREFIX': 'studyhub',
     }
 }
 
@@ -112,6 +203,12 @@ LOGIN_URL = 'login'
 
 SESSION_COOKIE_AGE = 1209600  # 2 недели в секундах
 SESSION_SAVE_EVERY_REQUEST = True
+# Сессии в кэше, в базу - только изменения; продление срока пишется в базу не чаще
+# раза в SESSION_REFRESH_INTERVAL секунд (см. Education/session_backend.py)
+SESSION_ENGINE = 'Education.session_backend'
+SESSION_REFRESH_INTERVAL = 300
+# Размер пачки при удалении истекших сессий командой clearsessions
+SESSION_PURGE_BATCH_SIZE = 1000
 
 AUTH_PASSWORD_VALIDATORS = [
     {
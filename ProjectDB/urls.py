@@ -32,6 +32,7 @@ urlpatterns = [
 
     #Работает
     path('courses/', views.course_list, name='course_list'),
+    path('courses/autocomplete/', views.course_autocomplete, name='course_autocomplete'),
     path('courses/<int:course_id>/', views.course_detail, name='course_detail'),
     path('courses/<int:course_id>/enroll/', views.enroll_in_course, name='enroll_in_course'),
     
@@ -41,6 +42,8 @@ urlpatterns = [
         
     #Работает (кроме создания)
     path('tag_management/', views.tag_management, name='tag_management'),
+    path('analytics/', views.platform_stats, name='platform_stats'),
+    path('analytics/db-pools/', views.db_pool_stats, name='db_pool_stats'),
     
     #Работает
     path('tags/create', views.tag_create, name='tag_create'),
@@ -72,4 +75,9 @@ urlpatterns = [
     path('student/lesson/<int:lesson_id>/uncomplete/', views.uncomplete_lesson, name='uncomplete_lesson'),
     # path('student/lesson/<int:lesson_id>/update-score/', views.update_lesson_score, name='update_lesson_score'),
     path('student/stats/', views.student_stats, name='student_stats'),  
+
+    path('teacher/review/claim/', views.review_claim, name='review_claim'),
+    path('teacher/review/<int:submission_id>/release/', views.review_release, name='review_release'),
+    path('teacher/review/<int:submission_id>/renew/', views.review_renew, name='review_renew'),
+    path('teacher/review/<int:submission_id>/complete/', views.review_complete, name='review_complete'),
 ]
\ No newline at end of file
@@ -0,0 +1,22 @@
+"""
+URL configuration for the ASGI deployment (see asgi.py).
+
+Same routes as urls.py; pages that have async versions (Education/async_views.py)
+are served by them.
+"""
+from django.urls import path
+from Education import async_views
+from .urls import urlpatterns as sync_urlpatterns
+
+# Асинхронные представления по имени маршрута
+ASYNC_VIEWS = {
+    'dashboard': async_views.dashboard,
+    'course_detail': async_views.course_detail,
+    'course_modules': async_views.course_modules,
+}
+
+urlpatterns = [
+    path(str(pattern.pattern), ASYNC_VIEWS[pattern.name], name=pattern.name)
+    if getattr(pattern, 'name', None) in ASYNC_VIEWS else pattern
+    for pattern in sync_urlpatterns
+]